@@ -1,6 +1,9 @@
 import csv
+import os
 import re
 
+CHUNK_SIZE = 1 << 20  # ile bajtów pliku csv jest mniej więcej wczytywanych naraz przy wczytywaniu partiami
+
 
 def read_csv(file_path):
     # wczytanie plików csv
@@ -9,6 +12,47 @@ def read_csv(file_path):
         return [row for row in reader]
 
 
+def read_cities(file_path):
+    # wczytanie danych miast: [nazwa, x, y, zysk]
+    return [[city, float(x), float(y), float(profit)] for city, x, y, profit in read_csv(file_path)]
+
+
+def read_roads(file_path):
+    # wczytanie połączeń między miastami: [miasto1, miasto2, odległość]
+    return [[city1, city2, float(distance)] for city1, city2, distance in read_csv(file_path)]
+
+
+def read_csv_chunks(file_path, chunk_size=CHUNK_SIZE, progress=None):
+    # wczytywanie pliku csv partiami po około chunk_size bajtów (całe wiersze, bez pustych wierszy);
+    # progress(odsetek wczytanej części pliku) wywoływane jest po każdej partii
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        while True:
+            lines = file.readlines(chunk_size)
+            if not lines:
+                break
+            yield [row for row in csv.reader(line.decode('utf8') for line in lines) if row]
+            if progress is not None:
+                progress(file.tell() / file_size)
+
+
+def read_cities_chunks(file_path, chunk_size=CHUNK_SIZE, progress=None):
+    # wczytywanie danych miast partiami: kolejne listy [nazwa, x, y, zysk]
+    for rows in read_csv_chunks(file_path, chunk_size, progress):
+        yield [[city, float(x), float(y), float(profit)] for city, x, y, profit in rows]
+
+
+def read_roads_chunks(file_path, chunk_size=CHUNK_SIZE, progress=None):
+    # wczytywanie połączeń między miastami partiami: kolejne listy [miasto1, miasto2, odległość]
+    for rows in read_csv_chunks(file_path, chunk_size, progress):
+        yield [[city1, city2, float(distance)] for city1, city2, distance in rows]
+
+
+def read_salesman_max_time(file_path):
+    # wczytanie czasu pracy komiwojażera
+    return int(read_csv(file_path)[0][0])
+
+
 def read_solution(file_path):
     # wczytanie pliku z rozwiązaniem
     with open(file_path, 'r') as file:
@@ -21,6 +65,16 @@ def read_solution(file_path):
     return route, float(profit), float(worked_time)
 
 
+def format_solution(solution, profit, worked_time):
+    # przekształcenie rozwiązania (listy [nazwa, x, y, zysk]) do formatu pliku z rozwiązaniem
+    solution = [[str(element) for element in city] for city in solution]
+    route_string = [','.join(city) for city in solution]
+    route_string = [f'({city})' for city in route_string]
+    route_string = ','.join(route_string)
+    route_string = f'[{route_string}]'
+    return '\r\n'.join([route_string, str(profit), str(worked_time)])
+
+
 def save_solution(data, file_path):
     # zapisanie pliku z rozwiązaniem
     with open(file_path, 'w', newline='') as file:
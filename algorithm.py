@@ -1,6 +1,18 @@
 import copy
+import heapq
 import random
+import threading
 import time
+from collections import Counter, OrderedDict
+from queue import Queue
+
+import numpy as np
+
+from beam_search import BeamSearch
+from checkpoint import Checkpoint
+from islands import IslandModel
+from local_search import LocalSearch
+from population import PopulationMatrix
 
 """
 file:///home/p/Downloads/import_contents_BPB1-0047-0012-httpwww_wi_pb_edu_plplikinaukazeszytyz5piwonska-full.pdf
@@ -37,16 +49,228 @@ class City:
         return self.x == other.x and self.y == other.y
 
 
+class Graph:
+    # zwarta reprezentacja mapy: miasta są ponumerowane kolejnymi liczbami całkowitymi, a połączenia zapisane
+    # w postaci CSR (sąsiedzi miasta i to neighbours[offsets[i]:offsets[i + 1]]). Nazwy miast są potrzebne tylko
+    # przy wczytywaniu i zapisywaniu danych
+    def __init__(self, names, xs, ys, profits, offsets, neighbours, weights):
+        self.names = names  # nazwy miast, id miasta to jego indeks na liście
+        self.x = xs  # współrzędne x miast
+        self.y = ys  # współrzędne y miast
+        self.profit = profits  # zysk z odwiedzenia miasta
+        self.offsets = offsets  # początki list sąsiadów poszczególnych miast
+        self.neighbours = neighbours  # id sąsiadów
+        self.weights = weights  # odległości do sąsiadów
+        self.n_cities = len(names)
+        self._index = None  # nazwa miasta -> id miasta (tworzony przy pierwszym użyciu)
+        self._edges = None  # słownik krawędzi (tworzony przy pierwszym użyciu)
+        self._arrays = None  # tablice numpy używane przy wektorowej ocenie populacji
+
+    @classmethod
+    def from_data(cls, cities, roads):
+        # zbudowanie grafu z surowych danych: listy [nazwa, x, y, zysk] oraz listy [miasto1, miasto2, odległość]
+        names, xs, ys, profits = [], [], [], []
+        for city_id, x, y, profit in cities:
+            names.append(city_id)
+            xs.append(x)
+            ys.append(y)
+            profits.append(profit)
+
+        index = {name: idx for idx, name in enumerate(names)}
+        adjacency = [dict() for _ in names]
+        for city1, city2, distance in roads:
+            idx1, idx2 = index[city1], index[city2]
+            adjacency[idx1][idx2] = distance
+            adjacency[idx2][idx1] = distance
+
+        offsets, neighbours, weights = [0], [], []
+        for connected_cities in adjacency:
+            neighbours.extend(connected_cities.keys())
+            weights.extend(connected_cities.values())
+            offsets.append(len(neighbours))
+
+        return cls(names, xs, ys, profits, offsets, neighbours, weights)
+
+    @classmethod
+    def from_arrays(cls, names, xs, ys, profits, offsets, neighbours, weights):
+        # zbudowanie grafu z gotowych tablic numpy w postaci CSR (np. odwzorowanych w pamięci z pliku binarnego,
+        # patrz instance.py). Liczby zamieniane są na listy jedną operacją tolist(), bo pętle algorytmów działają
+        # szybciej na liczbach Pythona niż na skalarach numpy; names może być dowolną sekwencją (np. NameTable)
+        return cls(names, np.asarray(xs).tolist(), np.asarray(ys).tolist(), np.asarray(profits).tolist(),
+                   np.asarray(offsets).tolist(), np.asarray(neighbours).tolist(), np.asarray(weights).tolist())
+
+    def __getstate__(self):
+        # przy przekazywaniu grafu do innego procesu pomijane są słowniki i tablice, które można odtworzyć z CSR
+        state = dict(self.__dict__)
+        state['_index'] = state['_edges'] = state['_arrays'] = None
+        return state
+
+    @property
+    def index(self):
+        # słownik nazwa miasta -> id miasta
+        if self._index is None:
+            self._index = {name: idx for idx, name in enumerate(self.names)}
+        return self._index
+
+    @property
+    def edges(self):
+        # słownik krawędzi pozwalający w czasie O(1) sprawdzić połączenie i odczytać odległość:
+        # dict(i * n_cities + j: distance)
+        if self._edges is None:
+            n_cities, offsets, neighbours, weights = self.n_cities, self.offsets, self.neighbours, self.weights
+            self._edges = dict()
+            for city_id in range(n_cities):
+                for idx in range(offsets[city_id], offsets[city_id + 1]):
+                    self._edges[city_id * n_cities + neighbours[idx]] = weights[idx]
+        return self._edges
+
+    def arrays(self):
+        # tablice numpy: zysk miast, posortowane klucze krawędzi (i * n_cities + j) oraz odpowiadające im odległości
+        # (liczone wprost z tablic CSR, bez słownika krawędzi)
+        if self._arrays is None:
+            offsets = np.asarray(self.offsets, dtype=np.int64)
+            sources = np.repeat(np.arange(self.n_cities, dtype=np.int64), np.diff(offsets))
+            keys = sources * self.n_cities + np.asarray(self.neighbours, dtype=np.int64)
+            weights = np.asarray(self.weights, dtype=np.float64)
+            order = np.argsort(keys)
+            self._arrays = (np.asarray(self.profit, dtype=np.float64), keys[order], weights[order])
+        return self._arrays
+
+    def neighbours_of(self, city_id):
+        # lista id sąsiadów miasta
+        return self.neighbours[self.offsets[city_id]:self.offsets[city_id + 1]]
+
+    def connections_of(self, city_id):
+        # lista par (id sąsiada, odległość)
+        start, end = self.offsets[city_id], self.offsets[city_id + 1]
+        return list(zip(self.neighbours[start:end], self.weights[start:end]))
+
+    def distance(self, city1, city2):
+        # odległość między połączonymi miastami, KeyError jeśli miasta nie są połączone
+        return self.edges[city1 * self.n_cities + city2]
+
+    def is_connected(self, city1, city2):
+        # sprawdzenie czy miasta są bezpośrednio połączone
+        return city1 * self.n_cities + city2 in self.edges
+
+    def set_road(self, city1, city2, distance):
+        # dodanie połączenia między miastami albo zmiana jego długości (w obu kierunkach); słownik krawędzi jest
+        # poprawiany na miejscu, a tablice numpy liczone od nowa przy następnym użyciu
+        for source, target in ((city1, city2), (city2, city1)):
+            start, end = self.offsets[source], self.offsets[source + 1]
+            for idx in range(start, end):
+                if self.neighbours[idx] == target:
+                    self.weights[idx] = distance
+                    break
+            else:
+                self.neighbours.insert(end, target)
+                self.weights.insert(end, distance)
+                for city_id in range(source + 1, self.n_cities + 1):
+                    self.offsets[city_id] += 1
+            if self._edges is not None:
+                self._edges[source * self.n_cities + target] = distance
+        self._arrays = None
+
+    def remove_road(self, city1, city2):
+        # usunięcie połączenia między miastami (w obu kierunkach), KeyError jeśli miasta nie są połączone
+        if not self.is_connected(city1, city2):
+            raise KeyError((city1, city2))
+        for source, target in {(city1, city2), (city2, city1)}:
+            start, end = self.offsets[source], self.offsets[source + 1]
+            idx = self.neighbours.index(target, start, end)
+            del self.neighbours[idx]
+            del self.weights[idx]
+            for city_id in range(source + 1, self.n_cities + 1):
+                self.offsets[city_id] -= 1
+            if self._edges is not None:
+                del self._edges[source * self.n_cities + target]
+        self._arrays = None
+
+    def set_profit(self, city_id, profit):
+        # zmiana zysku z odwiedzenia miasta
+        self.profit[city_id] = profit
+        if self._arrays is not None:
+            self._arrays[0][city_id] = profit
+
+    def shortest_distances(self, source, limit=float('inf')):
+        # najkrótsze odległości z miasta source do wszystkich miast oddalonych o co najwyżej limit (algorytm Dijkstry,
+        # który dla jednakowych odległości między miastami odwiedza miasta w tej samej kolejności co BFS)
+        distances = {source: 0}
+        queue = [(0, source)]
+        while queue:
+            distance, city_id = heapq.heappop(queue)
+            if distance > distances[city_id]:
+                continue
+            for idx in range(self.offsets[city_id], self.offsets[city_id + 1]):
+                neighbour = self.neighbours[idx]
+                new_distance = distance + self.weights[idx]
+                if new_distance <= limit and new_distance < distances.get(neighbour, new_distance + 1):
+                    distances[neighbour] = new_distance
+                    heapq.heappush(queue, (new_distance, neighbour))
+        return distances
+
+    def step_towards(self, source, is_target, limit=float('inf')):
+        # pierwszy krok (sąsiad, odległość do niego) najkrótszej drogi z miasta source do najbliższego miasta,
+        # dla którego is_target zwraca True, o ile jest ono oddalone o co najwyżej limit. Przeszukiwanie kończy się
+        # na pierwszym znalezionym mieście, więc zwykle nie odwiedza całego grafu. Zwraca (None, None) jeśli
+        # takiego miasta nie ma
+        distances = {source: 0}
+        queue = [(0, source, None, None)]  # (odległość, miasto, pierwszy krok, długość pierwszego kroku)
+        while queue:
+            distance, city_id, first_step, first_distance = heapq.heappop(queue)
+            if distance > distances[city_id]:
+                continue
+            if first_step is not None and is_target(city_id):
+                return first_step, first_distance
+            for idx in range(self.offsets[city_id], self.offsets[city_id + 1]):
+                neighbour = self.neighbours[idx]
+                new_distance = distance + self.weights[idx]
+                if new_distance <= limit and new_distance < distances.get(neighbour, new_distance + 1):
+                    distances[neighbour] = new_distance
+                    if first_step is None:
+                        heapq.heappush(queue, (new_distance, neighbour, neighbour, self.weights[idx]))
+                    else:
+                        heapq.heappush(queue, (new_distance, neighbour, first_step, first_distance))
+        return None, None
+
+    def ids(self, names):
+        # zamiana nazw miast na ich id
+        return [self.index[name] for name in names]
+
+    def route_names(self, ids):
+        # zamiana id miast na ich nazwy
+        return [self.names[city_id] for city_id in ids]
+
+    def city(self, city_id):
+        # zwraca obiekt City dla miasta o podanym id (z połączeniami opisanymi nazwami miast)
+        city = City(self.names[city_id], self.x[city_id], self.y[city_id], self.profit[city_id])
+        for neighbour, distance in self.connections_of(city_id):
+            city.add_connection(self.names[neighbour], distance)
+        return city
+
+
 class Route:
     # klasa opisuje metody dotyczące trasy
-    def __init__(self, route, cities):
+    def __init__(self, route, graph):
         assert isinstance(route, list) or isinstance(route, tuple)
-        self.route = route  # list or tuple of city ids
-        self.cities = cities  # dict(id: City)
+        self.route = route  # list or tuple of city ids (int)
+        self.graph = graph  # Graph
         self._distance = None  # długość trasy
         self._fitness = None  # zysk komiwojażera na trasie
         self.valid = None  # czy to jest poprawna trasa
         self.invalid_cause = None  # przyczyna z jakiej trasa jest niepoprawna
+        self._prefix_distances = None  # odległości od początku trasy do kolejnych miast
+        self._visits = None  # liczba odwiedzin poszczególnych miast
+
+    @classmethod
+    def from_names(cls, names, graph):
+        # stworzenie trasy z listy nazw miast
+        return cls(graph.ids(names), graph)
+
+    @property
+    def names(self):
+        # nazwy miast na trasie
+        return self.graph.route_names(self.route)
 
     @property
     def distance(self):
@@ -54,9 +278,11 @@ class Route:
         if self._distance is None:
             distance = 0
             if self.route:
+                edges = self.graph.edges
+                n_cities = self.graph.n_cities
                 previous_city_id = self.route[0]
                 for current_city_id in self.route[1:]:
-                    distance += self.cities[previous_city_id].distance(current_city_id)
+                    distance += edges[previous_city_id * n_cities + current_city_id]
                     previous_city_id = current_city_id
 
             self._distance = distance
@@ -67,23 +293,124 @@ class Route:
     def fitness(self):
         # metoda oblicza i podaje zysk na trasie
         if self._fitness is None:
-            visited_cities = set()
-            fitness = 0
-            if self.route:
-                for current_city_id in self.route:
-                    if current_city_id not in visited_cities:
-                        visited_cities.add(current_city_id)
-                        fitness += self.cities[current_city_id].profit
-            self._fitness = fitness
+            profit = self.graph.profit
+            self._fitness = sum(profit[city_id] for city_id in set(self.route))
 
         return self._fitness
 
+    @property
+    def prefix_distances(self):
+        # odległości od początku trasy do kolejnych miast na trasie (tylko dla tras z poprawnymi połączeniami)
+        if self._prefix_distances is None:
+            edges = self.graph.edges
+            n_cities = self.graph.n_cities
+            prefix_distances = [0] * len(self.route)
+            for idx in range(1, len(self.route)):
+                prefix_distances[idx] = prefix_distances[idx - 1] \
+                                        + edges[self.route[idx - 1] * n_cities + self.route[idx]]
+            self._prefix_distances = prefix_distances
+
+        return self._prefix_distances
+
+    @property
+    def visits(self):
+        # liczba odwiedzin poszczególnych miast na trasie
+        if self._visits is None:
+            self._visits = Counter(self.route)
+
+        return self._visits
+
+    def extended(self, city_id, at_start, max_distance):
+        # nowa trasa powstała przez dodanie miasta na początku lub na końcu tej trasy. Dla poprawnej trasy długość,
+        # zysk i poprawność nowej trasy liczone są na podstawie zapisanych wartości tej trasy w czasie O(1)
+        if at_start:
+            child = Route([city_id, *self.route], self.graph)
+            end = self.route[0] if self.route else None
+        else:
+            child = Route([*self.route, city_id], self.graph)
+            end = self.route[-1] if self.route else None
+
+        if not self.valid:
+            return child
+
+        child._fitness = self.fitness + (0 if self.visits[city_id] else self.graph.profit[city_id])
+        if self.graph.is_connected(end, city_id):
+            child._set_validity(self.distance + self.graph.distance(end, city_id), max_distance)
+        else:
+            child._set_validity(None, max_distance)
+        return child
+
+    def spliced(self, other, idx, other_idx, max_distance):
+        # nowa trasa złożona z początku tej trasy (do idx) i końca trasy other (od other_idx). Dla poprawnych tras
+        # długość i poprawność liczone są z odległości od początku tras, a zysk z liczby odwiedzin miast - koszt
+        # zależy tylko od długości zmienianej części tras, a nie od długości całej trasy
+        head = self.route[:idx]
+        tail = other.route[other_idx:]
+        child = Route([*head, *tail], self.graph)
+        if not (self.valid and other.valid):
+            return child
+
+        # długość i poprawność połączeń: obie części są poprawne, więc wystarczy sprawdzić miejsce połączenia
+        distance = 0
+        if head:
+            distance += self.prefix_distances[len(head) - 1]
+        if tail:
+            distance += other.distance - other.prefix_distances[len(other.route) - len(tail)]
+        if head and tail:
+            if self.graph.is_connected(head[-1], tail[0]):
+                distance += self.graph.distance(head[-1], tail[0])
+            else:
+                distance = None
+
+        child._set_validity(distance, max_distance)
+        if not child.valid:
+            # zysk niepoprawnej trasy nie jest potrzebny, więc zostanie policzony dopiero na żądanie
+            return child
+
+        # zysk: wychodzimy od trasy, z której zostaje dłuższa część i uwzględniamy tylko zmienioną część
+        if len(self.route) - len(head) + len(tail) <= len(head) + len(other.route) - len(tail):
+            base, removed, added = self, self.route[len(head):], tail
+        else:
+            base, removed, added = other, other.route[:len(other.route) - len(tail)], head
+        child._fitness = self._updated_fitness(base, removed, added)
+        return child
+
+    def _updated_fitness(self, base, removed, added):
+        # zysk trasy base po usunięciu miast removed i dodaniu miast added
+        fitness = base.fitness
+        visits = base.visits
+        profit = self.graph.profit
+        removed = Counter(removed)
+        for city_id, count in removed.items():
+            if visits[city_id] == count:
+                fitness -= profit[city_id]
+        for city_id in set(added):
+            if visits[city_id] == removed[city_id]:
+                fitness += profit[city_id]
+        return fitness
+
+    def _set_validity(self, distance, max_distance):
+        # zapisanie wyniku sprawdzenia poprawności obliczonego poza metodą is_valid (distance równe None oznacza
+        # brak połączenia między sąsiednimi miastami trasy)
+        self._distance = distance
+        if len(self.route) < 2:
+            self.valid = False
+            self.invalid_cause = 'less than 2 cities'
+        elif distance is None:
+            self.valid = False
+            self.invalid_cause = 'cities not connected'
+        elif distance > max_distance:
+            self.valid = False
+            self.invalid_cause = 'too long'
+        else:
+            self.valid = True
+
     def correct_connections(self):
         # metoda sprawdza czy połączenia trasy są poprawne
+        edges = self.graph.edges
+        n_cities = self.graph.n_cities
         for idx in range(len(self.route) - 1):
-            current_city = self.route[idx]
-            next_city_id = self.route[idx + 1]
-            if next_city_id not in self.cities[current_city].connected_cities:
+            if self.route[idx] * n_cities + self.route[idx + 1] not in edges:
                 return False
         else:
             return True
@@ -112,13 +439,23 @@ class Route:
 
         return self.valid
 
+    def to_solution(self):
+        # trasa w postaci zapisywanej w pliku z rozwiązaniem: lista [nazwa, x, y, zysk], przy czym zysk z miasta
+        # odwiedzonego ponownie wynosi 0
+        solution = []
+        visited_cities = set()
+        for city_id in self.route:
+            profit = 0 if city_id in visited_cities else self.graph.profit[city_id]
+            solution.append([self.graph.names[city_id], self.graph.x[city_id], self.graph.y[city_id], profit])
+            visited_cities.add(city_id)
+        return solution
+
     def get_route_coordinates(self):
         # metoda zwraca współrzędne miast na trasie
         coordinates = []
         for city_id in self.route:
-            city = self.cities[city_id]
-            x = city.x
-            y = city.y
+            x = self.graph.x[city_id]
+            y = self.graph.y[city_id]
             coordinates.append([x, y])
         return coordinates
 
@@ -126,14 +463,59 @@ class Route:
 class GeneticAlgorithm:
     # algorytm optymalizujący trasę komiwojażera
     DEFAULT_SETTINGS = {'n_iterations': 1000, 'population_size': 1000, 'mutation_rate': 0.05, 'elite_size': 0.5,
-                        'time_limit': 15}
+                        'time_limit': 15, 'local_search_time': 0}
+    # ustawienia, które okienko i cli włączają ponad bazowy algorytm genetyczny (wywołanie find_optimal_route bez
+    # tych argumentów działa tak jak algorytm bez ulepszeń)
+    ENHANCED_SETTINGS = {'local_search_time': 1, 'seed_fraction': 0.1}
+    BEAM_SEARCH_SETTINGS = {'beam_width': 50, 'seed_fraction': 0, 'time_limit': 1}
+    CHECKPOINT_INTERVAL = 60  # co ile sekund zapisywany jest punkt kontrolny
 
-    def __init__(self, cities, roads, max_distance):
-        self.cities = self.construct_cities(cities, roads)  # wczytane miasta
+    def __init__(self, cities, roads, max_distance, seed=None, graph=None):
+        # graph - gotowy Graph (np. wczytany z pliku binarnego), wtedy cities i roads nie są używane
+        self.graph = graph if graph is not None else self.construct_cities(cities, roads)  # miasta w postaci grafu
         self.max_distance = max_distance  # maksymalny dystans / czas pracy Komiwojażera
+        self.vectorized = True  # czy populacja ma być oceniana wektorowo (numpy) zamiast trasa po trasie
+        self.feasible_starts = None  # miasta, od których może zaczynać się poprawna trasa
+        self._route_cache = OrderedDict()  # krotka id miast -> (długość, zysk, poprawność, przyczyna niepoprawności)
+        self._route_cache_limit = None  # max_distance, dla którego ocenione są trasy w self._route_cache
+        self.route_cache_size = 0  # pojemność pamięci ocen tras (0 - wyłączona)
+        self.unique_routes = False  # czy przy tworzeniu kolejnej generacji pomijane są powtórzone trasy
+        self.statistics = dict()  # statystyki ostatniego uruchomienia (liczba iteracji, czas pracy)
+        self.metrics = None  # EvolutionMetrics zbierające szczegółowe statystyki generacji (None - wyłączone)
+        self.checkpoint_file = None  # plik z punktem kontrolnym (None - bez zapisywania stanu)
+        self.checkpoint_interval = self.CHECKPOINT_INTERVAL  # co ile sekund zapisywany jest punkt kontrolny
+        self.last_checkpoint = None  # stan z końca ostatniej optymalizacji (Checkpoint, tylko bez modelu wyspowego)
+        self.on_improvement = None  # funkcja wywoływana z każdą nową najlepszą trasą
+        self.stop_event = None  # ustawienie tego zdarzenia (metoda is_set) kończy optymalizację przed czasem
+        self.on_iteration = None  # funkcja (iteracja, najlepszy zysk, średni zysk) wywoływana w każdej generacji
+        self.seed = None  # ziarno generatora liczb losowych
+        self.rng = None  # generator liczb losowych, z którego korzysta algorytm
+        self.set_seed(seed)
 
     def find_optimal_route(self, n_iterations=None, population_size=None, mutation_rate=None, elite_size=None,
-                           time_limit=None, verbose=True):
+                           time_limit=None, verbose=True, vectorized=True, n_islands=1, migration_interval=50,
+                           migration_size=5, local_search_time=None, seed_fraction=None, metrics=None, seed=None,
+                           checkpoint_file=None, checkpoint_interval=None, resume_from=None, on_improvement=None,
+                           stop_event=None, on_iteration=None, route_cache_size=0, unique_routes=False):
+        # checkpoint_file - plik, do którego co checkpoint_interval sekund i na końcu optymalizacji zapisywany jest
+        # stan algorytmu; resume_from - Checkpoint, od którego należy wznowić optymalizację (hiperparametry, których
+        # nie podano, pochodzą z punktu kontrolnego, a n_iterations i time_limit to nowy budżet); on_improvement -
+        # funkcja wywoływana z każdą nową najlepszą trasą (w modelu wyspowym - w tym procesie, z tras przesłanych
+        # przez wyspy); stop_event - obiekt z metodą is_set() (np. threading.Event), którego ustawienie kończy
+        # optymalizację przed czasem (w modelu wyspowym jest przekazywane wyspom); on_iteration -
+        # funkcja (iteracja, najlepszy zysk, średni zysk) wywoływana po ocenie każdej generacji (np. ThrottledChannel);
+        # route_cache_size - pojemność pamięci ocen tras (domyślnie 0, czyli wyłączona: dzieci z krzyżowania
+        # i mutacji są zwykle oceniane przyrostowo, więc do pamięci trafiają głównie trasy, które się nie powtarzają);
+        # unique_routes - pomijanie powtórzonych tras przy tworzeniu kolejnej generacji (dopóki krzyżowanie daje
+        # jakiekolwiek nowe trasy)
+        if n_islands > 1 and (checkpoint_file is not None or resume_from is not None):
+            raise ValueError('Punkty kontrolne nie są obsługiwane w modelu wyspowym')
+        if resume_from is not None:
+            self._check_checkpoint(resume_from)
+            population_size = resume_from.settings['population_size'] if population_size is None else population_size
+            mutation_rate = resume_from.settings['mutation_rate'] if mutation_rate is None else mutation_rate
+            seed_fraction = resume_from.settings['seed_fraction'] if seed_fraction is None else seed_fraction
+
         # wybranie domyślnych wartości hiperparametrów, jeśli nie zostały podane
         if n_iterations is None:
             n_iterations = self.DEFAULT_SETTINGS['n_iterations']
@@ -144,93 +526,476 @@ class GeneticAlgorithm:
         if mutation_rate is None:
             mutation_rate = self.DEFAULT_SETTINGS['mutation_rate']
 
-        if elite_size is None:
-            elite_size = self.DEFAULT_SETTINGS['elite_size']
-        elite_size = int(population_size * elite_size)
+        if elite_size is not None:
+            elite_size = int(population_size * elite_size)
+        elif resume_from is not None:
+            elite_size = resume_from.settings['elite_size']
+        else:
+            elite_size = int(population_size * self.DEFAULT_SETTINGS['elite_size'])
 
         if time_limit is None:
             time_limit = self.DEFAULT_SETTINGS['time_limit']
 
+        if local_search_time is None:
+            local_search_time = self.DEFAULT_SETTINGS['local_search_time']
+
+        if seed_fraction is None:
+            seed_fraction = self.BEAM_SEARCH_SETTINGS['seed_fraction']
+
+        if checkpoint_interval is None:
+            checkpoint_interval = self.CHECKPOINT_INTERVAL
+
+        self.vectorized = vectorized
+        self.metrics = metrics if n_islands <= 1 else None  # wyspy pracują w osobnych procesach, bez metryk
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        self.on_improvement = on_improvement
+        self.stop_event = stop_event
+        self.on_iteration = on_iteration if n_islands <= 1 else None
+        self.last_checkpoint = None
+        self.route_cache_size = route_cache_size
+        self.unique_routes = unique_routes
+        self.preprocess()
+        start = time.time()
+        if resume_from is not None:
+            self.seed = resume_from.seed
+        else:
+            # generator jest ustawiany od nowa w każdym uruchomieniu, więc zapisane ziarno odtwarza każde z nich
+            # (a nie tylko pierwsze uruchomienie na tym obiekcie)
+            self.set_seed(self.seed if seed is None else seed)
+        self.statistics = {'iterations': 0, 'seed': self.seed}
+
+        if n_islands > 1:
+            # model wyspowy: niezależne populacje w osobnych procesach, wymieniające co jakiś czas najlepsze trasy
+            islands = IslandModel(n_islands, migration_interval, migration_size)
+            best_route_ids = islands.run(self, n_iterations=n_iterations, population_size=population_size,
+                                         mutation_rate=mutation_rate, elite_size=elite_size, time_limit=time_limit,
+                                         verbose=verbose, seed_fraction=seed_fraction, seed=self.seed,
+                                         on_improvement=self._report_island_improvement)
+            best_route = Route(best_route_ids, self.graph)
+            best_route.is_valid(self.max_distance)
+            self.statistics['iterations'] = sum(statistics['iterations'] for statistics in islands.statistics)
+            self.statistics['evaluated_routes'] = sum(statistics['evaluated_routes']
+                                                      for statistics in islands.statistics)
+            for name in ('route_cache_hits', 'route_cache_misses', 'duplicates_removed'):
+                self.statistics[name] = sum(statistics.get(name, 0) for statistics in islands.statistics)
+        else:
+            best_route = self._evolve(n_iterations, population_size, mutation_rate, elite_size, time_limit, verbose,
+                                      seed_fraction, resume_from=resume_from)
+
+        # poprawienie najlepszej trasy przeszukiwaniem lokalnym w osobnym przedziale czasu (pomijane po zatrzymaniu)
+        if local_search_time > 0 and not self.stopped:
+            improved_route = self.improve_route(best_route, local_search_time)
+            if improved_route is not best_route and self.on_improvement is not None:
+                self.on_improvement(improved_route)
+            best_route = improved_route
+        self.statistics['runtime'] = time.time() - start
+        self.statistics['stopped'] = self.stopped
+        lookups = self.statistics.get('route_cache_hits', 0) + self.statistics.get('route_cache_misses', 0)
+        if lookups:
+            self.statistics['route_cache_hit_rate'] = self.statistics['route_cache_hits'] / lookups
+        return best_route
+
+    def _report_island_improvement(self, route_ids):
+        # przekazanie coraz lepszej trasy przesłanej przez wyspę (lista id miast) do on_improvement
+        if self.on_improvement is not None:
+            route = Route(route_ids, self.graph)
+            route.is_valid(self.max_distance)
+            self.on_improvement(route)
+
+    def find_improving_routes(self, stop_event=None, **settings):
+        # generator kolejnych coraz lepszych tras znajdowanych przez find_optimal_route (settings to jej argumenty).
+        # Algorytm pracuje w osobnym wątku; przerwanie iteracji po generatorze (lub ustawienie stop_event)
+        # kończy optymalizację
+        if stop_event is None:
+            stop_event = threading.Event()
+        improvements = Queue()
+        finished = object()  # znacznik końca pracy algorytmu
+        errors = []
+
+        def run():
+            try:
+                self.find_optimal_route(on_improvement=improvements.put, stop_event=stop_event, **settings)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                improvements.put(finished)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                route = improvements.get()
+                if route is finished:
+                    break
+                yield route
+        finally:
+            stop_event.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    @property
+    def stopped(self):
+        # czy optymalizacja została zatrzymana z zewnątrz
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def add_road(self, city1, city2, distance):
+        # dodanie połączenia między miastami (nazwy miast) albo zmiana jego długości. Zmiany mapy uwzględnia
+        # metoda reoptimize
+        self.graph.set_road(self.graph.index[city1], self.graph.index[city2], distance)
+        self._route_cache.clear()
+
+    def remove_road(self, city1, city2):
+        # usunięcie połączenia między miastami (nazwy miast)
+        self.graph.remove_road(self.graph.index[city1], self.graph.index[city2])
+        self._route_cache.clear()
+
+    def set_profit(self, city, profit):
+        # zmiana zysku z odwiedzenia miasta (nazwa miasta); odległości się nie zmieniają
+        self.graph.set_profit(self.graph.index[city], profit)
+        self._route_cache.clear()
+
+    def set_max_distance(self, max_distance):
+        # zmiana czasu pracy Komiwojażera; pamięć ocen tras jest czyszczona w preprocess
+        self.max_distance = max_distance
+
+    def reoptimize(self, n_iterations=None, time_limit=None, **settings):
+        # kontynuacja ostatniej optymalizacji po zmianach mapy (add_road, remove_road, set_profit, set_max_distance):
+        # trasy populacji, które straciły połączenie albo przekraczają czas pracy, są skracane do najlepszego
+        # poprawnego fragmentu, a zbyt krótkie zastępowane losowymi. Bez poprzedniej optymalizacji zaczyna od początku
+        if self.last_checkpoint is None:
+            return self.find_optimal_route(n_iterations=n_iterations, time_limit=time_limit, **settings)
+        return self.find_optimal_route(n_iterations=n_iterations, time_limit=time_limit,
+                                       resume_from=self._repaired_checkpoint(self.last_checkpoint), **settings)
+
+    def _repaired_checkpoint(self, checkpoint):
+        # stan optymalizacji dopasowany do zmienionej mapy; historia poprawy wyniku zaczyna się od nowa, bo zyski
+        # sprzed zmian nie są porównywalne
+        self.preprocess()
+        population = [route for route in map(self._repair_route, checkpoint.population) if route is not None]
+        repaired_best = self._repair_route(checkpoint.best_route)
+        while len(population) < len(checkpoint.population):
+            candidates = [Route(self._create_initial_route(), self.graph)
+                          for _ in range(len(checkpoint.population) - len(population))]
+            population += [list(route.route) for route in self._select_valid(candidates)]
+        if repaired_best is None:
+            repaired_best = max(population, key=lambda route: Route(route, self.graph).fitness)
+        return Checkpoint(population, repaired_best, [], self.rng.getstate(), checkpoint.iteration,
+                          checkpoint.elapsed, checkpoint.seed, checkpoint.settings, self.graph.n_cities,
+                          self.max_distance)
+
+    def _repair_route(self, route):
+        # naprawa trasy (lista id miast) po zmianach mapy: trasa dzielona jest w miejscach usuniętych połączeń,
+        # a fragmenty przycinane do czasu pracy Komiwojażera; zostaje fragment o największym zysku albo None,
+        # jeśli każdy ma mniej niż 2 miasta
+        edges = self.graph.edges
+        n_cities = self.graph.n_cities
+        profit = self.graph.profit
+        best_segment, best_profit = None, None
+        start = 0
+        while start < len(route) - 1:
+            # najdłuższy poprawny fragment zaczynający się w mieście start
+            end, distance = start + 1, 0
+            while end < len(route):
+                edge = route[end - 1] * n_cities + route[end]
+                if edge not in edges or distance + edges[edge] > self.max_distance:
+                    break
+                distance += edges[edge]
+                end += 1
+            if end - start >= 2:
+                segment_profit = sum(profit[city_id] for city_id in set(route[start:end]))
+                if best_profit is None or segment_profit > best_profit:
+                    best_segment, best_profit = list(route[start:end]), segment_profit
+            if end == len(route):
+                break
+            # kolejny fragment zaczyna się za brakującym połączeniem albo w mieście, w którym fragment się skończył
+            if route[end - 1] * n_cities + route[end] not in edges:
+                start = end
+            else:
+                start = max(end - 1, start + 1)
+        return best_segment
+
+    def resume(self, file_path, n_iterations=None, time_limit=None, **settings):
+        # wznowienie optymalizacji z pliku z punktem kontrolnym z nowym budżetem iteracji i czasu; dalsze punkty
+        # kontrolne domyślnie zapisywane są do tego samego pliku
+        settings.setdefault('checkpoint_file', file_path)
+        return self.find_optimal_route(n_iterations=n_iterations, time_limit=time_limit,
+                                       resume_from=Checkpoint.load(file_path), **settings)
+
+    def _check_checkpoint(self, checkpoint):
+        # sprawdzenie czy punkt kontrolny pochodzi z tej samej mapy i tego samego czasu pracy Komiwojażera
+        if checkpoint.n_cities != self.graph.n_cities or checkpoint.max_distance != self.max_distance:
+            raise ValueError('Punkt kontrolny dotyczy innej mapy lub innego czasu pracy komiwojażera')
+
+    def _make_checkpoint(self, iteration, population, best_fit_per_iteration, elapsed, population_size,
+                         mutation_rate, elite_size, seed_fraction):
+        # stan optymalizacji przed wykonaniem iteracji iteration
+        best_route = max(best_fit_per_iteration, key=lambda r: r[1])[2]
+        settings = {'population_size': population_size, 'mutation_rate': mutation_rate, 'elite_size': elite_size,
+                    'seed_fraction': seed_fraction}
+        return Checkpoint([list(route.route) for route in population], list(best_route.route),
+                          list(self.statistics['history']), self.rng.getstate(), iteration, elapsed, self.seed,
+                          settings, self.graph.n_cities, self.max_distance)
+
+    def set_seed(self, seed=None):
+        # ustawienie ziarna generatora liczb losowych; bez ziarna jest ono losowane, żeby można było je zapisać
+        # razem z wynikiem i powtórzyć uruchomienie
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def find_fast_route(self, beam_width=None, time_limit=None):
+        # szybkie wyznaczenie dobrej trasy bez algorytmu genetycznego: przeszukiwanie wiązkowe, a w pozostałym czasie
+        # przeszukiwanie lokalne
+        if beam_width is None:
+            beam_width = self.BEAM_SEARCH_SETTINGS['beam_width']
+
+        if time_limit is None:
+            time_limit = self.BEAM_SEARCH_SETTINGS['time_limit']
+
+        start = time.time()
+        self.preprocess()
+        routes = BeamSearch(self.graph, self.max_distance).construct(beam_width, 1, self.feasible_starts, time_limit)
+        if not routes:
+            raise ValueError('Brak tras mieszczących się w czasie pracy komiwojażera')
+        best_route = Route(routes[0], self.graph)
+        return self.improve_route(best_route, max(time_limit - (time.time() - start), 0))
+
+    def improve_route(self, route, time_limit):
+        # poprawienie trasy przeszukiwaniem lokalnym; zwracana jest lepsza z tras (nowa lub oryginalna)
+        if not route.is_valid(self.max_distance):
+            return route
+        improved_route = Route(LocalSearch(self.graph, self.max_distance).improve(route.route, time_limit), self.graph)
+        if improved_route.is_valid(self.max_distance) and (improved_route.fitness, -improved_route.distance) \
+                > (route.fitness, -route.distance):
+            return improved_route
+        return route
+
+    def _evolve(self, n_iterations, population_size, mutation_rate, elite_size, time_limit, verbose, seed_fraction=0,
+                migration=None, resume_from=None):
+        # właściwa optymalizacja jednej populacji. migration to opcjonalna funkcja (iteracja, oceniona populacja),
+        # która zwraca listy id miast tras przybywających z innych populacji; resume_from to opcjonalny Checkpoint,
+        # od którego optymalizacja jest kontynuowana
         start = time.time()
         best_fit_per_iteration = []  # historia optymalizacji
-        population = self._create_first_population(population_size)
+        self.statistics['evaluated_routes'] = 0  # liczba utworzonych i ocenionych tras
+        if resume_from is None:
+            first_iteration, elapsed_before = 0, 0
+            self.statistics['history'] = []  # (czas od początku, zysk) dla każdej poprawy najlepszej trasy
+            population = self._create_first_population(population_size, seed_fraction)
+        else:
+            # odtworzenie populacji, najlepszej trasy i stanu generatora liczb losowych z punktu kontrolnego
+            first_iteration, elapsed_before = resume_from.iteration, resume_from.elapsed
+            self.statistics['history'] = list(resume_from.history)
+            self.rng.setstate(resume_from.rng_state)
+            population = [Route(route, self.graph) for route in resume_from.population]
+            self.evaluate_population(population)
+            best_route = Route(resume_from.best_route, self.graph)
+            best_route.is_valid(self.max_distance)
+            best_fit_per_iteration.append((first_iteration - 1, best_route.fitness, best_route))
+        self.statistics['evaluated_routes'] += len(population)
+        last_checkpoint = time.time()
 
         # główna pętli optymalizacji
-        for iteration in range(n_iterations):
-            ranked_population = self.rank_routes(population)  # oceniamy populację
+        iteration = next_iteration = first_iteration
+        for iteration in range(first_iteration, first_iteration + n_iterations):
+            ranked_population = self._timed('rank_routes', self.rank_routes, population)  # oceniamy populację
+            if migration is not None:
+                immigrants = migration(iteration, ranked_population)
+                if immigrants:
+                    ranked_population = self._accept_immigrants(ranked_population, immigrants)
             best_route = ranked_population[0]
-            elite = self._select_best_individuals(ranked_population, elite_size)  # i wybieramy najlepsze trasy
+            elite = self._timed('select_best_individuals', self._select_best_individuals, ranked_population,
+                                elite_size)  # i wybieramy najlepsze trasy
 
-            # wydrukowanie niektórych danych w czasie optymalizacji
-            if verbose:
+            # wydrukowanie niektórych danych w czasie optymalizacji i przekazanie ich odbiorcy przebiegu optymalizacji
+            if verbose or self.on_iteration is not None:
                 fitnesses = [individual.fitness for individual in ranked_population]
                 avg_score = sum(fitnesses) / len(fitnesses)
-                print(iteration, best_route.fitness, avg_score)
+                if verbose:
+                    print(iteration, best_route.fitness, avg_score)
+                if self.on_iteration is not None:
+                    self.on_iteration(iteration, best_route.fitness, avg_score)
 
             # zapisanie najlepszego wyników w iteracji
             best_fit_per_iteration.append((iteration, best_route.fitness, best_route))
+            if not self.statistics['history'] or best_route.fitness > self.statistics['history'][-1][1]:
+                self.statistics['history'].append((elapsed_before + time.time() - start, best_route.fitness))
+                if self.on_improvement is not None:
+                    self.on_improvement(best_route)
 
-            # przerwanie pracy jeśli optymalizacja przekroczyła dozwolony czas
-            if time.time() - start > time_limit:
-                print(f'Optimization terminated due to time limit after {iteration} iterations')
+            # przerwanie pracy jeśli optymalizacja przekroczyła dozwolony czas (po wznowieniu ta iteracja zostanie
+            # wykonana od początku)
+            if time.time() - start > time_limit or self.stopped:
+                if verbose:
+                    print(f'Optimization terminated due to {"stop request" if self.stopped else "time limit"} '
+                          f'after {iteration} iterations')
+                if self.metrics is not None:
+                    self.metrics.end_generation(iteration, ranked_population)
                 break
 
-            children = self._breed_population(elite, population_size)  # tworzenie dzieci
-            population = self._mutate_population(children, mutation_rate)  # mutacje
+            children = self._timed('breed_population', self._breed_population, elite, population_size)  # dzieci
+            population = self._timed('mutate_population', self._mutate_population, children, mutation_rate)  # mutacje
+            next_iteration = iteration + 1
+            if self.metrics is not None:
+                self.metrics.end_generation(iteration, ranked_population)
+
+            # okresowe zapisanie stanu optymalizacji
+            if self.checkpoint_file is not None and time.time() - last_checkpoint >= self.checkpoint_interval:
+                self._make_checkpoint(next_iteration, population, best_fit_per_iteration,
+                                      elapsed_before + time.time() - start, population_size, mutation_rate,
+                                      elite_size, seed_fraction).save(self.checkpoint_file)
+                last_checkpoint = time.time()
+
+        self.statistics['iterations'] = iteration - first_iteration + 1 if n_iterations > 0 else 0
+        self.last_checkpoint = self._make_checkpoint(next_iteration, population, best_fit_per_iteration,
+                                                     elapsed_before + time.time() - start, population_size,
+                                                     mutation_rate, elite_size, seed_fraction)
+        if self.checkpoint_file is not None:
+            self.last_checkpoint.save(self.checkpoint_file)
 
         # wybranie najlepszego wyników w historii iteracji i zwrócenie jako wynik
         *other, best_score, best_route = sorted(best_fit_per_iteration, key=lambda r: r[1], reverse=True)[0]
         return best_route
 
+    def _timed(self, phase, function, *args):
+        # wywołanie fazy algorytmu, z pomiarem czasu tylko gdy zbierane są metryki
+        if self.metrics is None:
+            return function(*args)
+        return self.metrics.timed(phase, function, *args)
+
+    def _accept_immigrants(self, ranked_population, immigrants):
+        # zastąpienie najsłabszych tras poprawnymi trasami przybyłymi z innych populacji
+        immigrants = self._select_valid([Route(list(route), self.graph) for route in immigrants])
+        immigrants = immigrants[:len(ranked_population)]
+        if not immigrants:
+            return ranked_population
+        return self.rank_routes(ranked_population[:len(ranked_population) - len(immigrants)] + immigrants)
+
     @staticmethod
     def construct_cities(cities, roads):
-        # przekształcenie surowych danych na obiekty typu City
-        constructed_cities = dict()
-        for city_id, x, y, profit in cities:
-            constructed_cities[city_id] = City(city_id, x, y, profit)
+        # przekształcenie surowych danych na graf z miastami ponumerowanymi liczbami całkowitymi
+        return Graph.from_data(cities, roads)
 
-        for city1, city2, distance in roads:
-            constructed_cities[city1].add_connection(city2, distance)
-            constructed_cities[city2].add_connection(city1, distance)
+    def preprocess(self):
+        # przygotowanie danych, które nie zmieniają się w czasie optymalizacji: miasta, od których może zaczynać się
+        # poprawna trasa (mające połączenie nie dłuższe niż max_distance)
+        if self._route_cache_limit != self.max_distance:
+            self._route_cache.clear()  # poprawność tras zależy od max_distance
+            self._route_cache_limit = self.max_distance
 
-        return constructed_cities
+        self.feasible_starts = [city_id for city_id in range(self.graph.n_cities)
+                                if any(distance <= self.max_distance
+                                       for _, distance in self.graph.connections_of(city_id))]
 
     def _create_initial_route(self):
         # przygotowanie losowej, ale poprawnej trasy
-        starting_city = random.choice(list(self.cities.values()))  # wybranie losowego miasta początkowego
-        route_cities = [starting_city]
-        route_ids = [starting_city.id]
+        if self.feasible_starts is None:
+            self.preprocess()
+        if not self.feasible_starts:
+            # żadne połączenie nie mieści się w limicie, więc nie istnieje poprawna trasa
+            raise ValueError('Brak tras mieszczących się w czasie pracy komiwojażera')
+
+        starting_city = self.rng.choice(self.feasible_starts)  # wybranie losowego miasta początkowego
+        route_ids = [starting_city]
+        visited = {starting_city}
         distance = 0
         while True:
+            # pomijamy połączenia, które nie mieszczą się w pozostałym czasie pracy Komiwojażera
+            remaining = self.max_distance - distance
+            possible_next_cities = [[c_id, d] for c_id, d in self.graph.connections_of(route_ids[-1])
+                                    if d <= remaining]
+            if not possible_next_cities:
+                return route_ids
+
             # wybranie losowego, jeszcze nieodwiedzonego miasta, które można dołączyć do trasy
-            possible_next_cities = route_cities[-1].connected_cities
-            unvisited_possible_next_cities = [[c_id, d] for c_id, d in possible_next_cities.items()
-                                              if c_id not in route_ids]
+            unvisited_possible_next_cities = [[c_id, d] for c_id, d in possible_next_cities if c_id not in visited]
             if unvisited_possible_next_cities:
-                next_city, distance_to_city = random.choice(unvisited_possible_next_cities)
+                next_city, distance_to_city = self.rng.choice(unvisited_possible_next_cities)
             else:
-                # jeśli nie ma nieodwiedzonych miast to wybieramy losowo odwiedzone
-                next_city, distance_to_city = random.choice(list(possible_next_cities.items()))
+                # jeśli nie ma nieodwiedzonych sąsiadów to idziemy w stronę najbliższego nieodwiedzonego miasta,
+                # a jeśli żadne nie jest osiągalne w pozostałym czasie, to dalsza trasa nie zwiększy zysku
+                next_city, distance_to_city = self._step_towards_unvisited(route_ids[-1], visited, remaining)
+                if next_city is None:
+                    return route_ids
 
-            # dodajemy miasto do trasy jeśli łączna długość nie przekroczy limitu czasu pracy Komiwojażera
-            # w przeciwnym wypadku nie dodajemy i zwracamy trasę
-            if distance + distance_to_city > self.max_distance:
-                return route_ids
-            else:
-                route_cities.append(self.cities[next_city])
-                route_ids.append(next_city)
-                distance += distance_to_city
+            route_ids.append(next_city)
+            visited.add(next_city)
+            distance += distance_to_city
+
+    def _step_towards_unvisited(self, city_id, visited, remaining):
+        # pierwszy krok najkrótszej drogi z miasta city_id do najbliższego nieodwiedzonego miasta osiągalnego
+        # w czasie remaining (przeszukiwanie kończy się na pierwszym takim mieście, więc nie liczy odległości do
+        # całego grafu). Zwraca (None, None) jeśli takiego miasta nie ma
+        return self.graph.step_towards(city_id, lambda target: target not in visited, remaining)
 
-    def _create_first_population(self, population_size):
-        # przygotowanie początkowej losowej populacji
-        init_population = []
+    def _create_first_population(self, population_size, seed_fraction=0):
+        # przygotowanie początkowej populacji: część seed_fraction tras pochodzi z przeszukiwania wiązkowego,
+        # a pozostałe są losowe
+        init_population = self._create_seed_routes(int(population_size * seed_fraction))
         while len(init_population) < population_size:
-            individual = self._create_initial_route()
-            individual = Route(individual, self.cities)
-            if individual.is_valid(self.max_distance):
-                init_population.append(individual)
+            candidates = [Route(self._create_initial_route(), self.graph)
+                          for _ in range(population_size - len(init_population))]
+            init_population += self._select_valid(candidates)
         return init_population
 
+    def _create_seed_routes(self, n_routes):
+        # przygotowanie n_routes dobrych tras przeszukiwaniem wiązkowym z losowo wybranych miast początkowych
+        if n_routes <= 0:
+            return []
+        if self.feasible_starts is None:
+            self.preprocess()
+
+        beam_width = max(self.BEAM_SEARCH_SETTINGS['beam_width'], n_routes)
+        start_cities = self.rng.sample(self.feasible_starts, min(beam_width, len(self.feasible_starts)))
+        routes = BeamSearch(self.graph, self.max_distance).construct(beam_width, n_routes, start_cities)
+        return self._select_valid([Route(route, self.graph) for route in routes])
+
+    def evaluate_population(self, routes):
+        # ocena tras, które nie zostały jeszcze sprawdzone: wektorowo całą partią albo trasa po trasie. Wyniki
+        # pamiętane są dla ostatnio ocenianych tras, więc powtórzone trasy nie są oceniane ponownie
+        pending = [route for route in routes if route.valid is None]
+        if self.route_cache_size:
+            pending = self._recall_evaluations(pending)
+        if self.vectorized:
+            PopulationMatrix.evaluate_routes(pending, self.graph, self.max_distance)
+        else:
+            for route in pending:
+                route.is_valid(self.max_distance)
+        if self.route_cache_size:
+            self._remember_evaluations(pending)
+
+    def _recall_evaluations(self, routes):
+        # uzupełnienie ocen tras zapamiętanych w pamięci ocen; zwraca trasy, których tam nie było
+        cache = self._route_cache
+        missing = []
+        for route in routes:
+            key = tuple(route.route)
+            evaluation = cache.get(key)
+            if evaluation is None:
+                missing.append(route)
+            else:
+                cache.move_to_end(key)
+                route._distance, route._fitness, route.valid, route.invalid_cause = evaluation
+        self.statistics['route_cache_hits'] = self.statistics.get('route_cache_hits', 0) + len(routes) - len(missing)
+        self.statistics['route_cache_misses'] = self.statistics.get('route_cache_misses', 0) + len(missing)
+        return missing
+
+    def _remember_evaluations(self, routes):
+        # zapamiętanie ocen tras i usunięcie najdawniej używanych, jeśli pamięć jest pełna
+        cache = self._route_cache
+        for route in routes:
+            cache[tuple(route.route)] = (route._distance, route._fitness, route.valid, route.invalid_cause)
+        while len(cache) > self.route_cache_size:
+            cache.popitem(last=False)
+
+    def _select_valid(self, routes):
+        # wybranie tylko poprawnych tras
+        self.evaluate_population(routes)
+        return [route for route in routes if route.valid]
+
     @staticmethod
     def rank_routes(population):
         # posortowanie tras względem zysku, który przynoszą
@@ -245,18 +1010,40 @@ class GeneticAlgorithm:
     def _breed_population(self, mating_pool, population_size):
         # rozmnożenie populacji do czasu uzyskania wymaganej liczebności
         children = list(copy.copy(mating_pool))
+        seen = {tuple(child.route) for child in children} if self.unique_routes else None
 
         while len(children) < population_size:
-            p1, p2 = random.choices(mating_pool, k=2)
-            offspring = self._breed(p1, p2)
-            if not offspring:
-                continue
-            else:
-                children += offspring
+            # dzieci tworzone są partiami i oceniane razem, a do populacji trafiają tylko poprawne
+            offspring = []
+            for _ in range((population_size - len(children) + 1) // 2):
+                p1, p2 = self.rng.choices(mating_pool, k=2)
+                offspring += self._breed(p1, p2)
+            self.statistics['evaluated_routes'] = self.statistics.get('evaluated_routes', 0) + len(offspring)
+            valid_offspring = self._select_valid(offspring)
+            if self.metrics is not None:
+                self.metrics.count_rejected(offspring)
+            if seen is not None:
+                valid_offspring = self._drop_duplicates(valid_offspring, seen)
+            children += valid_offspring
         return children
 
+    def _drop_duplicates(self, routes, seen):
+        # usunięcie tras, które są już w tworzonej generacji (seen - zbiór krotek id miast). Jeśli wszystkie trasy są
+        # powtórzeniami (populacja jest już bardzo jednolita), zwracane są bez zmian, żeby generacja się zapełniła
+        unique = []
+        for route in routes:
+            key = tuple(route.route)
+            if key not in seen:
+                seen.add(key)
+                unique.append(route)
+        if not unique:
+            return routes
+        self.statistics['duplicates_removed'] = self.statistics.get('duplicates_removed', 0) + len(routes) - len(unique)
+        return unique
+
     def _breed(self, p1, p2):
-        # skrzyżowanie dwóch tras w celu uzyskania dzieci
+        # skrzyżowanie dwóch tras w celu uzyskania dzieci (dzieci, których nie dało się ocenić przyrostowo,
+        # są oceniane później)
         children = []
         # jeśli rodzice nie mają wspólnych miast to nie są w stanie stworzyć potomstwa
         common_genes = set(p1.route) & set(p2.route)
@@ -264,48 +1051,49 @@ class GeneticAlgorithm:
             return children
 
         # wybranie wspólnego genu, w miejscu którego nastąpi krzyżowanie
-        gene_for_division = random.choice(list(common_genes))
+        gene_for_division = self.rng.choice(list(common_genes))
         p1_indices_of_division_gene = [idx for idx, x in enumerate(p1.route) if x == gene_for_division]
         p2_indices_of_division_gene = [idx for idx, x in enumerate(p2.route) if x == gene_for_division]
 
-        p1_gene_idx = random.choice(p1_indices_of_division_gene)
-        p2_gene_idx = random.choice(p2_indices_of_division_gene)
-
-        # krzyżowanie
-        c1 = p1.route[:p1_gene_idx] + p2.route[p2_gene_idx:]
-        c2 = p1.route[:p2_gene_idx] + p2.route[p1_gene_idx:]
-
-        # stworzenie dzieci
-        c1 = Route(c1, self.cities)
-        c2 = Route(c2, self.cities)
-
-        # zwrócenie tylko tych tras, które są poprawne
-        if c1.is_valid(self.max_distance):
-            children.append(c1)
+        # jeśli to możliwe, wybieramy miejsca krzyżowania, dla których pierwsze dziecko zmieści się w czasie pracy
+        # Komiwojażera (długość dziecka wynika z odległości od początku tras rodziców)
+        if p1.valid and p2.valid:
+            fitting_divisions = [(idx1, idx2) for idx1 in p1_indices_of_division_gene
+                                 for idx2 in p2_indices_of_division_gene
+                                 if p1.prefix_distances[idx1] + p2.distance - p2.prefix_distances[idx2]
+                                 <= self.max_distance]
+        else:
+            fitting_divisions = None
 
-        if c2.is_valid(self.max_distance):
-            children.append(c2)
+        if fitting_divisions:
+            p1_gene_idx, p2_gene_idx = self.rng.choice(fitting_divisions)
+        else:
+            p1_gene_idx = self.rng.choice(p1_indices_of_division_gene)
+            p2_gene_idx = self.rng.choice(p2_indices_of_division_gene)
 
+        # krzyżowanie; długość, zysk i poprawność dzieci liczone są przyrostowo na podstawie rodziców
+        children.append(p1.spliced(p2, p1_gene_idx, p2_gene_idx, self.max_distance))
+        children.append(p1.spliced(p2, p2_gene_idx, p1_gene_idx, self.max_distance))
         return children
 
-    def _mutate(self, individual, mutation_rate):
-        # dokonanie mutacji w losowym miejscu jeśli jest to możliwe
-
-        if random.random() > mutation_rate:
-            return individual
-        route = copy.copy(individual.route)
-        # route = individual.route
-        # wybieramy punkt, w którym dokonamy mutacji i dodajemy losowe miasto, które jest wspólne dla obu miast wokół
-        # tego punktu
-        insertion_point = random.choice(('start', 'end'))
+    def _create_mutant(self, individual):
+        # stworzenie zmutowanej trasy; dla poprawnego osobnika długość, zysk i poprawność mutanta liczone są przyrostowo
+        route = individual.route
+        # wybieramy koniec trasy, do którego dodamy losowego sąsiada skrajnego miasta
+        insertion_point = self.rng.choice(('start', 'end'))
         if insertion_point == 'start':
             city = route[0]
-            random_neighbour = random.choice(list(self.cities[city].connected_cities.keys()))
-            new_route = [random_neighbour] + route
         else:
             city = route[-1]
-            random_neighbour = random.choice(list(self.cities[city].connected_cities.keys()))
-            new_route = route + [random_neighbour]
+        if individual.valid:
+            # pomijamy sąsiadów, do których połączenie nie mieści się w pozostałym czasie pracy Komiwojażera
+            remaining = self.max_distance - individual.distance
+            possible_neighbours = [c_id for c_id, d in self.graph.connections_of(city) if d <= remaining]
+            if not possible_neighbours:
+                return individual
+        else:
+            possible_neighbours = self.graph.neighbours_of(city)
+        random_neighbour = self.rng.choice(possible_neighbours)
         # else:
         #     city1 = route[insertion_point - 1]
         #     city2 = route[insertion_point]
@@ -318,14 +1106,19 @@ class GeneticAlgorithm:
         #     common_neighbour = random.choice(list(common_neighbours))
         #     new_route = route[:insertion_point] = [common_neighbour] + route[insertion_point:]
 
-        # stworzenie nowej trasy i zwrócenie jej tylko w przypadku gdy jest poprawna
-        mutant = Route(new_route, self.cities)
-
-        if mutant.is_valid(self.max_distance):
-            return mutant
-        else:
-            return individual
+        return individual.extended(random_neighbour, insertion_point == 'start', self.max_distance)
 
     def _mutate_population(self, population, mutation_rate):
-        # przeprowadzenie mutacji na całej populacji
-        return tuple(self._mutate(individual, mutation_rate) for individual in population)
+        # przeprowadzenie mutacji na całej populacji: mutanty oceniane są razem i zastępują oryginał tylko wtedy,
+        # gdy są poprawne
+        population = list(population)
+        mutated_indices = [idx for idx in range(len(population)) if self.rng.random() <= mutation_rate]
+        mutants = [self._create_mutant(population[idx]) for idx in mutated_indices]
+        self.statistics['evaluated_routes'] = self.statistics.get('evaluated_routes', 0) + len(mutants)
+        self.evaluate_population(mutants)
+        if self.metrics is not None:
+            self.metrics.count_rejected(mutants)
+        for idx, mutant in zip(mutated_indices, mutants):
+            if mutant.valid:
+                population[idx] = mutant
+        return tuple(population)
@@ -0,0 +1,134 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import IO
+import cli
+from algorithm import GeneticAlgorithm
+
+# rozwiązywanie wielu map naraz w puli procesów. Plik manifestu to csv z wierszami:
+# plik miast, plik połączeń, plik czasu pracy Komiwojażera[, limit czasu optymalizacji[, plik rozwiązania]]
+# (ścieżki względne liczone są względem katalogu manifestu). Limit czasu optymalizacji jest przekazywany algorytmowi
+# i nie przerywa procesu z puli: wczytanie danych i przeszukiwanie lokalne mogą wydłużyć zadanie ponad ten limit
+SUMMARY_HEADER = ['job', 'cities', 'roads', 'salesman_max_time', 'solver', 'status', 'profit', 'distance', 'runtime',
+                  'iterations', 'seed', 'solution']
+
+
+def read_manifest(manifest_file, output_directory):
+    # wczytanie listy zadań z pliku manifestu; niepoprawny wiersz kończy się ValueError z numerem linii
+    base_directory = os.path.dirname(os.path.abspath(manifest_file))
+    jobs = []
+    for line, row in enumerate(IO.read_csv(manifest_file), start=1):
+        row = [element.strip() for element in row]
+        if not row or not row[0] or row[0].startswith('#'):
+            continue
+
+        if len(row) < 3 or not all(row[:3]):
+            raise ValueError(f'{manifest_file}:{line}: wymagane są pliki miast, połączeń i czasu pracy Komiwojażera')
+        cities, roads, salesman_max_time = [os.path.join(base_directory, path) for path in row[:3]]
+        try:
+            time_limit = float(row[3]) if len(row) > 3 and row[3] else None
+        except ValueError:
+            raise ValueError(f'{manifest_file}:{line}: niepoprawny limit czasu optymalizacji {row[3]!r}') from None
+        if time_limit is not None and time_limit <= 0:
+            raise ValueError(f'{manifest_file}:{line}: limit czasu optymalizacji powinien być większy od 0')
+        if len(row) > 4 and row[4]:
+            solution = os.path.join(base_directory, row[4])
+        else:
+            name = os.path.splitext(os.path.basename(cities))[0]
+            solution = os.path.join(output_directory, f'{len(jobs)}_{name}_solution.txt')
+        jobs.append({'job': len(jobs), 'cities': cities, 'roads': roads, 'salesman_max_time': salesman_max_time,
+                     'time_limit': time_limit, 'solution': solution})
+    return jobs
+
+
+def run_job(job, solver, settings):
+    # rozwiązanie jednej mapy (wykonywane w procesie z puli); zwraca wiersz tabeli podsumowania
+    summary = {'job': job['job'], 'cities': job['cities'], 'roads': job['roads'],
+               'salesman_max_time': job['salesman_max_time'], 'solver': solver, 'profit': '', 'distance': '',
+               'runtime': '', 'iterations': '', 'seed': '', 'solution': ''}
+    start = time.time()
+    try:
+        cities, roads, salesman_max_time, infos = cli.read_instance(job['cities'], job['roads'],
+                                                                    job['salesman_max_time'])
+        job_settings = dict(settings, verbose=False)
+        if job['time_limit'] is not None:
+            job_settings['time_limit'] = job['time_limit']
+        route, statistics = cli.solve(cities, roads, salesman_max_time, solver=solver, **job_settings)
+    except Exception as e:
+        summary.update(status=f'error: {e}', runtime=round(time.time() - start, 3))
+        return summary
+
+    summary.update(runtime=round(time.time() - start, 3), iterations=statistics['iterations'],
+                   seed=statistics.get('seed', ''))
+    if route is None or not route.is_valid(salesman_max_time):
+        summary['status'] = 'no valid route'
+        return summary
+
+    summary.update(status='ok', profit=route.fitness, distance=route.distance,
+                   solution=cli.save_route(route, job['solution']))
+    return summary
+
+
+def run_batch(jobs, solver='ga', workers=None, **settings):
+    # rozwiązanie wszystkich zadań w puli workers procesów; zwraca wiersze podsumowania w kolejności zadań
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, job, solver, settings) for job in jobs]
+        for future in as_completed(futures):
+            summary = future.result()
+            print(f'{summary["job"]}: {summary["status"]} {summary["profit"]} ({summary["runtime"]} s)')
+            summaries.append(summary)
+    return sorted(summaries, key=lambda summary: summary['job'])
+
+
+def save_summary(summaries, file_path):
+    # zapisanie tabeli podsumowania do pliku csv
+    rows = [SUMMARY_HEADER] + [[summary[column] for column in SUMMARY_HEADER] for summary in summaries]
+    IO.save_csv(rows, file_path)
+
+
+def parse_arguments(arguments=None):
+    # wczytanie argumentów linii poleceń
+    parser = argparse.ArgumentParser(description='Rozwiązywanie wielu map Komiwojażera w puli procesów')
+    parser.add_argument('manifest', help='plik csv z listą zadań')
+    parser.add_argument('-d', '--output-directory', default='.', help='katalog na rozwiązania bez podanej ścieżki')
+    parser.add_argument('-s', '--summary', default='summary.csv', help='plik z tabelą podsumowania')
+    parser.add_argument('-w', '--workers', type=int, help='liczba procesów (domyślnie liczba rdzeni)')
+    parser.add_argument('--solver', choices=cli.SOLVERS, default='ga')
+    parser.add_argument('--time-limit', type=float,
+                        help='domyślny limit czasu optymalizacji jednej mapy (nie przerywa zadania)')
+    parser.add_argument('--n-iterations', type=int)
+    parser.add_argument('--population-size', type=int)
+    parser.add_argument('--elite-size', type=float)
+    parser.add_argument('--mutation-rate', type=float)
+    parser.add_argument('--local-search-time', type=float,
+                        default=GeneticAlgorithm.ENHANCED_SETTINGS['local_search_time'])
+    parser.add_argument('--seed-fraction', type=float, default=GeneticAlgorithm.ENHANCED_SETTINGS['seed_fraction'])
+    parser.add_argument('--beam-width', type=int)
+    parser.add_argument('--seed', type=int, help='ziarno generatora liczb losowych wspólne dla wszystkich zadań')
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    args = parse_arguments(arguments)
+    os.makedirs(args.output_directory, exist_ok=True)
+    try:
+        jobs = read_manifest(args.manifest, args.output_directory)
+    except (OSError, ValueError) as e:
+        print(f'Błąd podczas wczytywania manifestu: {e}', file=sys.stderr)
+        return 2
+    summaries = run_batch(jobs, solver=args.solver, workers=args.workers, time_limit=args.time_limit,
+                          n_iterations=args.n_iterations, population_size=args.population_size,
+                          elite_size=args.elite_size, mutation_rate=args.mutation_rate,
+                          local_search_time=args.local_search_time, seed_fraction=args.seed_fraction,
+                          beam_width=args.beam_width, seed=args.seed)
+    save_summary(summaries, args.summary)
+    print(f'Podsumowanie zapisane do {args.summary}')
+    return 0 if all(summary['status'] == 'ok' for summary in summaries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import heapq
+import time
+
+
+class BeamSearch:
+    # budowanie tras przeszukiwaniem wiązkowym: w każdym kroku wszystkie trasy z wiązki są przedłużane o sąsiednie
+    # miasta mieszczące się w pozostałym czasie, a do następnego kroku przechodzi beam_width tras o największym
+    # zysku na jednostkę odległości. Trasy kończące się w tym samym mieście z tym samym zbiorem odwiedzonych miast
+    # są zastępowane najlepszą z nich
+    def __init__(self, graph, max_distance):
+        self.graph = graph  # Graph
+        self.max_distance = max_distance  # maksymalny dystans / czas pracy Komiwojażera
+
+    def construct(self, beam_width, n_routes=1, start_cities=None, time_limit=None):
+        # zwraca do n_routes najlepszych różnych tras (listy id miast) posortowanych malejąco według zysku
+        deadline = None if time_limit is None else time.time() + time_limit
+        if start_cities is None:
+            start_cities = range(self.graph.n_cities)
+
+        # stan trasy to (zysk, długość, miasto końcowe, odwiedzone miasta jako maska bitowa, poprzedni stan)
+        beam = [(self.graph.profit[city_id], 0, city_id, 1 << city_id, None) for city_id in start_cities]
+        beam = heapq.nlargest(beam_width, beam, key=self._score)
+        best = []  # kopiec najlepszych zakończonych tras: (zysk, -długość, numer, stan)
+        counter = 0
+
+        while beam:
+            expanded = dict()  # (miasto końcowe, odwiedzone miasta) -> najlepszy stan
+            for state in beam:
+                profit, distance, city_id, visited, _ = state
+                extended = False
+                for neighbour, road_distance in self.graph.connections_of(city_id):
+                    new_distance = distance + road_distance
+                    if new_distance > self.max_distance:
+                        continue
+                    extended = True
+                    new_visited = visited | (1 << neighbour)
+                    new_profit = profit if visited >> neighbour & 1 else profit + self.graph.profit[neighbour]
+                    key = (neighbour, new_visited)
+                    if key not in expanded or (new_profit, -new_distance) > expanded[key][:2]:
+                        expanded[key] = (new_profit, new_distance, neighbour, new_visited, state)
+
+                # trasa, której nie da się przedłużyć, jest gotowa (poprawna trasa ma co najmniej dwa miasta)
+                if not extended and state[4] is not None:
+                    counter += 1
+                    self._keep_best(best, (profit, -distance, counter, state), n_routes)
+
+            beam = heapq.nlargest(beam_width, expanded.values(), key=self._score)
+
+            if deadline is not None and time.time() > deadline:
+                # po przekroczeniu czasu bieżąca wiązka jest traktowana jako gotowe trasy
+                for state in beam:
+                    counter += 1
+                    self._keep_best(best, (state[0], -state[1], counter, state), n_routes)
+                break
+
+        return [self._route(state) for *_, state in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _score(state):
+        # zysk na jednostkę odległości (przy równym stosunku lepsza jest trasa o większym zysku)
+        profit, distance = state[0], state[1]
+        return (profit / distance if distance else float('inf')), profit
+
+    @staticmethod
+    def _keep_best(best, item, n_routes):
+        # dodanie trasy do kopca najlepszych tras z zachowaniem co najwyżej n_routes tras
+        if len(best) < n_routes:
+            heapq.heappush(best, item)
+        elif item > best[0]:
+            heapq.heapreplace(best, item)
+
+    @staticmethod
+    def _route(state):
+        # odtworzenie trasy (listy id miast) z łańcucha stanów
+        route = []
+        while state is not None:
+            route.append(state[2])
+            state = state[4]
+        return route[::-1]
@@ -0,0 +1,216 @@
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cli
+from algorithm import GeneticAlgorithm
+
+try:
+    import resource
+except ImportError:  # brak modułu resource na Windowsie
+    resource = None
+
+# pomiary wydajności algorytmów na generowanych mapach w postaci siatki. Każdy przypadek uruchamiany jest w osobnym,
+# świeżym procesie (spawn), żeby pomiar szczytowego zużycia pamięci nie obejmował poprzednich przypadków
+PROFIT_DISTRIBUTIONS = ('uniform', 'constant', 'exponential', 'clustered')
+
+# zestawy przypadków: (nazwa, liczba miast, gęstość połączeń, rozkład zysku, algorytm, limit czasu w sekundach)
+SUITES = {
+    'quick': [
+        ('grid10', 10, 1.0, 'uniform', 'ga', 1),
+        ('grid100', 100, 0.9, 'uniform', 'ga', 2),
+        ('grid1k', 1000, 0.8, 'exponential', 'ga', 3),
+        ('grid1k_beam', 1000, 0.8, 'exponential', 'beam', 1),
+    ],
+    'full': [
+        ('grid10', 10, 1.0, 'uniform', 'ga', 2),
+        ('grid100', 100, 0.9, 'uniform', 'ga', 5),
+        ('grid1k', 1000, 0.8, 'exponential', 'ga', 10),
+        ('grid1k_clustered', 1000, 0.8, 'clustered', 'ga', 10),
+        ('grid10k', 10000, 0.7, 'uniform', 'ga', 15),
+        ('grid100k', 100000, 0.7, 'uniform', 'ga', 30),
+        ('grid10k_beam', 10000, 0.7, 'uniform', 'beam', 5),
+        ('grid100k_beam', 100000, 0.7, 'uniform', 'beam', 10),
+    ],
+}
+TARGET_FRACTION = 0.95  # czas dojścia do celu liczony jest dla tego odsetka zysku z linii bazowej
+DEFAULT_TOLERANCE = 0.1  # dopuszczalny względny spadek zysku i przepustowości względem linii bazowej
+BASELINE_METRICS = ('final_profit', 'generations_per_second', 'routes_per_second')  # metryki sprawdzane w regresji
+
+
+def generate_grid_instance(n_cities, density=1.0, profit_distribution='uniform', seed=0, max_distance=None):
+    # wygenerowanie mapy: n_cities miast na kwadratowej siatce, połączenia długości 1 między sąsiadami w poziomie
+    # i w pionie (każde zachowane z prawdopodobieństwem density). Zwraca (miasta, połączenia, czas pracy Komiwojażera)
+    if profit_distribution not in PROFIT_DISTRIBUTIONS:
+        raise ValueError(f'Nieznany rozkład zysku {profit_distribution}')
+    rng = random.Random(seed)
+    width = math.ceil(math.sqrt(n_cities))
+    hotspots = [(rng.uniform(0, width), rng.uniform(0, width)) for _ in range(max(1, width // 10))]
+
+    cities = []
+    for idx in range(n_cities):
+        x, y = idx % width, idx // width
+        if profit_distribution == 'uniform':
+            profit = rng.randint(1, 100)
+        elif profit_distribution == 'constant':
+            profit = 1
+        elif profit_distribution == 'exponential':
+            profit = int(rng.expovariate(1 / 20)) + 1
+        else:
+            nearest = min(math.hypot(x - hx, y - hy) for hx, hy in hotspots)
+            profit = int(100 * math.exp(-nearest / 3)) + rng.randint(0, 5)
+        cities.append([f'Miasto{idx}', float(x), float(y), float(profit)])
+
+    roads = []
+    for idx in range(n_cities):
+        x = idx % width
+        if x + 1 < width and idx + 1 < n_cities and rng.random() < density:
+            roads.append([f'Miasto{idx}', f'Miasto{idx + 1}', 1.0])
+        if idx + width < n_cities and rng.random() < density:
+            roads.append([f'Miasto{idx}', f'Miasto{idx + width}', 1.0])
+
+    if max_distance is None:
+        max_distance = 2 * width
+    return cities, roads, max_distance
+
+
+def peak_memory():
+    # szczytowe zużycie pamięci bieżącego procesu w MB (None jeśli system nie udostępnia tej informacji)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux podaje wartość w KB, macOS w bajtach
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def time_to_target(history, target_profit):
+    # czas, po którym najlepsza trasa osiągnęła zysk target_profit (None jeśli nie osiągnęła)
+    for elapsed, profit in history:
+        if profit >= target_profit:
+            return round(elapsed, 3)
+    return None
+
+
+def run_case(case, seed=0, target_profit=None):
+    # uruchomienie jednego przypadku z ustalonym ziarnem i zebranie metryk
+    name, n_cities, density, profit_distribution, solver, time_limit = case
+    cities, roads, max_distance = generate_grid_instance(n_cities, density, profit_distribution, seed)
+
+    # populacja algorytmu genetycznego jest częściowo z przeszukiwania wiązkowego (tak jak w zapisanej linii bazowej),
+    # a przeszukiwanie lokalne jest wyłączone, żeby mierzyć sam algorytm genetyczny
+    start = time.time()
+    route, statistics = cli.solve(cities, roads, max_distance, solver=solver, time_limit=time_limit, verbose=False,
+                                  local_search_time=0, seed=seed,
+                                  seed_fraction=GeneticAlgorithm.ENHANCED_SETTINGS['seed_fraction'])
+    runtime = time.time() - start
+
+    final_profit = route.fitness if route is not None and route.is_valid(max_distance) else 0
+    history = statistics.get('history', [(runtime, final_profit)])
+    if target_profit is None:
+        target_profit = TARGET_FRACTION * final_profit
+    # metryki, których dany algorytm nie mierzy (generacje ma tylko algorytm genetyczny, a liczbę ocenionych tras
+    # tylko algorytmy ją zliczające), mają wartość None i są pomijane przy porównaniu z linią bazową
+    generations = statistics['iterations'] if solver == 'ga' else None
+    evaluated_routes = statistics.get('evaluated_routes')
+    return {
+        'case': name, 'n_cities': n_cities, 'solver': solver, 'seed': seed,
+        'final_profit': final_profit,
+        'runtime': round(runtime, 3),
+        'generations': generations,
+        'generations_per_second': round(generations / runtime, 2) if generations is not None and runtime else None,
+        'routes_per_second': round(evaluated_routes / runtime, 1) if evaluated_routes is not None and runtime else None,
+        'target_profit': target_profit,
+        'time_to_target': time_to_target(history, target_profit),
+        'peak_memory_mb': peak_memory(),
+    }
+
+
+def run_suite(cases, seed=0, baseline=None):
+    # uruchomienie przypadków po kolei, każdego w nowym procesie; cel zysku wynika z linii bazowej, jeśli jest podana
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        target_profit = None
+        if baseline and case[0] in baseline:
+            target_profit = TARGET_FRACTION * baseline[case[0]]['final_profit']
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_case, case, seed, target_profit).result()
+        print(format_result(result))
+        results.append(result)
+    return results
+
+
+def format_result(result):
+    # jeden wiersz tabeli wyników
+    return (f'{result["case"]:<20} zysk: {result["final_profit"]:<8} generacje/s: {result["generations_per_second"]}'
+            f'  trasy/s: {result["routes_per_second"]}  czas do celu: {result["time_to_target"]}'
+            f'  pamięć: {result["peak_memory_mb"]} MB')
+
+
+def save_baseline(results, file_path):
+    # zapisanie wyników jako linii bazowej do porównań
+    with open(file_path, 'w', encoding='utf8') as file:
+        json.dump({result['case']: result for result in results}, file, indent=2)
+
+
+def load_baseline(file_path):
+    # wczytanie linii bazowej
+    with open(file_path, 'r', encoding='utf8') as file:
+        return json.load(file)
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    # lista regresji: metryki, które spadły o więcej niż tolerance względem linii bazowej
+    regressions = []
+    for result in results:
+        reference = baseline.get(result['case'])
+        if reference is None:
+            continue
+        for metric in BASELINE_METRICS:
+            old, new = reference.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new < (1 - tolerance) * old:
+                regressions.append(f'{result["case"]}: {metric} {old} -> {new}')
+    return regressions
+
+
+def parse_arguments(arguments=None):
+    # wczytanie argumentów linii poleceń
+    parser = argparse.ArgumentParser(description='Pomiary wydajności algorytmów Komiwojażera')
+    parser.add_argument('--suite', choices=SUITES, default='quick', help='zestaw przypadków')
+    parser.add_argument('--cases', nargs='*', help='uruchomienie tylko przypadków o podanych nazwach')
+    parser.add_argument('--seed', type=int, default=0, help='ziarno generatora map i algorytmów')
+    parser.add_argument('--save-baseline', help='zapisanie wyników jako linii bazowej do pliku json')
+    parser.add_argument('--baseline', help='plik json z linią bazową do porównania')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='dopuszczalny względny spadek metryk względem linii bazowej')
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    args = parse_arguments(arguments)
+    cases = [case for case in SUITES[args.suite] if not args.cases or case[0] in args.cases]
+    baseline = load_baseline(args.baseline) if args.baseline else None
+    results = run_suite(cases, args.seed, baseline)
+
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+        print(f'Linia bazowa zapisana do {args.save_baseline}')
+
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'Regresja: {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
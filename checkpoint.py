@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+
+from population import PopulationMatrix
+
+
+class Checkpoint:
+    # stan przerwanej optymalizacji algorytmem genetycznym: populacja, najlepsza trasa, historia poprawy najlepszego
+    # wyniku, stan generatora liczb losowych oraz hiperparametry. Zapisywany jako skompresowany plik .npz (same
+    # tablice liczb, bez pickle), z którego można wznowić optymalizację z nowym limitem czasu i iteracji
+    VERSION = 2  # w wersji 1 ziarno zapisywane było jako int64, więc nie mieściło się w nim każde ziarno
+
+    def __init__(self, population, best_route, history, rng_state, iteration, elapsed, seed, settings, n_cities,
+                 max_distance):
+        self.population = population  # lista tras (list id miast) populacji, od której zaczyna się iteracja
+        self.best_route = best_route  # najlepsza dotąd trasa (lista id miast)
+        self.history = history  # lista (czas od początku optymalizacji, zysk) dla każdej poprawy najlepszej trasy
+        self.rng_state = rng_state  # stan generatora liczb losowych (wynik random.Random.getstate())
+        self.iteration = iteration  # numer iteracji, od której należy wznowić optymalizację
+        self.elapsed = elapsed  # łączny czas optymalizacji do momentu zapisu
+        self.seed = seed  # ziarno, od którego zaczęła się optymalizacja
+        self.settings = settings  # population_size, mutation_rate, elite_size (liczba tras), seed_fraction
+        self.n_cities = n_cities  # liczba miast mapy, dla której zapisano stan
+        self.max_distance = max_distance  # czas pracy Komiwojażera, dla którego zapisano stan
+
+    def save(self, file_path):
+        # zapisanie stanu; plik zapisywany jest pod tymczasową nazwą i podmieniany, żeby przerwanie procesu w trakcie
+        # zapisu nie zniszczyło poprzedniego punktu kontrolnego
+        population = PopulationMatrix.from_routes(self.population)
+        version, internal_state, gauss_next = self.rng_state
+        temporary_path = file_path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.savez_compressed(
+                file,
+                version=np.array([self.VERSION, version, self.iteration, self.n_cities], dtype=np.int64),
+                seed=np.array(str(self.seed)),  # ziarno może być dowolnie dużą liczbą całkowitą
+                values=np.array([self.elapsed, self.max_distance, np.nan if gauss_next is None else gauss_next]),
+                population=population.matrix.astype(np.int32), lengths=population.lengths.astype(np.int32),
+                best_route=np.array(self.best_route, dtype=np.int32),
+                history=np.array(self.history, dtype=np.float64).reshape(-1, 2),
+                rng_state=np.array(internal_state, dtype=np.uint32),
+                settings=np.array([self.settings['population_size'], self.settings['mutation_rate'],
+                                   self.settings['elite_size'], self.settings['seed_fraction']]))
+        os.replace(temporary_path, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        # wczytanie stanu zapisanego metodą save
+        with np.load(file_path, allow_pickle=False) as data:
+            file_version, rng_version, iteration, n_cities, *seed = data['version'].tolist()
+            if file_version == 1:
+                seed = seed[0]
+            elif file_version == cls.VERSION:
+                seed = int(data['seed'])
+            else:
+                raise ValueError(f'Nieobsługiwana wersja punktu kontrolnego {file_version}')
+            elapsed, max_distance, gauss_next = data['values'].tolist()
+            population = PopulationMatrix(data['population'].astype(np.int64), data['lengths'].astype(np.int64))
+            population_size, mutation_rate, elite_size, seed_fraction = data['settings'].tolist()
+            return cls(population=population.to_routes(),
+                       best_route=data['best_route'].tolist(),
+                       history=[tuple(entry) for entry in data['history'].tolist()],
+                       rng_state=(rng_version, tuple(data['rng_state'].tolist()),
+                                  None if np.isnan(gauss_next) else gauss_next),
+                       iteration=iteration, elapsed=elapsed, seed=seed,
+                       settings={'population_size': int(population_size), 'mutation_rate': mutation_rate,
+                                 'elite_size': int(elite_size), 'seed_fraction': seed_fraction},
+                       n_cities=n_cities, max_distance=max_distance)
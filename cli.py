@@ -0,0 +1,197 @@
+import argparse
+import sys
+import time
+
+import IO
+import instance
+import validation
+from algorithm import GeneticAlgorithm
+from exact import BranchAndBound
+from metrics import EvolutionMetrics
+from solution_cache import SolutionCache
+
+# uruchamianie algorytmów z linii poleceń, bez okienka (moduł nie importuje tkintera ani matplotliba)
+SOLVERS = ('ga', 'beam', 'exact')
+
+
+def parse_arguments(arguments=None):
+    # wczytanie argumentów linii poleceń
+    parser = argparse.ArgumentParser(description='Wyznaczenie trasy Komiwojażera bez interfejsu graficznego')
+    parser.add_argument('cities', help='plik csv z miastami (nazwa, x, y, zysk) albo mapa w formacie binarnym '
+                                       '(instance.py), wtedy plik z połączeniami należy pominąć')
+    parser.add_argument('roads', nargs='?', help='plik csv z połączeniami (miasto1, miasto2, odległość)')
+    parser.add_argument('salesman_max_time', help='plik csv z czasem pracy Komiwojażera')
+    parser.add_argument('-o', '--output', help='plik, do którego zostanie zapisane rozwiązanie')
+    parser.add_argument('--solver', choices=SOLVERS, default='ga',
+                        help='ga - algorytm genetyczny, beam - szybkie przeszukiwanie wiązkowe, '
+                             'exact - metoda podziału i ograniczeń')
+    parser.add_argument('--n-iterations', type=int, help='maksymalna liczba iteracji')
+    parser.add_argument('--time-limit', type=float, help='maksymalny czas optymalizacji w sekundach')
+    parser.add_argument('--population-size', type=int, help='wielkość populacji')
+    parser.add_argument('--elite-size', type=float, help='odsetek elity')
+    parser.add_argument('--mutation-rate', type=float, help='odsetek mutacji')
+    parser.add_argument('--local-search-time', type=float,
+                        default=GeneticAlgorithm.ENHANCED_SETTINGS['local_search_time'],
+                        help='czas przeszukiwania lokalnego po algorytmie genetycznym (0 wyłącza)')
+    parser.add_argument('--seed-fraction', type=float, default=GeneticAlgorithm.ENHANCED_SETTINGS['seed_fraction'],
+                        help='odsetek populacji z przeszukiwania wiązkowego (0 wyłącza)')
+    parser.add_argument('--n-islands', type=int, default=1, help='liczba wysp (procesów) algorytmu genetycznego')
+    parser.add_argument('--migration-interval', type=int, default=50, help='co ile iteracji wyspy wymieniają trasy')
+    parser.add_argument('--migration-size', type=int, default=5, help='ile tras wysyłanych jest między wyspami')
+    parser.add_argument('--unique-routes', action='store_true',
+                        help='pomijanie powtórzonych tras przy tworzeniu kolejnej generacji')
+    parser.add_argument('--route-cache-size', type=int,
+                        help='pojemność pamięci ocen tras algorytmu genetycznego (domyślnie wyłączona)')
+    parser.add_argument('--beam-width', type=int, help='szerokość wiązki')
+    parser.add_argument('--checkpoint', help='plik, do którego okresowo zapisywany jest stan algorytmu genetycznego')
+    parser.add_argument('--checkpoint-interval', type=float, help='co ile sekund zapisywany jest punkt kontrolny')
+    parser.add_argument('--resume', help='wznowienie algorytmu genetycznego z pliku z punktem kontrolnym')
+    parser.add_argument('--cache', help='katalog pamięci rozwiązań algorytmu genetycznego (ponowne uruchomienie '
+                                        'zwraca zapamiętaną trasę albo kontynuuje optymalizację z dłuższym czasem)')
+    parser.add_argument('--seed', type=int, help='ziarno generatora liczb losowych (do powtórzenia uruchomienia)')
+    parser.add_argument('--verbose', action='store_true', help='wypisywanie postępu optymalizacji')
+    parser.add_argument('--profile', action='store_true',
+                        help='wypisanie czasów faz algorytmu genetycznego i liczby odrzuconych tras')
+    return parser.parse_args(arguments)
+
+
+def read_instance(cities_file, roads_file, salesman_max_time_file):
+    # wczytanie i sprawdzenie danych; zwraca (miasta, połączenia, czas pracy, lista komunikatów o problemach)
+    cities = IO.read_cities(cities_file)
+    if len(cities) < 2:
+        raise ValueError('Liczba miast powinna wynosić co najmniej 2.')
+
+    roads = IO.read_roads(roads_file)
+    valid, errors, infos = validation.check_connections(cities, roads)
+    if not valid:
+        raise ValueError(' '.join(errors + infos))
+
+    salesman_max_time = IO.read_salesman_max_time(salesman_max_time_file)
+    if salesman_max_time <= 0:
+        raise ValueError('Czas podróży komiwojażera jest niepoprawny (mniejszy od 0). ')
+
+    return cities, roads, salesman_max_time, infos
+
+
+def read_graph_instance(instance_file, salesman_max_time_file):
+    # wczytanie mapy w formacie binarnym (sprawdzonej przy zamianie z csv); zwraca (graf, czas pracy)
+    graph = instance.load_instance(instance_file)
+    if graph.n_cities < 2:
+        raise ValueError('Liczba miast powinna wynosić co najmniej 2.')
+
+    salesman_max_time = IO.read_salesman_max_time(salesman_max_time_file)
+    if salesman_max_time <= 0:
+        raise ValueError('Czas podróży komiwojażera jest niepoprawny (mniejszy od 0). ')
+
+    return graph, salesman_max_time
+
+
+def solve(cities, roads, salesman_max_time, solver='ga', graph=None, cache=None, **settings):
+    # uruchomienie wybranego algorytmu; settings to hiperparametry (None oznacza wartość domyślną), graph - gotowy
+    # graf zamiast miast i połączeń, cache - SolutionCache dla algorytmu genetycznego. Zwraca trasę oraz statystyki
+    # pracy algorytmu
+    settings = {name: value for name, value in settings.items() if value is not None}
+    if solver == 'ga':
+        settings.pop('beam_width', None)
+        metrics = settings.get('metrics')
+        resume = settings.pop('resume', None)
+        algorithm = GeneticAlgorithm(cities, roads, salesman_max_time, graph=graph)
+        if resume is not None:
+            route = algorithm.resume(resume, **settings)
+        elif cache is not None:
+            route = cache.find_optimal_route(algorithm, **settings)
+        else:
+            route = algorithm.find_optimal_route(**settings)
+        if metrics is not None:
+            return route, dict(algorithm.statistics, **metrics.summary())
+        return route, algorithm.statistics
+
+    elif solver == 'beam':
+        algorithm = GeneticAlgorithm(cities, roads, salesman_max_time, graph=graph)
+        route = algorithm.find_fast_route(beam_width=settings.get('beam_width'), time_limit=settings.get('time_limit'))
+        return route, {'iterations': 1}
+
+    elif solver == 'exact':
+        algorithm = BranchAndBound(cities, roads, salesman_max_time, graph=graph)
+        route = algorithm.find_optimal_route(time_limit=settings.get('time_limit'),
+                                             verbose=settings.get('verbose', False))
+        return route, {'iterations': algorithm.n_nodes, 'upper_bound': algorithm.upper_bound, 'gap': algorithm.gap}
+
+    raise ValueError(f'Nieznany algorytm {solver}')
+
+
+def save_route(route, filename):
+    # zapisanie trasy w formacie takim jak przy eksporcie rozwiązania z okienka
+    if not filename.endswith('.txt'):
+        filename += '.txt'
+    IO.save_solution(IO.format_solution(route.to_solution(), route.fitness, route.distance), filename)
+    return filename
+
+
+def main(arguments=None):
+    args = parse_arguments(arguments)
+    cities = roads = graph = None
+    infos = []
+    try:
+        if instance.is_instance_file(args.cities):
+            if args.roads is not None:
+                raise ValueError('Mapa w formacie binarnym zawiera już połączenia między miastami.')
+            graph, salesman_max_time = read_graph_instance(args.cities, args.salesman_max_time)
+        elif args.roads is None:
+            raise ValueError('Brak pliku z połączeniami między miastami.')
+        else:
+            cities, roads, salesman_max_time, infos = read_instance(args.cities, args.roads, args.salesman_max_time)
+    except Exception as e:
+        print(f'Błąd podczas wczytywania danych: {e}', file=sys.stderr)
+        return 2
+
+    for message in infos:
+        print(message, file=sys.stderr)
+
+    start = time.time()
+    try:
+        route, statistics = solve(cities, roads, salesman_max_time, solver=args.solver, graph=graph,
+                                  n_iterations=args.n_iterations, time_limit=args.time_limit,
+                                  population_size=args.population_size, elite_size=args.elite_size,
+                                  mutation_rate=args.mutation_rate, local_search_time=args.local_search_time,
+                                  seed_fraction=args.seed_fraction, n_islands=args.n_islands,
+                                  migration_interval=args.migration_interval, migration_size=args.migration_size,
+                                  beam_width=args.beam_width, verbose=args.verbose,
+                                  unique_routes=args.unique_routes, route_cache_size=args.route_cache_size,
+                                  seed=args.seed, cache=SolutionCache(directory=args.cache) if args.cache else None,
+                                  checkpoint_file=args.checkpoint, checkpoint_interval=args.checkpoint_interval,
+                                  resume=args.resume,
+                                  metrics=EvolutionMetrics(keep_generations=False) if args.profile else None)
+    except Exception as e:
+        print(f'Błąd podczas optymalizacji: {e}', file=sys.stderr)
+        return 1
+    runtime = time.time() - start
+
+    if route is None or not route.is_valid(salesman_max_time):
+        print('Nie znaleziono poprawnej trasy', file=sys.stderr)
+        return 1
+
+    print(f'Zysk: {route.fitness}, długość trasy: {route.distance}, czas: {runtime:.2f} s, '
+          f'iteracje: {statistics["iterations"]}')
+    if 'seed' in statistics:
+        print(f'Ziarno: {statistics["seed"]}')
+    if statistics.get('cached') == 'hit':
+        print('Trasa z pamięci rozwiązań')
+    elif statistics.get('cached') == 'warm_start':
+        print('Optymalizacja kontynuowana od trasy z pamięci rozwiązań')
+    if 'gap' in statistics:
+        print(f'Górne ograniczenie zysku: {statistics["upper_bound"]}, luka: {statistics["gap"]:.4f}')
+    if 'phase_times' in statistics:
+        for phase, phase_time in statistics['phase_times'].items():
+            print(f'{phase}: {phase_time:.3f} s ({statistics["phase_shares"][phase]:.1%})')
+        print(f'Odrzucone trasy: {statistics["rejected"]}')
+        if 'route_cache_hit_rate' in statistics:
+            print(f'Trafienia w pamięci ocen tras: {statistics["route_cache_hit_rate"]:.1%}, '
+                  f'pominięte powtórzenia: {statistics.get("duplicates_removed", 0)}')
+    if args.output:
+        print(f'Rozwiązanie zapisane do {save_route(route, args.output)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
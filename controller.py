@@ -1,31 +1,52 @@
-from _thread import start_new_thread
-from queue import Queue
+from queue import Empty, Queue
 
 import IO
+import validation
 from algorithm import GeneticAlgorithm, Route
-from gui import TravellingSalesmanApp
+from jobs import JobManager, solve_route
 
 
 class Controller:
-    def __init__(self):
-        self.app = TravellingSalesmanApp()  # inicjalizacja okienka
+    FEEDBACK_INTERVAL = 50  # co ile milisekund obsługiwane są akcje użytkownika i zadania dla okienka
+    # akcje czytające lub zapisujące pliki, zlecane puli wątków (pozostałe wykonywane są w wątku okienka)
+    FILE_ACTIONS = ('read_cities', 'read_connections', 'read_salesman_max_time', 'save_solution', 'load_solution')
+
+    def __init__(self, app):
+        # app - okienko (TravellingSalesmanApp). Moduł nie importuje okienka sam: procesy z puli uruchamiane metodą
+        # spawn importują ponownie główny moduł programu, więc dzięki temu nie wczytują tkintera ani matplotlib
+        self.app = app
         self.cities = None  # tu będzie lista miast
         self.connections = None  # tu będzie lista połączeń między miastami
+        self._graph = None  # graf zbudowany z miast i połączeń (tworzony przy pierwszym użyciu)
         self.salesman_max_time = None  # tu będzie maksymalny czas pracy komiwojażera
         self.solution = None  # tu będzie zapisane rozwiązanie
         self.app.set_values_to_default(
-            **GeneticAlgorithm.DEFAULT_SETTINGS)  # ustawienie domyślnych wartości hiperparametrów w okienku
+            **dict(GeneticAlgorithm.DEFAULT_SETTINGS, local_search_time=GeneticAlgorithm.ENHANCED_SETTINGS[
+                'local_search_time']))  # ustawienie domyślnych wartości hiperparametrów w okienku
         self.feedback_queue = Queue()  # tu będą zapisane akcje, które controller będzie chciał wykonać w okienku
+        self.jobs = JobManager()  # pule wykonujące akcje użytkownika (procesy dla algorytmu, wątki dla plików)
 
     def mainloop(self):
-        # metoda cały czas sprawdza akcje wykonane przez użytkownika i podejmuje odpowiednie działania w odpowiedzi
-        # na nie a następnie odświeża okienko
-        while self.app.is_alive:
+        # obsługa okienka w pętli zdarzeń Tk: co FEEDBACK_INTERVAL ms wykonywane są wszystkie oczekujące akcje
+        # użytkownika i zadania dla okienka, a pomiędzy nimi proces czeka na zdarzenia bez zużywania procesora
+        self.app.after(self.FEEDBACK_INTERVAL, self.tick)
+        self.app.mainloop()
+        self.quit()  # po zamknięciu okienka zatrzymujemy pracujący algorytm
+        self.app.destroy()
+
+    def tick(self):
+        # jeden krok obsługi okienka, zaplanowany ponownie po jego wykonaniu
+        if not self.app.is_alive:
+            self.app.quit()  # zakończenie pętli zdarzeń Tk
+            return
+
+        while True:
             action = self.app.get_user_action()  # pobranie akcji użytkownika
+            if action is None:
+                break
             self.make_action(action)  # wykonanie akcji użytkownika
-            self.make_feedback()  # jeżeli akcja użytkownika wymaga jakiejś akcji w okienku to tutaj zostanie to
-            # wykonane
-            self.app.refresh()  # odświeżenie okienka
+        self.make_feedback()  # wykonanie akcji w okienku, których wymagały akcje użytkownika
+        self.app.after(self.FEEDBACK_INTERVAL, self.tick)
 
     def make_action(self, action):
         # metoda sprawdza jaką akcję wykonał użytkownik i podejmuje odpowiednie działanie
@@ -57,22 +78,45 @@ class Controller:
             func = self.check_solution
         elif action_type == 'show_map':
             func = self.show_map
+        elif action_type == 'stop':
+            func = self.stop
         elif action_type == 'quit':
             func = self.quit
         else:
             self.error_message('Funkcja nie została jeszcze w pełni zaimplementowana')
             return
 
-        # wykonanie odpowiedniej funkcji
-        start_new_thread(func, (), action)
-        # self.app.block_buttons()
+        # akcje, które nie czytają ani nie zapisują plików, wykonywane są od razu w wątku okienka (np. zatrzymanie
+        # algorytmu nie czeka w kolejce i każde kliknięcie jest obsłużone)
+        if action_type not in self.FILE_ACTIONS:
+            try:
+                return func(**action)
+            except Exception as e:
+                self.error_message(f'Wystąpił nieoczekiwany błąd: {e}')
+                return
+
+        # zlecenie operacji na pliku puli wątków; ta sama akcja z tymi samymi argumentami nie jest zlecana ponownie,
+        # dopóki poprzednia się nie zakończy
+        key = (action_type, tuple(sorted(action.items())))
+        return self.jobs.submit('io', func, key=key, on_done=self.report_failure, **action)
+
+    def report_failure(self, job):
+        # wyświetlenie informacji o błędzie, który przerwał zadanie
+        if job.status == 'failed':
+            self.error_message(f'Wystąpił nieoczekiwany błąd: {job.future.exception()}')
+
+    def job_status(self, job_id):
+        # stan zleconego zadania: 'pending', 'running', 'done', 'failed' albo 'cancelled'
+        return self.jobs.status(job_id)
 
     def read_cities(self, filename):
-        # wczytanie danych miast z pliku filename
+        # wczytanie danych miast z pliku filename (partiami, z pokazywaniem postępu w okienku)
         try:
             # próba wczytania danych
-            cities = IO.read_csv(filename)
-            cities = [[city, float(x), float(y), float(profit)] for city, x, y, profit in cities]
+            cities = []
+            for chunk in IO.read_cities_chunks(filename,
+                                               progress=lambda fraction: self.show_loading('miast', fraction)):
+                cities += chunk
 
         except Exception as e:
             # wyświetlenie informacji o błędzie w przypadku niepowodzenia
@@ -84,57 +128,64 @@ class Controller:
             self.error_message('Liczba miast powinna wynosić co najmniej 2.')
         else:
             self.cities = cities
+            self._graph = None  # graf trzeba zbudować od nowa
 
     def read_connections(self, filename):
         if not self.cities:
             self.info_message('Wczytaj najpierw dane miast')
             return
 
-        # wczytanie danych połączeń między miastami z pliku filename
+        # wczytanie danych połączeń między miastami z pliku filename partiami; każda partia jest od razu sprawdzana,
+        # a w okienku pokazywany jest postęp
+        validator = validation.ConnectionValidator(self.cities)
         try:
             # próba wczytania danych
-            connections = IO.read_csv(filename)
-            connections = [[city1, city2, float(distance)] for city1, city2, distance in connections]
+            connections = []
+            for chunk in IO.read_roads_chunks(filename,
+                                              progress=lambda fraction: self.show_loading('połączeń', fraction)):
+                validator.check(chunk)
+                connections += chunk
         except Exception as e:
             # wyświetlenie informacji o błędzie w przypadku niepowodzenia
             self.error_message(f'Wystąpił nieoczekiwany błąd podczas wczytywania połączeń: {e}')
             return
 
-        # zapisanie trasy tylko jeśli okaże się poprawna
-        if self.check_connections(connections):
+        # zapisanie trasy tylko jeśli okaże się poprawna; graf jest budowany od nowa już tutaj (w wątku z puli),
+        # a nie przy pierwszym użyciu w wątku okienka
+        if self.report_validation(*validator.report()):
             self.connections = connections
+            self._graph = GeneticAlgorithm.construct_cities(self.cities, connections)
+
+    @property
+    def graph(self):
+        # graf wczytanych miast i połączeń, budowany raz i wspólny dla sprawdzania, zapisywania i wyznaczania tras
+        # (tylko do odczytu); tworzony od nowa dopiero po wczytaniu nowych miast lub połączeń
+        if self._graph is None:
+            self._graph = GeneticAlgorithm.construct_cities(self.cities, self.connections)
+        return self._graph
 
     def check_connections(self, connections):
-        # liczba połączeń musi wynosić co najmniej 1. Wyświetlenie informacji o błędzie jeśli nie ma połączeń
-        n_connections = sum([1 for c in connections if c])
-        if n_connections == 0:
-            self.error_message('Liczba połączeń powinna wynosić co najmniej 1.')
-            return False
-
-        # przygotowanie słownika miast
-        city_name_to_coordinates = {city_name: (x, y) for city_name, x, y, profit in self.cities}
-
-        for city1, city2, distance in connections:
-            # odległość między miastami musi wynosić 1
-            if distance != 1:
-                self.info_message('Odległość między podanymi miastami jest różna od 1')
-
-            x1, y1 = city_name_to_coordinates[city1]
-            x2, y2 = city_name_to_coordinates[city2]
-            dx = abs(x1 - x2)
-            dy = abs(y1 - y2)
-            # miasto może być połączone tylko z miastem bezpośrednio na lewo, prawo, górę lub dół
-            if not ((dx, dy) == (1, 0) or (dx, dy) == (0, 1)):
-                self.info_message(f'Miasta {city1} oraz {city2} nie mog być ze sobą połączone')
-                return False
-
-        return True
+        # sprawdzenie poprawności połączeń i przekazanie ewentualnych komunikatów do okienka
+        return self.report_validation(*validation.check_connections(self.cities, connections))
+
+    def report_validation(self, valid, errors, infos):
+        # przekazanie do okienka wyniku sprawdzenia połączeń jako jednego podsumowania (błędy w jednym komunikacie
+        # i informacje w drugim, zamiast osobnego komunikatu na każde połączenie)
+        if errors:
+            self.error_message('\n'.join(errors))
+        if infos:
+            self.info_message('\n'.join(infos))
+        return valid
+
+    def show_loading(self, data_name, fraction):
+        # pokazanie w okienku postępu wczytywania danych
+        self.feedback_queue.put({'func': self.app.show_status, 'text': f'Wczytywanie {data_name}: {fraction:.0%}'})
 
     def read_salesman_max_time(self, filename):
         # wczytanie danych czasu pracy komiwojażera z pliku filename
         try:
             # próba wczytania danych
-            salesman_max_time = int(IO.read_csv(filename)[0][0])
+            salesman_max_time = IO.read_salesman_max_time(filename)
         except ValueError as e:
             self.error_message(f'Czas pracy Komiwojażera musi być liczbą')
             return
@@ -161,7 +212,7 @@ class Controller:
         self.solution = route
 
     def find_best_route(self, **kwargs):
-        # uruchomienie algorytmu szukającego optymalnej ścieżki
+        # uruchomienie algorytmu szukającego optymalnej ścieżki w osobnym procesie; zwraca id zadania
         if not self.cities or not self.connections or not self.salesman_max_time:
             self.info_message('Do uruchomienia algorytmu niezbędne są informacje o miastach, połączeniach między nimi '
                               'oraz czasie pracy komiwojażera')
@@ -169,37 +220,47 @@ class Controller:
         # ponieważ często czas pracy algorytmu jest duży (liczony w sekundach) to blokowane są przyciski,
         # aby użytkownik nic nie zrobił
         self.block_buttons()
-        try:
-            # próba wyznaczenia optymalnej ścieżki
-            algorithm = GeneticAlgorithm(self.cities, self.connections, self.salesman_max_time)
-            print('#', self.connections)
-            best_route = algorithm.find_optimal_route(**kwargs)  # zapisanie znalezionej ścieżki
-            self.unblock_buttons()  # odblokowanie przycisków
-            for city in best_route.route:
-                print(city, best_route.cities[city].id)
-            for city_coordinates in best_route.get_route_coordinates():
-                print(city_coordinates)
-        except Exception as e:
+        # kolejne coraz lepsze trasy i przebieg optymalizacji są pokazywane użytkownikowi na bieżąco (make_feedback),
+        # a przycisk zatrzymania kończy pracę algorytmu. To samo zadanie (ten sam graf, czas pracy i hiperparametry)
+        # nie jest zlecane ponownie, a wykres przebiegu jest czyszczony tylko dla nowego zadania
+        # okienko nie ma pola na odsetek tras z przeszukiwania wiązkowego, więc włączane jest ulepszenie domyślne
+        kwargs.setdefault('seed_fraction', GeneticAlgorithm.ENHANCED_SETTINGS['seed_fraction'])
+        graph = self.graph
+        key = ('solve', id(graph), self.salesman_max_time, tuple(sorted(kwargs.items())))
+        if self.jobs.pending(key) is None:
+            self.feedback_queue.put({'func': self.app.clear_convergence})
+        return self.jobs.submit('solve', solve_route, None, None, self.salesman_max_time, kwargs, graph=graph,
+                                key=key, on_done=self.route_found)
+
+    def route_found(self, job):
+        # zapisanie trasy wyznaczonej przez zakończone zadanie
+        self.unblock_buttons()  # odblokowanie przycisków
+        if job.status == 'cancelled':
+            return
+        if job.status == 'failed':
             # wyświetlenie informacji o błędzie podczas pracy algorytmu
-            self.unblock_buttons()
-            self.error_message(f'Wystąpił błąd podczas szukania optymalnej trasy: {e}')
+            self.error_message(f'Wystąpił błąd podczas szukania optymalnej trasy: {job.future.exception()}')
             return
 
-        self.solution = self.parse_route_for_solution(best_route)
+        solution, profit, distance = job.future.result()
+        self.solution = solution
+        self.feedback_queue.put({'func': self.app.show_progress, 'profit': profit, 'distance': distance})
+        self.feedback_queue.put({'func': self.app.update_route, 'route': solution})
+
+    def show_progress(self, profit, distance, solution):
+        # zapamiętanie nowej najlepszej trasy jako bieżącego rozwiązania i pokazanie jej zysku w okienku
+        self.solution = solution
+        self.app.show_progress(profit, distance)
+        self.app.update_route(solution)  # podmiana samej trasy na narysowanej mapie
+
+    def stop(self):
+        # zatrzymanie pracującego algorytmu; najlepsza dotąd trasa zostaje rozwiązaniem
+        self.jobs.stop_solvers()
 
     @staticmethod
     def parse_route_for_solution(route):
         # metoda zamienia wynik metody self.find_best_route do odpowiedniej postaci
-        solution = []
-        visited_cities = set()
-        for city_name in route.route:
-            x = route.cities[city_name].x
-            y = route.cities[city_name].y
-            profit = 0 if city_name in visited_cities else route.cities[city_name].profit
-
-            solution.append([city_name, x, y, profit])
-            visited_cities.add(city_name)
-        return solution
+        return route.to_solution()
 
     def save_solution(self, filename):
         # metoda zapisująca rozwiązanie do pliku filename jeśli rozwiązanie istnieje
@@ -217,16 +278,9 @@ class Controller:
             return
 
         # przekształcenie do wymaganego formatu
-        solution = [[str(element) for element in city] for city in self.solution]
-        route_string = [','.join(city) for city in solution]
-        route_string = [f'({city})' for city in route_string]
-        route_string = ','.join(route_string)
-        route_string = f'[{route_string}]'
-
-        cities = GeneticAlgorithm.construct_cities(self.cities, self.connections)
-        solution_cities = [city[0] for city in self.solution]  # wybieramy tylko id miast
-        route = Route(solution_cities, cities)
-        data = '\r\n'.join([route_string, str(route.fitness), str(route.distance)])
+        solution_cities = [city[0] for city in self.solution]  # wybieramy tylko nazwy miast
+        route = Route.from_names(solution_cities, self.graph)
+        data = IO.format_solution(self.solution, route.fitness, route.distance)
 
         # upewniamy się, że nazwa pliku, który zapisujemy ma rozszerzenie .txt i dodajemy jeśli nie ma
         if not filename.endswith('.txt'):
@@ -250,10 +304,25 @@ class Controller:
         self.feedback_queue.put({'func': self.app.info_message, 'message': message})
 
     def make_feedback(self):
-        # wykonanie funkcji z kolejki jeśli kolejka nie jest pusta
-        if not self.feedback_queue.empty():
-            feedback = self.feedback_queue.get_nowait()
+        # wykonanie wszystkich funkcji oczekujących w kolejce oraz pokazanie postępu pracującego algorytmu
+        # (z kilku komunikatów o trasach wystarczy pokazać ostatni, bo trasy są coraz lepsze)
+        while True:
+            try:
+                feedback = self.feedback_queue.get_nowait()
+            except Empty:
+                break
             self._execute_feedback(**feedback)
+        # punkty przebiegu optymalizacji są dopisywane do wykresu jedną paczką
+        routes, points = [], []
+        for message in self.jobs.progress():
+            if message[0] == 'route':
+                routes.append(message[1:])
+            else:
+                points.extend(message[1])
+        if routes:
+            self.show_progress(*routes[-1])
+        if points:
+            self.app.add_convergence_points(points)
 
     def check_solution(self):
         # metoda sprawdzająca czy rozwiązanie jest prawidłowe
@@ -273,9 +342,13 @@ class Controller:
             return
 
         # przekształcamy trasę rozwiązania do postaci obiektu Route
-        cities = GeneticAlgorithm.construct_cities(self.cities, self.connections)  # najpierw tworzymy miasta
-        solution_cities = [city[0] for city in self.solution]  # wybieramy tylko id miast trasy rozwiązania
-        route = Route(solution_cities, cities)  # tworzymy obiekt Route
+        graph = self.graph  # graf miast (budowany tylko po wczytaniu nowych danych)
+        solution_cities = [city[0] for city in self.solution]  # wybieramy tylko nazwy miast trasy rozwiązania
+        if any(city_name not in graph.index for city_name in solution_cities):
+            # trasa zawiera miasta, których nie ma na wczytanej mapie
+            self.info_message('Na trasie znajdują się miasta, których nie ma na mapie')
+            return
+        route = Route.from_names(solution_cities, graph)  # tworzymy obiekt Route (nazwy zamieniane są na id)
 
         if route.is_valid(self.salesman_max_time):
             # jeżeli rozwiązanie jest poprawne to poinformowanie o tym użytkownika
@@ -302,7 +375,8 @@ class Controller:
         self.feedback_queue.put(action)
 
     def quit(self):
-        pass
+        # zakończenie pracy: zatrzymanie algorytmu, jeśli jeszcze pracuje, i zamknięcie pul zadań
+        self.jobs.shutdown()
 
     @staticmethod
     def _execute_feedback(func, **kwargs):
@@ -311,7 +385,9 @@ class Controller:
 
 
 if __name__ == '__main__':
-    controller = Controller()
+    from gui import TravellingSalesmanApp
+
+    controller = Controller(TravellingSalesmanApp())
     # controller.read_cities('C:/Users/p/PycharmProjects/Komiwojazer/data/test_cities.csv')
     # controller.read_connections('C:/Users/p/PycharmProjects/Komiwojazer/data/test_roads.csv')
     # controller.read_salesman_max_time('C:/Users/p/PycharmProjects/Komiwojazer/data/test_salesman_timelimit.csv')
@@ -0,0 +1,140 @@
+import time
+
+from algorithm import GeneticAlgorithm, Route
+
+
+class BranchAndBound:
+    # dokładny algorytm (metoda podziału i ograniczeń) szukający trasy o największym zysku. Dla każdego częściowego
+    # rozwiązania liczone jest górne ograniczenie zysku (zysk + najcenniejsze nieodwiedzone miasta osiągalne
+    # w pozostałym czasie), a stany (miasto, odwiedzone miasta) osiągnięte wcześniej krótszą drogą są odrzucane
+    DEFAULT_SETTINGS = {'time_limit': 15, 'max_states': 2000000}
+    CHECK_TIME_EVERY = 1000  # co ile rozwiniętych stanów sprawdzany jest limit czasu
+
+    def __init__(self, cities, roads, max_distance, graph=None):
+        # graph - gotowy Graph (np. wczytany z pliku binarnego), wtedy cities i roads nie są używane
+        self.graph = graph if graph is not None else GeneticAlgorithm.construct_cities(cities, roads)
+        self.max_distance = max_distance  # maksymalny dystans / czas pracy Komiwojażera
+        self.best_fitness = None  # zysk najlepszej znalezionej trasy
+        self.upper_bound = None  # górne ograniczenie zysku optymalnej trasy
+        self.gap = None  # względna różnica między górnym ograniczeniem a najlepszym zyskiem
+        self.optimal = False  # czy znaleziona trasa jest na pewno optymalna
+        self.n_nodes = 0  # liczba rozwiniętych stanów
+        self._distances = dict()  # najkrótsze odległości z kolejnych miast (ograniczone do max_distance)
+        self._min_distance = None  # najkrótsze połączenie na mapie
+
+    def find_optimal_route(self, time_limit=None, verbose=True, max_states=None, initial_route=None):
+        # wyszukanie optymalnej trasy; initial_route (np. wynik algorytmu genetycznego) to opcjonalna lista id miast,
+        # od której zaczynamy jako od najlepszego znanego rozwiązania
+        if time_limit is None:
+            time_limit = self.DEFAULT_SETTINGS['time_limit']
+
+        if max_states is None:
+            max_states = self.DEFAULT_SETTINGS['max_states']
+
+        start = time.time()
+        weights = [distance for distance in self.graph.weights if distance <= self.max_distance]
+        self._min_distance = min(weights, default=None)
+        self.n_nodes = 0
+        self.optimal = False
+
+        best_route, best_fitness = None, 0
+        if initial_route is not None:
+            route = Route(list(initial_route), self.graph)
+            if route.is_valid(self.max_distance):
+                best_route, best_fitness = route.route, route.fitness
+
+        # stan to (górne ograniczenie, miasto, odwiedzone miasta jako maska bitowa, długość, zysk, poprzedni stan)
+        stack = []
+        for city_id in range(self.graph.n_cities):
+            state = (city_id, 1 << city_id, 0, self.graph.profit[city_id], None)
+            stack.append((self._bound(state), *state))
+        stack.sort()
+
+        shortest = dict()  # (miasto, odwiedzone miasta) -> najkrótsza droga, którą osiągnięto ten stan
+        terminated = False
+        while stack:
+            bound, city_id, visited, distance, profit, previous = node = stack.pop()
+            if bound <= best_fitness or shortest.get((city_id, visited), distance) < distance:
+                continue
+
+            self.n_nodes += 1
+            if self.n_nodes % self.CHECK_TIME_EVERY == 0 and time.time() - start > time_limit:
+                stack.append(node)
+                terminated = True
+                break
+
+            # poprawna trasa musi składać się z co najmniej dwóch miast
+            if previous is not None and profit > best_fitness:
+                best_route, best_fitness = self._route(node), profit
+                if verbose:
+                    print(self.n_nodes, best_fitness, max([bound for bound, *_ in stack], default=best_fitness))
+
+            children = []
+            for neighbour, road_distance in self.graph.connections_of(city_id):
+                new_distance = distance + road_distance
+                if new_distance > self.max_distance:
+                    continue
+
+                new_visited = visited | (1 << neighbour)
+                key = (neighbour, new_visited)
+                if shortest.get(key, new_distance + 1) <= new_distance:
+                    continue
+                if key in shortest or len(shortest) < max_states:
+                    shortest[key] = new_distance
+
+                new_profit = profit if visited >> neighbour & 1 else profit + self.graph.profit[neighbour]
+                state = (neighbour, new_visited, new_distance, new_profit, node)
+                child_bound = self._bound(state)
+                if child_bound > best_fitness:
+                    children.append((child_bound, *state))
+
+            # najbardziej obiecujące stany rozwijamy jako pierwsze
+            children.sort()
+            stack.extend(children)
+
+        self.best_fitness = best_fitness
+        if terminated:
+            self.upper_bound = max([best_fitness] + [bound for bound, *_ in stack])
+            if verbose:
+                print(f'Optimization terminated due to time limit after {self.n_nodes} nodes')
+        else:
+            self.upper_bound = best_fitness
+            self.optimal = True
+        self.gap = (self.upper_bound - best_fitness) / self.upper_bound if self.upper_bound else 0
+
+        if best_route is None:
+            return None
+        route = Route(list(best_route), self.graph)
+        route.is_valid(self.max_distance)
+        return route
+
+    def _bound(self, state):
+        # górne ograniczenie zysku: do zysku dodajemy najcenniejsze nieodwiedzone miasta osiągalne w pozostałym czasie,
+        # ale nie więcej niż tyle, ile połączeń mieści się w pozostałym czasie (przy połączeniach o zerowej długości
+        # liczba miast nie jest ograniczona)
+        city_id, visited, distance, profit, previous = state
+        remaining = self.max_distance - distance
+        if self._min_distance is None or remaining < self._min_distance:
+            return profit
+
+        candidates = [self.graph.profit[other] for other, other_distance in self._distances_from(city_id).items()
+                      if other_distance <= remaining and not visited >> other & 1]
+        max_new_cities = int(remaining // self._min_distance) if self._min_distance > 0 else len(candidates)
+        if len(candidates) > max_new_cities:
+            candidates = sorted(candidates, reverse=True)[:max_new_cities]
+        return profit + sum(candidates)
+
+    def _distances_from(self, city_id):
+        # najkrótsze odległości z miasta city_id do miast osiągalnych w ramach max_distance; wyniki są zapamiętywane
+        if city_id not in self._distances:
+            self._distances[city_id] = self.graph.shortest_distances(city_id, self.max_distance)
+        return self._distances[city_id]
+
+    @staticmethod
+    def _route(node):
+        # odtworzenie trasy (listy id miast) z łańcucha stanów
+        route = []
+        while node is not None:
+            route.append(node[1])
+            node = node[5]
+        return route[::-1]
@@ -5,6 +5,7 @@ from tkinter import filedialog, messagebox
 import matplotlib
 from matplotlib import style
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.collections import LineCollection
 from matplotlib.figure import Figure
 
 matplotlib.use('TkAgg')
@@ -25,7 +26,7 @@ class TravellingSalesmanApp(Tk):
 
 		# przygotowanie poszczególnych stron i podpięcie do głównego okienka
 		self.frames = {}  # słownik zawiera strony, które możemy wyświetlić
-		for F in (MainPage, GraphPage):
+		for F in (MainPage, GraphPage, ConvergencePage):
 			page_name = F.__name__
 			frame = F(parent=container, root=self)
 			self.frames[page_name] = frame
@@ -50,14 +51,15 @@ class TravellingSalesmanApp(Tk):
 				raise
 
 	def set_values_to_default(self, n_iterations=None, time_limit=None, population_size=None, elite_size=None,
-							  mutation_rate=None):
+							  mutation_rate=None, local_search_time=None):
 		# ustawienie domyślnych wartości w polach, które może edytować użytkownik
 		if not self.default_settings:
 			assert n_iterations is not None \
 				   and time_limit is not None \
 				   and population_size is not None \
 				   and elite_size is not None \
-				   and mutation_rate is not None
+				   and mutation_rate is not None \
+				   and local_search_time is not None
 			self.default_settings = locals()
 
 		self.frames['MainPage'].iterations_text.delete(0, END)  # usunięcie dotychczas wpisanej liczby iteracji
@@ -65,6 +67,7 @@ class TravellingSalesmanApp(Tk):
 		self.frames['MainPage'].population_size_text.delete(0, END)  # rozmiaru populacji
 		self.frames['MainPage'].elite_size_text.delete(0, END)  # rozmiaru elity
 		self.frames['MainPage'].mutation_rate_text.delete(0, END)  # odsetka mutacji
+		self.frames['MainPage'].local_search_time_text.delete(0, END)  # czasu przeszukiwania lokalnego
 
 		self.frames['MainPage'].iterations_text.insert(0, str(
 			self.default_settings['n_iterations']))  # wpisanie domyślnej liczby iteracji
@@ -75,11 +78,14 @@ class TravellingSalesmanApp(Tk):
 		self.frames['MainPage'].elite_size_text.insert(0, str(self.default_settings['elite_size']))  # rozmiaru elity
 		self.frames['MainPage'].mutation_rate_text.insert(0, str(
 			self.default_settings['mutation_rate']))  # odsetka mutacji
+		self.frames['MainPage'].local_search_time_text.insert(0, str(
+			self.default_settings['local_search_time']))  # czasu przeszukiwania lokalnego
 
 	def on_quit(self):
 		# podczas zamknięcia okienka wykonywana jest ta funkcja, która w zmiennej self.is_alive
-		# zapisuje informację, że to okienko już nie istnieje
+		# zapisuje informację, że to okienko już nie istnieje, i kończy pętlę zdarzeń
 		self.is_alive = False
+		self.quit()
 
 	def load_cities(self):
 		# metoda pyta użytkownika o lokalizację pliku z miastami i dodaje akcję użytkownika do kolejki
@@ -143,6 +149,10 @@ class TravellingSalesmanApp(Tk):
 		self.frames['GraphPage'].tkraise()
 		self.frames['GraphPage'].draw_map(**kwargs)
 
+	def update_route(self, route):
+		# metoda podmienia trasę na mapie, jeśli mapa została już narysowana
+		self.frames['GraphPage'].update_route(route)
+
 	def find_solution(self):
 		# metoda dodaje do kolejki zadań akcję uruchomienia algorytmu z pobranymi z okienka hiperparametrami
 
@@ -152,6 +162,7 @@ class TravellingSalesmanApp(Tk):
 		population_size = int(self.frames['MainPage'].population_size_text.get())
 		elite_size = float(self.frames['MainPage'].elite_size_text.get())
 		mutation_rate = float(self.frames['MainPage'].mutation_rate_text.get())
+		local_search_time = float(self.frames['MainPage'].local_search_time_text.get())
 		# utworzenie akcji
 		action = {
 			'action': 'find_solution',
@@ -159,12 +170,35 @@ class TravellingSalesmanApp(Tk):
 			'time_limit': time_limit,
 			'population_size': population_size,
 			'elite_size': elite_size,
-			'mutation_rate': mutation_rate
+			'mutation_rate': mutation_rate,
+			'local_search_time': local_search_time
 		}
 		print(action)
 		# dodanie akcji do kolejki zadań
 		self.action_queue.put(action)
 
+	def add_convergence_points(self, points):
+		# metoda dopisuje punkty (iteracja, najlepszy zysk, średni zysk) do wykresu przebiegu optymalizacji
+		self.frames['ConvergencePage'].add_points(points)
+
+	def clear_convergence(self):
+		# metoda czyści wykres przebiegu optymalizacji przed uruchomieniem algorytmu
+		self.frames['ConvergencePage'].clear()
+
+	def stop_solution(self):
+		# metoda dodaje do kolejki zadań akcję zatrzymania pracującego algorytmu
+		action = {'action': 'stop'}
+		print(action)
+		self.action_queue.put(action)
+
+	def show_progress(self, profit, distance):
+		# metoda pokazuje zysk i długość najlepszej dotąd znalezionej trasy
+		self.frames['MainPage'].progress_label.configure(text=f'Najlepsza trasa: zysk {profit}, długość {distance}')
+
+	def show_status(self, text):
+		# metoda pokazuje komunikat o postępie pracy (np. wczytywania danych)
+		self.frames['MainPage'].progress_label.configure(text=text)
+
 	def get_user_action(self):
 		# metoda zwraca akcję użytkownika oczekującą w kolejce zadań
 		# ta metoda będzie wykorzystywana przez controller
@@ -283,9 +317,28 @@ class MainPage(Frame):
 		self.mutation_rate_text = Entry(self, width=10)
 		self.mutation_rate_text.grid(row=5, column=2, sticky=EW)
 
+		# pole do wpisania czasu przeszukiwania lokalnego po zakończeniu algorytmu (0 wyłącza przeszukiwanie)
+		self.local_search_time_label = Label(self, text='Czas przeszukiwania lokalnego')
+		self.local_search_time_label.grid(row=6, column=1, sticky=EW)
+		self.local_search_time_text = Entry(self, width=10)
+		self.local_search_time_text.grid(row=6, column=2, sticky=EW)
+
 		# przycisk do uruchomienia algorytmu szukającego optymalnej trasy
 		find_solution_button = Button(self, text='Znajdź najlepsze rozwiązanie', command=self.root.find_solution)
-		find_solution_button.grid(row=6, column=1, columnspan=2, pady=(10, 0), sticky=EW)
+		find_solution_button.grid(row=7, column=1, columnspan=2, pady=(10, 0), sticky=EW)
+
+		# przycisk do zatrzymania algorytmu (nie jest blokowany w czasie pracy algorytmu)
+		stop_solution_button = Button(self, text='Zatrzymaj', command=self.root.stop_solution)
+		stop_solution_button.grid(row=8, column=1, columnspan=2, sticky=EW)
+
+		# napis z zyskiem najlepszej dotąd znalezionej trasy
+		self.progress_label = Label(self, text='')
+		self.progress_label.grid(row=9, column=1, columnspan=2, sticky=EW)
+
+		# przycisk pokazujący wykres przebiegu optymalizacji (nie jest blokowany w czasie pracy algorytmu)
+		show_convergence_button = Button(self, text='Przebieg optymalizacji',
+										 command=lambda: root.show_frame("ConvergencePage"))
+		show_convergence_button.grid(row=10, column=1, columnspan=2, sticky=EW)
 
 		# lista zawierająca wszystkie przyciski
 		self.buttons = [load_cities_button, load_connections_button, load_salesman_time_limit, load_solution_button,
@@ -293,7 +346,8 @@ class MainPage(Frame):
 
 
 class GraphPage(Frame):
-	# klasa zawiera stronę pokazującą mapę miast, połączeń i drogi
+	# klasa zawiera stronę pokazującą mapę miast, połączeń i drogi. Wykres tworzony jest raz, a przy kolejnych
+	# rysowaniach podmieniane są tylko dane (drogi i trasa to po jednym LineCollection)
 	def __init__(self, parent, root):
 		# stworzenie strony
 		super().__init__(parent)
@@ -303,32 +357,31 @@ class GraphPage(Frame):
 		self.canvas = None  # tu będzie pole na stronie, na którym znajdą się fig, ax i toolbar
 		self.toolbar = None  # tu będzie pasek poruszania się po wykresie
 		self.widget = None
+		self.route_lines = None  # linie trasy, podmieniane przy aktualizacji samej trasy
+		self.drawn_map = None  # (miasta, połączenia) narysowane na mapie
 
 		# przycisk powrotu do strony głównej
 		button1 = Button(self, text="Powrót", command=lambda: root.show_frame("MainPage"))
 		button1.pack()
 
-	def draw_map(self, cities, connections, route):
-		# usunięcie wykresu jeśli jakiś istniał
-		if self.toolbar:
-			self.toolbar.destroy()
-		if self.widget:
-			self.widget.destroy()
-
-		# przygotowanie elementów wykresu
+	def _create_canvas(self):
+		# przygotowanie wykresu, miejsca na wykres i paska nawigacji (tylko przy pierwszym rysowaniu)
 		self.fig = Figure(figsize=(5, 5), dpi=100)
 		self.ax = self.fig.add_subplot(111)
-
-		# przygotowanie miejsca na wykresy
 		self.canvas = FigureCanvasTkAgg(self.fig, self)
-		self.canvas.draw()
 		self.widget = self.canvas.get_tk_widget()
 		self.widget.pack(side=TOP, fill=BOTH, expand=True)
-
-		# stworzenie paska nawigacji
 		self.toolbar = NavigationToolbar2Tk(self.canvas, self)
 		self.toolbar.update()
-		self.canvas._tkcanvas.pack(side=TOP, fill=BOTH, expand=True)
+
+	def draw_map(self, cities, connections, route):
+		# narysowanie mapy; jeśli miasta i połączenia są te same co na narysowanej mapie, to zmieniana jest tylko trasa
+		if self.canvas is None:
+			self._create_canvas()
+
+		if self.drawn_map is not None and self.drawn_map[0] is cities and self.drawn_map[1] is connections:
+			self.update_route(route)
+			return
 
 		# wyczyszczenie wykresu, jeśli jakiś istniał
 		self.ax.clear()
@@ -345,25 +398,31 @@ class GraphPage(Frame):
 			for city_name, x, y, profit in cities:
 				city2coords[city_name] = (x, y)
 
-			for city1, city2, distance in connections:
-				road = self.get_road_from_city_to_city(city2coords[city1], city2coords[city2])
-				xs = [coords[0] for coords in road]
-				ys = [coords[1] for coords in road]
-				self.ax.plot(xs, ys, color='b', linewidth=5)
+			roads = [self.get_road_from_city_to_city(city2coords[city1], city2coords[city2])
+					 for city1, city2, distance in connections]
+			self.ax.add_collection(LineCollection(roads, colors='b', linewidths=5))
+
+		# miejsce na trasę (rysowaną nad drogami)
+		self.route_lines = self.ax.add_collection(LineCollection([], colors='r', linewidths=3, zorder=3))
+		self.ax.autoscale_view()
+		self.drawn_map = (cities, connections)
+		self.update_route(route)
+
+	def update_route(self, route):
+		# podmiana trasy na narysowanej mapie (bez rysowania miast i dróg od nowa)
+		if self.route_lines is None:
+			return
 
 		# naniesienie na mapę trasy, jeśli została wczytana
+		segments = []
 		if route:
 			previous_city = route[0][1:3]
 			for city_name, x, y, distance in route[1:]:
 				next_city = [x, y]
-				road = self.get_road_from_city_to_city(previous_city, next_city)
-
-				xs = [row[0] for row in road]
-				ys = [row[1] for row in road]
-				self.ax.plot(xs, ys, color='r', linewidth=3)
+				segments.append(self.get_road_from_city_to_city(previous_city, next_city))
 				previous_city = next_city
-
-		self.fig.canvas.draw_idle()
+		self.route_lines.set_segments(segments)
+		self.canvas.draw_idle()
 
 	@staticmethod
 	def get_road_from_city_to_city(city1, city2):
@@ -384,6 +443,54 @@ class GraphPage(Frame):
 		return road
 
 
+class ConvergencePage(Frame):
+	# klasa zawiera stronę z wykresem najlepszego i średniego zysku populacji w kolejnych iteracjach. Nowe punkty
+	# są dopisywane do istniejących linii (set_data), a wykres jest odświeżany przez draw_idle
+	def __init__(self, parent, root):
+		# stworzenie strony
+		super().__init__(parent)
+		self.root = root
+		self.iterations = []  # numery iteracji
+		self.best = []  # najlepszy zysk w iteracji
+		self.average = []  # średni zysk populacji w iteracji
+
+		# przycisk powrotu do strony głównej
+		button1 = Button(self, text="Powrót", command=lambda: root.show_frame("MainPage"))
+		button1.pack()
+
+		# przygotowanie wykresu z pustymi liniami
+		self.fig = Figure(figsize=(5, 5), dpi=100)
+		self.ax = self.fig.add_subplot(111)
+		self.ax.set_xlabel('Iteracja')
+		self.ax.set_ylabel('Zysk')
+		self.best_line, = self.ax.plot([], [], color='r', label='najlepszy')
+		self.average_line, = self.ax.plot([], [], color='b', label='średni')
+		self.ax.legend(loc='lower right')
+		self.canvas = FigureCanvasTkAgg(self.fig, self)
+		self.canvas.get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
+
+	def add_points(self, points):
+		# dopisanie punktów (iteracja, najlepszy zysk, średni zysk) do linii wykresu
+		for iteration, best, average in points:
+			self.iterations.append(iteration)
+			self.best.append(best)
+			self.average.append(average)
+		self._update_lines()
+
+	def clear(self):
+		# usunięcie punktów z wykresu
+		self.iterations, self.best, self.average = [], [], []
+		self._update_lines()
+
+	def _update_lines(self):
+		# podmiana danych linii i dopasowanie osi (bez rysowania wykresu od nowa)
+		self.best_line.set_data(self.iterations, self.best)
+		self.average_line.set_data(self.iterations, self.average)
+		self.ax.relim()
+		self.ax.autoscale_view()
+		self.canvas.draw_idle()
+
+
 if __name__ == '__main__':
 	app = TravellingSalesmanApp()
 	app.mainloop()
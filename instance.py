@@ -0,0 +1,141 @@
+import argparse
+import struct
+import sys
+
+import numpy as np
+
+import IO
+import validation
+from algorithm import Graph
+
+# binarny format mapy: nagłówek, a po nim tablice grafu w postaci CSR (współrzędne i zysk miast, początki list
+# sąsiadów, id sąsiadów, odległości) oraz tablica nazw miast (zakodowane nazwy sklejone w jeden ciąg bajtów i ich
+# początki). Każda tablica zaczyna się od adresu podzielnego przez 8, więc plik można odwzorować w pamięci (memmap)
+# i przekazać tablice algorytmom bez tworzenia obiektów dla każdego wiersza
+MAGIC = b'KMWJ'
+VERSION = 1
+HEADER = struct.Struct('<4sIqqq')  # magic, wersja, liczba miast, liczba krawędzi (skierowanych), rozmiar nazw
+EXTENSION = '.kmw'
+
+
+class NameTable:
+    # nazwy miast zapisane w jednym ciągu bajtów; nazwa jest dekodowana dopiero przy odczycie
+    def __init__(self, offsets, data):
+        self.offsets = offsets  # początki kolejnych nazw w data (n_cities + 1 liczb)
+        self.data = data  # nazwy zakodowane w utf8
+
+    @classmethod
+    def from_names(cls, names):
+        # zakodowanie listy nazw
+        encoded = [name.encode('utf8') for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, city_id):
+        if city_id < 0:
+            city_id += len(self)
+        if not 0 <= city_id < len(self):
+            raise IndexError(city_id)
+        return self.data[self.offsets[city_id]:self.offsets[city_id + 1]].tobytes().decode('utf8')
+
+    def __iter__(self):
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode('utf8')
+
+
+def _layout(n_cities, n_edges, names_size):
+    # położenie tablic w pliku: lista (nazwa, typ, liczba elementów, przesunięcie od początku pliku)
+    fields = [('x', np.float64, n_cities), ('y', np.float64, n_cities), ('profit', np.float64, n_cities),
+              ('offsets', np.int64, n_cities + 1), ('neighbours', np.int32, n_edges), ('weights', np.float64, n_edges),
+              ('name_offsets', np.int64, n_cities + 1), ('names', np.uint8, names_size)]
+    layout = []
+    position = HEADER.size
+    for name, dtype, count in fields:
+        position = (position + 7) // 8 * 8  # wyrównanie do 8 bajtów
+        layout.append((name, dtype, count, position))
+        position += np.dtype(dtype).itemsize * count
+    return layout
+
+
+def save_instance(graph, file_path):
+    # zapisanie grafu w formacie binarnym
+    names = graph.names if isinstance(graph.names, NameTable) else NameTable.from_names(graph.names)
+    arrays = {'x': graph.x, 'y': graph.y, 'profit': graph.profit, 'offsets': graph.offsets,
+              'neighbours': graph.neighbours, 'weights': graph.weights, 'name_offsets': names.offsets,
+              'names': names.data}
+    n_edges = len(graph.neighbours)
+    if graph.n_cities >= 2 ** 31:
+        raise ValueError('Zbyt duża liczba miast dla formatu binarnego')
+
+    with open(file_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, graph.n_cities, n_edges, len(names.data)))
+        for name, dtype, count, position in _layout(graph.n_cities, n_edges, len(names.data)):
+            file.write(b'\0' * (position - file.tell()))
+            file.write(np.asarray(arrays[name], dtype=dtype).tobytes())
+
+
+def load_instance(file_path):
+    # wczytanie grafu z pliku binarnego; tablice są odwzorowane w pamięci (tylko do odczytu)
+    with open(file_path, 'rb') as file:
+        magic, version, n_cities, n_edges, names_size = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f'Plik {file_path} nie jest mapą w formacie binarnym')
+    if version != VERSION:
+        raise ValueError(f'Nieobsługiwana wersja formatu binarnego {version}')
+
+    arrays = dict()
+    for name, dtype, count, position in _layout(n_cities, n_edges, names_size):
+        if count == 0:
+            arrays[name] = np.zeros(0, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(file_path, dtype=dtype, mode='r', offset=position, shape=(count,))
+    names = NameTable(arrays['name_offsets'], arrays['names'])
+    return Graph.from_arrays(names, arrays['x'], arrays['y'], arrays['profit'], arrays['offsets'],
+                             arrays['neighbours'], arrays['weights'])
+
+
+def convert_csv(cities_file, roads_file, file_path):
+    # zamiana map zapisanych w plikach csv (miasta i połączenia) na plik binarny; dane są sprawdzane przy zamianie,
+    # więc przy wczytywaniu pliku binarnego nie trzeba tego powtarzać. Zwraca zapisany graf
+    cities, roads = IO.read_cities(cities_file), IO.read_roads(roads_file)
+    valid, errors, infos = validation.check_connections(cities, roads)
+    if not valid:
+        raise ValueError(' '.join(errors + infos))
+    graph = Graph.from_data(cities, roads)
+    save_instance(graph, file_path)
+    return graph
+
+
+def is_instance_file(file_path):
+    # sprawdzenie czy plik jest mapą w formacie binarnym
+    try:
+        with open(file_path, 'rb') as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def parse_arguments(arguments=None):
+    # wczytanie argumentów linii poleceń
+    parser = argparse.ArgumentParser(description='Zamiana mapy z plików csv na format binarny')
+    parser.add_argument('cities', help='plik csv z miastami (nazwa, x, y, zysk)')
+    parser.add_argument('roads', help='plik csv z połączeniami (miasto1, miasto2, odległość)')
+    parser.add_argument('output', help=f'plik wynikowy (zwykle z rozszerzeniem {EXTENSION})')
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    args = parse_arguments(arguments)
+    graph = convert_csv(args.cities, args.roads, args.output)
+    print(f'Zapisano {graph.n_cities} miast i {len(graph.neighbours) // 2} połączeń do {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
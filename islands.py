@@ -0,0 +1,138 @@
+import multiprocessing
+import time
+from queue import Empty
+
+import numpy as np
+
+
+class Migration:
+    # wymiana tras między wyspami: co migration_interval iteracji najlepsze trasy wysyłane są do następnej wyspy
+    # (topologia pierścienia), a trasy, które przyszły od poprzedniej wyspy, trafiają do populacji
+    def __init__(self, inbox, outbox, migration_interval, migration_size):
+        self.inbox = inbox  # kolejka z trasami od poprzedniej wyspy
+        self.outbox = outbox  # kolejka do następnej wyspy
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+
+    def __call__(self, iteration, ranked_population):
+        if iteration == 0 or iteration % self.migration_interval:
+            return []
+
+        # wysłanie najlepszych tras w postaci list id miast
+        self.outbox.put([list(route.route) for route in ranked_population[:self.migration_size]])
+
+        # odebranie wszystkich tras, które czekają w kolejce
+        immigrants = []
+        while True:
+            try:
+                immigrants += self.inbox.get_nowait()
+            except Empty:
+                return immigrants
+
+
+def _run_island(algorithm_class, graph, max_distance, options, island_id, seed, settings, deadline, inbox, outbox,
+                results, stop_event, migration_interval, migration_size):
+    # praca jednej wyspy w osobnym procesie. Wyspa dostaje tylko dane, które da się przesłać do procesu (graf, czas
+    # pracy Komiwojażera, ustawienia, ziarno), a nie cały algorytm z funkcjami zwrotnymi. Do kolejki results trafiają
+    # kolejne coraz lepsze trasy jako ('improvement', trasa, zysk) i na końcu wynik jako
+    # ('result', id wyspy, trasa, zysk, statystyki)
+    outbox.cancel_join_thread()  # proces może się zakończyć, nawet jeśli następna wyspa nie odebrała tras
+    algorithm = algorithm_class(None, None, max_distance, seed=seed, graph=graph)  # własny strumień liczb losowych
+    algorithm.vectorized = options['vectorized']
+    algorithm.route_cache_size = options['route_cache_size']
+    algorithm.unique_routes = options['unique_routes']
+    algorithm.stop_event = stop_event
+    algorithm.on_improvement = lambda route: results.put(('improvement', list(route.route), route.fitness))
+    algorithm.preprocess()
+    migration = Migration(inbox, outbox, migration_interval, migration_size)
+    try:
+        best_route = algorithm._evolve(time_limit=max(deadline - time.time(), 0), migration=migration, **settings)
+        results.put(('result', island_id, list(best_route.route), best_route.fitness, algorithm.statistics))
+    except Exception as e:
+        results.put(('result', island_id, None, repr(e), {'iterations': 0, 'evaluated_routes': 0}))
+
+
+class IslandModel:
+    # model wyspowy algorytmu genetycznego: n_islands niezależnych populacji ewoluuje w osobnych procesach
+    # i co jakiś czas wymienia się najlepszymi trasami. Łączny czas pracy nie przekracza time_limit
+    RESULT_GRACE_PERIOD = 5  # ile sekund ponad limit czasu czekamy na wyniki wysp
+    POLL_INTERVAL = 0.1  # co ile sekund sprawdzane jest zatrzymanie optymalizacji w czasie czekania na wyspy
+
+    def __init__(self, n_islands, migration_interval=50, migration_size=5):
+        self.n_islands = n_islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.statistics = []  # statystyki poszczególnych wysp z ostatniego uruchomienia
+
+    def island_seeds(self, seed):
+        # niezależne ziarna wysp wyprowadzone z jednego ziarna (None - losowe). SeedSequence nie przyjmuje liczb
+        # ujemnych, więc brana jest wartość bezwzględna - tak jak robi to random.Random dla pojedynczej populacji
+        if seed is not None:
+            seed = abs(seed)
+        return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(self.n_islands)]
+
+    def run(self, algorithm, n_iterations, population_size, mutation_rate, elite_size, time_limit, verbose,
+            seed_fraction=0, seed=None, on_improvement=None):
+        # uruchomienie wysp i zwrócenie najlepszej trasy (lista id miast) spośród wszystkich wysp. Zatrzymanie
+        # algorytmu (algorithm.stop_event) jest przekazywane wyspom, a coraz lepsze trasy wysp (listy id miast)
+        # trafiają do on_improvement w tym procesie
+        seeds = self.island_seeds(seed)
+        deadline = time.time() + time_limit
+        context = multiprocessing.get_context()
+        queues = [context.Queue() for _ in range(self.n_islands)]
+        results = context.Queue()
+        stop_event = context.Event()
+        options = {'vectorized': algorithm.vectorized, 'route_cache_size': algorithm.route_cache_size,
+                   'unique_routes': algorithm.unique_routes}
+
+        processes = []
+        for island_id in range(self.n_islands):
+            # komunikaty wypisuje tylko pierwsza wyspa
+            settings = {'n_iterations': n_iterations, 'population_size': population_size,
+                        'mutation_rate': mutation_rate, 'elite_size': elite_size, 'seed_fraction': seed_fraction,
+                        'verbose': verbose and island_id == 0}
+            inbox = queues[island_id]
+            outbox = queues[(island_id + 1) % self.n_islands]
+            process = context.Process(target=_run_island, daemon=True,
+                                      args=(type(algorithm), algorithm.graph, algorithm.max_distance, options,
+                                            island_id, seeds[island_id], settings, deadline, inbox, outbox, results,
+                                            stop_event, self.migration_interval, self.migration_size))
+            process.start()
+            processes.append(process)
+
+        # zebranie wyników wysp, które zdążyły się zakończyć
+        best_route, best_fitness, errors = None, None, []
+        best_improvement = None  # zysk ostatniej trasy przekazanej do on_improvement
+        self.statistics = []
+        while len(self.statistics) < len(processes):
+            if algorithm.stopped:
+                stop_event.set()
+            timeout = deadline + self.RESULT_GRACE_PERIOD - time.time()
+            if timeout <= 0:
+                break
+            try:
+                message = results.get(timeout=min(timeout, self.POLL_INTERVAL))
+            except Empty:
+                continue
+            if message[0] == 'improvement':
+                _, route, fitness = message
+                if on_improvement is not None and (best_improvement is None or fitness > best_improvement):
+                    best_improvement = fitness
+                    on_improvement(route)
+                continue
+
+            _, island_id, route, fitness, statistics = message
+            self.statistics.append(statistics)
+            if route is None:
+                errors.append(fitness)
+            elif best_fitness is None or fitness > best_fitness:
+                best_route, best_fitness = route, fitness
+
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+        if best_route is None:
+            raise RuntimeError(f'Żadna z wysp nie zwróciła wyniku {errors}')
+        return best_route
@@ -0,0 +1,145 @@
+import itertools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Empty
+
+from algorithm import GeneticAlgorithm
+from metrics import ThrottledChannel
+from solution_cache import SolutionCache
+
+# zadania zlecane przez controller: wyznaczanie trasy w osobnym procesie (nie konkuruje z okienkiem o GIL) oraz
+# wczytywanie i zapisywanie plików w puli wątków. Ani ten moduł, ani controller.py (który proces z puli importuje
+# ponownie jako główny moduł programu) nie importują okienka, żeby procesy z puli były lekkie
+
+CONVERGENCE_INTERVAL = 0.2  # co ile sekund proces z puli wysyła punkty przebiegu optymalizacji
+
+# zdarzenie zatrzymania i kolejka postępu procesu z puli (przekazywane przy jego tworzeniu) oraz pamięć rozwiązań,
+# dzięki której ponowne wyznaczenie trasy dla tych samych danych nie zaczyna optymalizacji od początku
+_stop_event = None
+_progress_queue = None
+_solution_cache = None
+
+
+def _init_solver(stop_event, progress_queue, cache_directory=None):
+    # inicjalizacja procesu z puli wyznaczającej trasy
+    global _stop_event, _progress_queue, _solution_cache
+    _stop_event = stop_event
+    _progress_queue = progress_queue
+    _solution_cache = SolutionCache(directory=cache_directory)
+
+
+def solve_route(cities, connections, salesman_max_time, settings, graph=None):
+    # wyznaczenie trasy w procesie z puli; do kolejki postępu trafiają kolejne coraz lepsze trasy jako
+    # ('route', zysk, długość, rozwiązanie) oraz paczki punktów przebiegu optymalizacji jako ('convergence', punkty).
+    # graph - gotowy graf zamiast miast i połączeń. Zwraca (rozwiązanie, zysk, długość) najlepszej trasy.
+    # Zdarzenie zatrzymania czyści JobManager przy zlecaniu zadania, więc zatrzymanie zadania czekającego w kolejce
+    # nie przepada
+    def report(route):
+        _progress_queue.put(('route', route.fitness, route.distance, route.to_solution()))
+
+    convergence = ThrottledChannel(lambda points: _progress_queue.put(('convergence', points)),
+                                   CONVERGENCE_INTERVAL)
+    algorithm = GeneticAlgorithm(cities, connections, salesman_max_time, graph=graph)
+    try:
+        best_route = _solution_cache.find_optimal_route(algorithm, on_improvement=report, stop_event=_stop_event,
+                                                        on_iteration=convergence, **settings)
+    finally:
+        convergence.flush()
+    return best_route.to_solution(), best_route.fitness, best_route.distance
+
+
+class Job:
+    # zlecone zadanie: identyfikator, rodzaj ('solve' albo 'io'), klucz do wykrywania powtórzeń i wynik (Future)
+    def __init__(self, job_id, kind, key, future):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.future = future
+
+    @property
+    def status(self):
+        # 'pending', 'running', 'done', 'failed' albo 'cancelled'
+        if self.future.cancelled():
+            return 'cancelled'
+        if self.future.done():
+            return 'failed' if self.future.exception() is not None else 'done'
+        return 'running' if self.future.running() else 'pending'
+
+
+class JobManager:
+    # pule wykonujące zadania: procesy dla wyznaczania tras i wątki dla operacji na plikach. Zadanie z kluczem,
+    # który ma już niezakończone zadanie, nie jest zlecane ponownie (zwracany jest identyfikator istniejącego).
+    # cache_directory - katalog, w którym procesy z puli zapisują wyznaczone rozwiązania (None - tylko w pamięci)
+    def __init__(self, n_solvers=1, n_io_threads=4, cache_directory=None):
+        # procesy z puli są uruchamiane od nowa (spawn), a nie kopiowane (fork) z procesu z okienkiem, który ma już
+        # działające wątki i połączenie z serwerem X
+        context = multiprocessing.get_context('spawn')
+        self.stop_event = context.Event()  # ustawienie zatrzymuje trasę wyznaczaną w procesie z puli
+        self.progress_queue = context.Queue()  # coraz lepsze trasy wysyłane przez procesy z puli
+        self._solvers = ProcessPoolExecutor(n_solvers, mp_context=context, initializer=_init_solver,
+                                            initargs=(self.stop_event, self.progress_queue, cache_directory))
+        self._io = ThreadPoolExecutor(n_io_threads)
+        self.jobs = dict()  # id zadania -> Job
+        self._in_flight = dict()  # klucz -> id niezakończonego zadania
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, key=None, on_done=None, **kwargs):
+        # zlecenie wykonania func(*args, **kwargs); on_done(job) jest wywoływane po zakończeniu zadania
+        with self._lock:
+            if key is not None and key in self._in_flight:
+                return self._in_flight[key]
+            job_id = next(self._ids)
+            if kind == 'solve':
+                self.stop_event.clear()  # zatrzymanie dotyczy zadań zleconych przed nim
+            executor = self._solvers if kind == 'solve' else self._io
+            job = Job(job_id, kind, key, executor.submit(func, *args, **kwargs))
+            self.jobs[job_id] = job
+            if key is not None:
+                self._in_flight[key] = job_id
+        job.future.add_done_callback(lambda _: self._finish(job, on_done))
+        return job_id
+
+    def pending(self, key):
+        # id niezakończonego zadania z kluczem key albo None
+        with self._lock:
+            return self._in_flight.get(key)
+
+    def _finish(self, job, on_done):
+        # zakończenie zadania: zwolnienie klucza i powiadomienie zlecającego
+        with self._lock:
+            if job.key is not None and self._in_flight.get(job.key) == job.id:
+                del self._in_flight[job.key]
+        if on_done is not None:
+            on_done(job)
+
+    def status(self, job_id):
+        # stan zadania
+        return self.jobs[job_id].status
+
+    def result(self, job_id, timeout=None):
+        # wynik zadania (czeka na jego zakończenie)
+        return self.jobs[job_id].future.result(timeout)
+
+    def progress(self):
+        # wszystkie oczekujące komunikaty o postępie wyznaczania tras
+        messages = []
+        while True:
+            try:
+                messages.append(self.progress_queue.get_nowait())
+            except Empty:
+                return messages
+
+    def stop_solvers(self):
+        # anulowanie oczekujących zadań wyznaczania tras i zatrzymanie wyznaczanej trasy
+        for job in list(self.jobs.values()):
+            if job.kind == 'solve':
+                job.future.cancel()
+        self.stop_event.set()
+
+    def shutdown(self):
+        # zatrzymanie pracy i zamknięcie pul
+        self.stop_solvers()
+        self._io.shutdown(wait=False, cancel_futures=True)
+        self._solvers.shutdown(wait=False, cancel_futures=True)
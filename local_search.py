@@ -0,0 +1,159 @@
+import time
+from collections import Counter
+
+
+class LocalSearch:
+    # poprawianie gotowej trasy ruchami lokalnymi: usuwanie zbędnych powrotów do odwiedzonych już miast, dołączanie
+    # nieodwiedzonych sąsiadów w zwolnionym czasie, zamiana miast na trasie na cenniejsze oraz odwracanie fragmentów
+    # trasy, jeśli skraca to trasę. Każdy ruch zachowuje poprawność trasy i nie zmniejsza zysku
+    def __init__(self, graph, max_distance):
+        self.graph = graph  # Graph
+        self.max_distance = max_distance  # maksymalny dystans / czas pracy Komiwojażera
+
+    def improve(self, route, time_limit):
+        # poprawianie poprawnej trasy (listy id miast) przez co najwyżej time_limit sekund; zwraca nową listę id miast
+        deadline = time.time() + time_limit
+        ids = list(route)
+        moves = (self._remove_redundant_visits, self._replace_cities, self._insert_unvisited,
+                 self._reverse_segments)
+        improved = True
+        while improved and time.time() < deadline:
+            improved = False
+            for move in moves:
+                if time.time() >= deadline:
+                    break
+                new_ids = move(ids, deadline)
+                if new_ids is not None:
+                    ids = new_ids
+                    improved = True
+        return ids
+
+    def _distance(self, ids):
+        # długość trasy zapisanej jako lista id miast
+        return sum(self.graph.distance(ids[idx], ids[idx + 1]) for idx in range(len(ids) - 1))
+
+    def _remove_redundant_visits(self, ids, deadline):
+        # usunięcie pętli (fragmentu między dwoma odwiedzinami tego samego miasta) oraz miast na początku i na końcu
+        # trasy, jeśli wszystkie usuwane miasta są odwiedzane także w innym miejscu trasy
+        ids = list(ids)
+        visits = Counter(ids)
+        changed = False
+
+        # skrajne miasta odwiedzane więcej niż raz
+        while len(ids) > 2 and visits[ids[0]] > 1:
+            visits[ids.pop(0)] -= 1
+            changed = True
+        while len(ids) > 2 and visits[ids[-1]] > 1:
+            visits[ids.pop()] -= 1
+            changed = True
+
+        # pętle wewnątrz trasy
+        idx = 0
+        while idx < len(ids) and time.time() < deadline:
+            removed = False
+            for end in range(idx + 2, len(ids)):
+                if ids[end] != ids[idx]:
+                    continue
+                loop = Counter(ids[idx + 1:end + 1])
+                if all(visits[city_id] > count for city_id, count in loop.items()) and len(ids) - (end - idx) >= 2:
+                    visits.subtract(loop)
+                    del ids[idx + 1:end + 1]
+                    removed = changed = True
+                    break
+            if not removed:
+                idx += 1
+
+        return ids if changed else None
+
+    def _insert_unvisited(self, ids, deadline):
+        # dołączanie nieodwiedzonych miast w wolnym czasie: na początku lub na końcu trasy albo jako wypad
+        # z miasta na trasie i powrót do niego. Wybierany jest ruch o największym zysku na jednostkę odległości
+        ids = list(ids)
+        visited = set(ids)
+        free = self.max_distance - self._distance(ids)
+        changed = False
+        while time.time() < deadline:
+            best = None
+            for position, city_id in enumerate(ids):
+                for neighbour, distance in self.graph.connections_of(city_id):
+                    if neighbour in visited or self.graph.profit[neighbour] <= 0:
+                        continue
+                    profit = self.graph.profit[neighbour]
+                    if position == 0 and distance <= free:
+                        best = max(best, self._move(profit, distance, 0, [neighbour]), key=self._move_key)
+                    if position == len(ids) - 1 and distance <= free:
+                        best = max(best, self._move(profit, distance, len(ids), [neighbour]), key=self._move_key)
+                    if 2 * distance <= free:
+                        best = max(best, self._move(profit, 2 * distance, position + 1, [neighbour, city_id]),
+                                   key=self._move_key)
+            if best is None:
+                break
+
+            _, cost, position, inserted = best
+            ids[position:position] = inserted
+            visited.update(inserted)
+            free -= cost
+            changed = True
+
+        return ids if changed else None
+
+    @staticmethod
+    def _move(profit, cost, position, inserted):
+        # opis ruchu wstawienia miast: (zysk na jednostkę odległości, koszt, miejsce wstawienia, wstawiane miasta)
+        return (profit / cost if cost else float('inf')), cost, position, inserted
+
+    @staticmethod
+    def _move_key(move):
+        # klucz porównywania ruchów (brak ruchu jest gorszy od każdego ruchu)
+        return (-1, 0) if move is None else (move[0], -move[1])
+
+    def _replace_cities(self, ids, deadline):
+        # zamiana miasta x we fragmencie (a, x, b) na nieodwiedzone miasto y połączone z a i b, jeśli y jest
+        # cenniejsze niż to, co wnosi x (x odwiedzane także gdzie indziej nie wnosi nic) i zmiana mieści się w limicie
+        ids = list(ids)
+        visits = Counter(ids)
+        free = self.max_distance - self._distance(ids)
+        changed = False
+        for idx in range(1, len(ids) - 1):
+            if time.time() >= deadline:
+                break
+            a, x, b = ids[idx - 1], ids[idx], ids[idx + 1]
+            lost = self.graph.profit[x] if visits[x] == 1 else 0
+            old_cost = self.graph.distance(a, x) + self.graph.distance(x, b)
+            best = None
+            for y, distance in self.graph.connections_of(a):
+                if visits[y] or not self.graph.is_connected(y, b):
+                    continue
+                new_cost = distance + self.graph.distance(y, b)
+                gain = self.graph.profit[y] - lost
+                if gain > 0 and new_cost - old_cost <= free and (best is None or gain > best[0]):
+                    best = (gain, y, new_cost - old_cost)
+            if best is not None:
+                _, y, extra = best
+                ids[idx] = y
+                visits[x] -= 1
+                visits[y] += 1
+                free -= extra
+                changed = True
+
+        return ids if changed else None
+
+    def _reverse_segments(self, ids, deadline):
+        # odwrócenie fragmentu trasy ids[i:j + 1], jeśli nowe połączenia istnieją i skracają trasę (zbiór
+        # odwiedzonych miast się nie zmienia, więc zysk zostaje ten sam, a zaoszczędzony czas wykorzystają inne ruchy)
+        ids = list(ids)
+        changed = False
+        for i in range(1, len(ids) - 1):
+            if time.time() >= deadline:
+                break
+            for j in range(i + 1, len(ids) - 1):
+                before, first, last, after = ids[i - 1], ids[i], ids[j], ids[j + 1]
+                if not (self.graph.is_connected(before, last) and self.graph.is_connected(first, after)):
+                    continue
+                old_cost = self.graph.distance(before, first) + self.graph.distance(last, after)
+                new_cost = self.graph.distance(before, last) + self.graph.distance(first, after)
+                if new_cost < old_cost:
+                    ids[i:j + 1] = ids[i:j + 1][::-1]
+                    changed = True
+
+        return ids if changed else None
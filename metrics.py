@@ -0,0 +1,85 @@
+import time
+from collections import Counter
+
+
+class EvolutionMetrics:
+    # zbieranie statystyk pracy algorytmu genetycznego: czasy poszczególnych faz w każdej generacji, liczby
+    # odrzuconych dzieci i mutantów według przyczyny niepoprawności oraz różnorodność populacji. Po każdej
+    # generacji opcjonalna funkcja callback dostaje słownik z danymi tej generacji. Gdy algorytm nie dostał
+    # obiektu metryk, żadna z tych wartości nie jest liczona
+    PHASES = ('rank_routes', 'select_best_individuals', 'breed_population', 'mutate_population')
+
+    def __init__(self, callback=None, keep_generations=True):
+        self.callback = callback  # funkcja wywoływana ze słownikiem danych po każdej generacji
+        self.keep_generations = keep_generations  # czy zapamiętywać dane wszystkich generacji
+        self.generations = []  # dane kolejnych generacji
+        self.phase_times = dict.fromkeys(self.PHASES, 0.0)  # łączny czas poszczególnych faz
+        self.rejected = Counter()  # łączna liczba odrzuconych tras według przyczyny niepoprawności
+        self._timings = dict()  # czasy faz w bieżącej generacji
+        self._rejected = Counter()  # odrzucone trasy w bieżącej generacji
+
+    def timed(self, phase, function, *args):
+        # wywołanie function(*args) z pomiarem czasu jako faza phase bieżącej generacji
+        start = time.perf_counter()
+        result = function(*args)
+        self._timings[phase] = self._timings.get(phase, 0.0) + time.perf_counter() - start
+        return result
+
+    def count_rejected(self, routes):
+        # zliczenie niepoprawnych tras (już ocenionych) według przyczyny niepoprawności
+        self._rejected.update(route.invalid_cause for route in routes if not route.valid)
+
+    @staticmethod
+    def diversity(population):
+        # odsetek różnych tras w populacji (1 - wszystkie trasy różne)
+        if not population:
+            return 0.0
+        return len({tuple(route.route) for route in population}) / len(population)
+
+    def end_generation(self, iteration, ranked_population):
+        # zapisanie danych zakończonej generacji i przekazanie ich do funkcji callback
+        fitnesses = [route.fitness for route in ranked_population]
+        record = {'iteration': iteration, 'best_fitness': fitnesses[0],
+                  'average_fitness': sum(fitnesses) / len(fitnesses), 'diversity': self.diversity(ranked_population),
+                  'timings': self._timings, 'rejected': dict(self._rejected)}
+        for phase, phase_time in self._timings.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + phase_time
+        self.rejected.update(self._rejected)
+        self._timings = dict()
+        self._rejected = Counter()
+
+        if self.keep_generations:
+            self.generations.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+        # podsumowanie: łączne czasy faz, ich udział w czasie wszystkich faz i łączne liczby odrzuconych tras
+        total = sum(self.phase_times.values())
+        return {'phase_times': dict(self.phase_times),
+                'phase_shares': {phase: (phase_time / total if total else 0.0)
+                                 for phase, phase_time in self.phase_times.items()},
+                'rejected': dict(self.rejected)}
+
+
+class ThrottledChannel:
+    # kanał przekazywania przebiegu optymalizacji (iteracja, najlepszy zysk, średni zysk): punkty są grupowane
+    # i wysyłane funkcją send w paczkach nie częściej niż co interval sekund, żeby odbiorca (np. okienko) nie
+    # spowalniał algorytmu. Po zakończeniu pracy należy wywołać flush, żeby wysłać ostatnie punkty
+    def __init__(self, send, interval=0.2):
+        self.send = send  # funkcja przyjmująca listę punktów
+        self.interval = interval
+        self.points = []  # punkty czekające na wysłanie
+        self._last_sent = time.perf_counter()
+
+    def __call__(self, iteration, best_fitness, average_fitness):
+        self.points.append((iteration, best_fitness, average_fitness))
+        if time.perf_counter() - self._last_sent >= self.interval:
+            self.flush()
+
+    def flush(self):
+        # wysłanie wszystkich czekających punktów
+        if self.points:
+            self.send(self.points)
+            self.points = []
+        self._last_sent = time.perf_counter()
@@ -0,0 +1,89 @@
+from itertools import chain
+
+import numpy as np
+
+
+class PopulationMatrix:
+    # populacja tras zapisana jako macierz id miast (krótsze trasy uzupełnione wartością PADDING) oraz wektor długości
+    # tras. Pozwala policzyć długość, poprawność i zysk wszystkich tras jednocześnie
+    PADDING = -1
+
+    # kody przyczyn niepoprawności tras, zgodne z opisami z Route.is_valid
+    VALID = 0
+    TOO_SHORT = 1
+    NOT_CONNECTED = 2
+    TOO_LONG = 3
+    INVALID_CAUSES = {TOO_SHORT: 'less than 2 cities', NOT_CONNECTED: 'cities not connected', TOO_LONG: 'too long'}
+
+    def __init__(self, matrix, lengths):
+        self.matrix = matrix  # np.array (n_routes, max_length) z id miast
+        self.lengths = lengths  # np.array (n_routes,) z długościami tras
+
+    @classmethod
+    def from_routes(cls, routes):
+        # zbudowanie macierzy z listy tras (obiektów Route lub list id miast)
+        routes = [route.route if hasattr(route, 'route') else route for route in routes]
+        lengths = np.fromiter((len(route) for route in routes), dtype=np.int64, count=len(routes))
+        width = max(int(lengths.max(initial=0)), 1)
+        matrix = np.full((len(routes), width), cls.PADDING, dtype=np.int64)
+        matrix[np.arange(width) < lengths[:, None]] = np.fromiter(chain.from_iterable(routes), dtype=np.int64,
+                                                                  count=int(lengths.sum()))
+        return cls(matrix, lengths)
+
+    def to_routes(self):
+        # zamiana macierzy z powrotem na listę tras (list id miast)
+        return [row[:length] for row, length in zip(self.matrix.tolist(), self.lengths.tolist())]
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def distances(self, graph):
+        # długość każdej trasy oraz informacja czy wszystkie sąsiednie miasta na trasie są połączone
+        # (dla tras z brakującymi połączeniami długość uwzględnia tylko istniejące połączenia)
+        profit, edge_keys, edge_weights = graph.arrays()
+        hops = np.arange(self.matrix.shape[1] - 1) < (self.lengths - 1)[:, None]
+        keys = self.matrix[:, :-1] * graph.n_cities + self.matrix[:, 1:]
+
+        positions = np.searchsorted(edge_keys, keys)
+        positions = np.minimum(positions, max(len(edge_keys) - 1, 0))
+        if len(edge_keys):
+            found = (edge_keys[positions] == keys) & hops
+            hop_distances = np.where(found, edge_weights[positions], 0)
+        else:
+            found = np.zeros_like(hops)
+            hop_distances = np.zeros(hops.shape)
+
+        connected = np.all(found | ~hops, axis=1)
+        return hop_distances.sum(axis=1), connected
+
+    def profits(self, graph):
+        # zysk z każdej trasy: każde miasto liczone jest tylko raz, niezależnie od liczby odwiedzin
+        profit = graph.arrays()[0]
+        ordered = np.sort(self.matrix, axis=1)
+        first_visit = np.ones(ordered.shape, dtype=bool)
+        first_visit[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        first_visit &= ordered != self.PADDING
+        return np.where(first_visit, profit[np.maximum(ordered, 0)], 0).sum(axis=1)
+
+    def evaluate(self, graph, max_distance):
+        # ocena całej populacji: zwraca długości, zyski oraz kody przyczyn niepoprawności tras (VALID dla poprawnych)
+        distances, connected = self.distances(graph)
+        profits = self.profits(graph)
+        causes = np.full(len(self), self.VALID, dtype=np.int8)
+        causes[distances > max_distance] = self.TOO_LONG
+        causes[~connected] = self.NOT_CONNECTED
+        causes[self.lengths < 2] = self.TOO_SHORT
+        return distances, profits, causes
+
+    @classmethod
+    def evaluate_routes(cls, routes, graph, max_distance):
+        # ocena listy obiektów Route i zapisanie wyników w ich polach, tak jakby zostały policzone przez Route
+        if not routes:
+            return
+        distances, profits, causes = cls.from_routes(routes).evaluate(graph, max_distance)
+        for route, distance, profit, cause in zip(routes, distances.tolist(), profits.tolist(), causes.tolist()):
+            route._fitness = profit
+            if cause != cls.NOT_CONNECTED:
+                route._distance = distance
+            route.valid = cause == cls.VALID
+            route.invalid_cause = cls.INVALID_CAUSES.get(cause)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from algorithm import GeneticAlgorithm, Route
+from checkpoint import Checkpoint
+
+# pamięć rozwiązań algorytmu genetycznego: najlepsza trasa i stan optymalizacji (Checkpoint) zapamiętywane pod
+# skrótem treści mapy, czasu pracy Komiwojażera i hiperparametrów. Budżet (n_iterations, time_limit) nie jest częścią
+# klucza - ponowne uruchomienie z tym samym lub mniejszym budżetem zwraca zapamiętaną trasę od razu, a z większym
+# kontynuuje optymalizację od zapamiętanego stanu
+
+# argumenty find_optimal_route, które nie wpływają na wynik albo są budżetem optymalizacji
+IGNORED_SETTINGS = ('n_iterations', 'time_limit', 'verbose', 'metrics', 'checkpoint_interval', 'on_improvement',
+                    'stop_event', 'on_iteration', 'route_cache_size')
+# argumenty, przy których pamięć nie jest używana (optymalizacja z własnymi punktami kontrolnymi)
+UNCACHED_SETTINGS = ('checkpoint_file', 'resume_from')
+
+
+class SolutionCache:
+    # max_entries ostatnio używanych rozwiązań w pamięci oraz, jeśli podano directory, wszystkie rozwiązania na dysku
+    # (pliki <klucz>.npz ze stanem optymalizacji i <klucz>.json z najlepszą trasą)
+    def __init__(self, max_entries=16, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.entries = OrderedDict()  # klucz -> (lista id miast najlepszej trasy, Checkpoint)
+        self.hits = 0  # liczba uruchomień, dla których zwrócono zapamiętaną trasę bez optymalizacji
+        self.warm_starts = 0  # liczba uruchomień kontynuujących zapamiętaną optymalizację
+        self.misses = 0  # liczba uruchomień od początku
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(graph, max_distance, settings):
+        # skrót treści mapy, czasu pracy Komiwojażera i hiperparametrów wpływających na wynik (brakujące
+        # hiperparametry zastępowane są domyślnymi, żeby jawne podanie wartości domyślnej dawało ten sam klucz)
+        digest = hashlib.sha256()
+        digest.update('\0'.join(graph.names).encode('utf8'))
+        for values, dtype in ((graph.x, np.float64), (graph.y, np.float64), (graph.profit, np.float64),
+                              (graph.offsets, np.int64), (graph.neighbours, np.int64), (graph.weights, np.float64)):
+            digest.update(np.asarray(values, dtype=dtype).tobytes())
+
+        parameters = dict(GeneticAlgorithm.DEFAULT_SETTINGS, seed_fraction=GeneticAlgorithm.BEAM_SEARCH_SETTINGS[
+            'seed_fraction'])
+        parameters.update((name, value) for name, value in settings.items() if value is not None)
+        parameters = {name: value for name, value in parameters.items() if name not in IGNORED_SETTINGS}
+        digest.update(json.dumps([max_distance, sorted(parameters.items())]).encode('utf8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        # zapamiętane (trasa, Checkpoint) albo None; rozwiązanie z dysku trafia do pamięci
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.directory is None:
+            return None
+        route_path, checkpoint_path = self._paths(key)
+        if not os.path.exists(route_path) or not os.path.exists(checkpoint_path):
+            return None
+        with open(route_path, 'r', encoding='utf8') as file:
+            route = json.load(file)['route']
+        entry = (route, Checkpoint.load(checkpoint_path))
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key, route, checkpoint):
+        # zapamiętanie najlepszej trasy (lista id miast) i stanu optymalizacji
+        entry = (list(route), checkpoint)
+        self._remember(key, entry)
+        if self.directory is not None:
+            route_path, checkpoint_path = self._paths(key)
+            checkpoint.save(checkpoint_path)
+            temporary_path = route_path + '.tmp'
+            with open(temporary_path, 'w', encoding='utf8') as file:
+                json.dump({'route': entry[0]}, file)
+            os.replace(temporary_path, route_path)
+
+    def _remember(self, key, entry):
+        # dodanie rozwiązania do pamięci i usunięcie najdawniej używanego, jeśli pamięć jest pełna
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _paths(self, key):
+        # pliki rozwiązania na dysku
+        return os.path.join(self.directory, key + '.json'), os.path.join(self.directory, key + '.npz')
+
+    def find_optimal_route(self, algorithm, **settings):
+        # find_optimal_route algorytmu z użyciem pamięci rozwiązań; statystyki algorytmu zawierają 'cached'
+        # ('hit', 'warm_start', 'miss' albo None, jeśli pamięć nie była używana - np. w modelu wyspowym, który nie
+        # zostawia stanu do kontynuacji)
+        if settings.get('n_islands', 1) > 1 or any(settings.get(name) is not None for name in UNCACHED_SETTINGS):
+            route = algorithm.find_optimal_route(**settings)
+            algorithm.statistics['cached'] = None
+            return route
+
+        key = self.make_key(algorithm.graph, algorithm.max_distance, settings)
+        entry = self.get(key)
+        n_iterations = settings.pop('n_iterations', None)
+        if n_iterations is None:
+            n_iterations = GeneticAlgorithm.DEFAULT_SETTINGS['n_iterations']
+        time_limit = settings.pop('time_limit', None)
+        if time_limit is None:
+            time_limit = GeneticAlgorithm.DEFAULT_SETTINGS['time_limit']
+
+        if entry is None:
+            self.misses += 1
+            route = algorithm.find_optimal_route(n_iterations=n_iterations, time_limit=time_limit, **settings)
+            algorithm.statistics['cached'] = 'miss'
+            self.put(key, route.route, algorithm.last_checkpoint)
+            return route
+
+        cached_ids, checkpoint = entry
+        cached_route = Route(cached_ids, algorithm.graph)
+        cached_route.is_valid(algorithm.max_distance)
+        remaining_iterations = n_iterations - checkpoint.iteration
+        remaining_time = time_limit - checkpoint.elapsed
+        if remaining_iterations <= 0 or remaining_time <= 0:
+            # zapamiętana optymalizacja wykorzystała już co najmniej taki budżet
+            self.hits += 1
+            algorithm.statistics = {'iterations': 0, 'evaluated_routes': 0, 'seed': checkpoint.seed,
+                                    'history': list(checkpoint.history), 'runtime': 0, 'stopped': False,
+                                    'cached': 'hit'}
+            if settings.get('on_improvement') is not None:
+                settings['on_improvement'](cached_route)
+            return cached_route
+
+        # kontynuacja zapamiętanej optymalizacji przez pozostałą część budżetu
+        self.warm_starts += 1
+        route = algorithm.find_optimal_route(n_iterations=remaining_iterations, time_limit=remaining_time,
+                                             resume_from=checkpoint, **settings)
+        algorithm.statistics['cached'] = 'warm_start'
+        if cached_route.fitness > route.fitness:
+            route = cached_route  # trasa poprawiona wcześniej przeszukiwaniem lokalnym może być lepsza
+        self.put(key, route.route, algorithm.last_checkpoint)
+        return route
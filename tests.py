@@ -1,7 +1,32 @@
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-
-from algorithm import City, Route, GeneticAlgorithm
+from queue import Queue
+from unittest import mock
+
+from algorithm import City, Graph, Route, GeneticAlgorithm
+import batch
+import benchmark
+import cli
+import controller
+import gui
+import instance
 import IO
+import validation
+from beam_search import BeamSearch
+from checkpoint import Checkpoint
+from exact import BranchAndBound
+from islands import IslandModel
+from jobs import JobManager, solve_route
+from local_search import LocalSearch
+from metrics import EvolutionMetrics, ThrottledChannel
+from population import PopulationMatrix
+from solution_cache import SolutionCache
 
 
 class TestCaseCity(unittest.TestCase):
@@ -69,61 +94,233 @@ class TestCaseCity(unittest.TestCase):
 
 class TestRoute(unittest.TestCase):
 	def setUp(self):
-		self.cities = {'Miasto1': City('Miasto1', 1, 1, 5), 'Miasto2': City('Miasto2', 2, 2, 4),
-					   'Miasto3': City('Miasto3', 2, 2, 6)}
-		self.connections = [('Miasto1', 'Miasto2', 2)]
-		self.cities['Miasto1'].add_connection('Miasto2', 2)
-		self.cities['Miasto2'].add_connection('Miasto1', 2)
+		self.cities = Graph.from_data([('Miasto1', 1, 1, 5), ('Miasto2', 2, 2, 4), ('Miasto3', 2, 2, 6)],
+									  [('Miasto1', 'Miasto2', 2)])
 
 	def test_valid1(self):
-		test_route = Route(['Miasto1', 'Miasto2'], self.cities)
+		test_route = Route.from_names(['Miasto1', 'Miasto2'], self.cities)
 		assert test_route.is_valid(5) is True, 'Źle sprawdza poprawność trasy'
 
 	def test_valid2(self):
-		test_route = Route(['Miasto1', 'Miasto2'], self.cities)
+		test_route = Route.from_names(['Miasto1', 'Miasto2'], self.cities)
 		assert test_route.is_valid(1) is False, 'Źle sprawdza poprawność trasy'
 		assert test_route.invalid_cause == 'too long', 'Zła przyczyna niepoprawności trasy'
 
 	def test_valid3(self):
-		test_route = Route(['Miasto1', 'Miasto3'], self.cities)
+		test_route = Route.from_names(['Miasto1', 'Miasto3'], self.cities)
 		assert test_route.is_valid(5) is False, 'Źle sprawdza poprawność trasy'
 		assert test_route.invalid_cause == 'cities not connected', 'Zła przyczyna niepoprawności trasy'
 
 	def test_valid4(self):
-		test_route = Route(['Miasto1'], self.cities)
+		test_route = Route.from_names(['Miasto1'], self.cities)
 		assert test_route.is_valid(5) is False, 'Źle sprawdza poprawność trasy'
 		assert test_route.invalid_cause == 'less than 2 cities', 'Zła przyczyna niepoprawności trasy'
 
 	def test_valid5(self):
-		test_route = Route([], self.cities)
+		test_route = Route.from_names([], self.cities)
 		assert test_route.is_valid(5) is False, 'Źle sprawdza poprawność trasy'
 		assert test_route.invalid_cause == 'too long', 'Zła przyczyna niepoprawności trasy'
 
 	def test_distance1(self):
-		test_route = Route(['Miasto1', 'Miasto2'], self.cities)
+		test_route = Route.from_names(['Miasto1', 'Miasto2'], self.cities)
 		assert test_route.distance == 2, 'Źle oblicza odległość trasy'
 
 	def test_distance2(self):
-		test_route = Route(['Miasto1'], self.cities)
+		test_route = Route.from_names(['Miasto1'], self.cities)
 		assert test_route.distance == 0, 'Źle oblicza odległość trasy'
 
 	def test_distance3(self):
-		test_route = Route([], self.cities)
+		test_route = Route.from_names([], self.cities)
 		assert test_route.distance == 0, 'Źle oblicza odległość trasy'
 
 	def test_fitness1(self):
-		test_route = Route(['Miasto1', 'Miasto2'], self.cities)
+		test_route = Route.from_names(['Miasto1', 'Miasto2'], self.cities)
 		assert test_route.fitness == 9, 'Źle oblicza zysk na trasie'
 
 	def test_fitness2(self):
-		test_route = Route(['Miasto1'], self.cities)
+		test_route = Route.from_names(['Miasto1'], self.cities)
 		assert test_route.fitness == 5, 'Źle oblicza zysk na trasie'
 
 	def test_fitness3(self):
-		test_route = Route([], self.cities)
+		test_route = Route.from_names([], self.cities)
 		assert test_route.fitness == 0, 'Źle oblicza zysk na trasie'
 
 
+class TestIncrementalRoute(unittest.TestCase):
+	def setUp(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		self.graph = Graph.from_data(cities, roads)
+		self.p1 = Route.from_names(['Miasto1', 'Miasto3', 'Miasto4', 'Miasto9', 'Miasto4', 'Miasto5'], self.graph)
+		self.p2 = Route.from_names(['Miasto2', 'Miasto1', 'Miasto3', 'Miasto4', 'Miasto9', 'Miasto8'], self.graph)
+		assert self.p1.is_valid(10) and self.p2.is_valid(10)
+
+	def assert_same_as_new_route(self, child, max_distance):
+		expected = Route(list(child.route), self.graph)
+		assert child.valid == expected.is_valid(max_distance), 'Źle sprawdza poprawność trasy'
+		assert child.invalid_cause == expected.invalid_cause, 'Zła przyczyna niepoprawności trasy'
+		assert child.fitness == expected.fitness, 'Źle oblicza zysk na trasie'
+		if expected.valid:
+			assert child.distance == expected.distance, 'Źle oblicza odległość trasy'
+
+	def test_extended(self):
+		for city_id in self.graph.neighbours_of(self.p1.route[-1]):
+			self.assert_same_as_new_route(self.p1.extended(city_id, False, 10), 10)
+			self.assert_same_as_new_route(self.p1.extended(city_id, False, 5), 5)
+		for city_id in self.graph.neighbours_of(self.p1.route[0]):
+			self.assert_same_as_new_route(self.p1.extended(city_id, True, 10), 10)
+
+	def test_spliced(self):
+		for idx in range(len(self.p1.route) + 1):
+			for other_idx in range(len(self.p2.route) + 1):
+				for max_distance in (3, 10):
+					self.assert_same_as_new_route(self.p1.spliced(self.p2, idx, other_idx, max_distance), max_distance)
+
+	def test_breed_and_mutate(self):
+		algorithm = GeneticAlgorithm([], [], 10, seed=0)
+		algorithm.graph = self.graph
+		for _ in range(50):
+			for child in algorithm._breed(self.p1, self.p2):
+				self.assert_same_as_new_route(child, 10)
+			self.assert_same_as_new_route(algorithm._create_mutant(self.p1), 10)
+
+
+class TestCaseReachability(unittest.TestCase):
+	def setUp(self):
+		cities = [('Miasto1', 0, 0, 1), ('Miasto2', 0, 1, 1), ('Miasto3', 0, 2, 1), ('Miasto4', 5, 5, 1),
+				  ('Miasto5', 6, 5, 1)]
+		roads = [('Miasto1', 'Miasto2', 1), ('Miasto2', 'Miasto3', 2), ('Miasto4', 'Miasto5', 4)]
+		self.algorithm = GeneticAlgorithm(cities, roads, 3)
+
+	def test_shortest_distances(self):
+		graph = self.algorithm.graph
+		assert graph.shortest_distances(0) == {0: 0, 1: 1, 2: 3}
+		assert graph.shortest_distances(0, 2) == {0: 0, 1: 1}
+
+	def test_step_towards(self):
+		graph = self.algorithm.graph
+		assert graph.step_towards(0, lambda city_id: city_id == 2) == (1, 1)
+		assert graph.step_towards(0, lambda city_id: city_id == 2, 2) == (None, None)
+		assert graph.step_towards(0, lambda city_id: city_id == 3) == (None, None)
+
+	def test_graph_pickle(self):
+		graph = self.algorithm.graph
+		assert graph.arrays() and graph.edges
+		copied = pickle.loads(pickle.dumps(graph))
+		assert copied._edges is None and copied._arrays is None and graph._edges is not None
+		assert copied.edges == graph.edges and copied.index == graph.index and copied.names == graph.names
+
+	def test_feasible_starts(self):
+		self.algorithm.preprocess()
+		assert self.algorithm.feasible_starts == [0, 1, 2], 'Miasta bez połączeń mieszczących się w limicie'
+
+	def test_initial_route(self):
+		self.algorithm.set_seed(0)
+		for _ in range(20):
+			route = Route(self.algorithm._create_initial_route(), self.algorithm.graph)
+			assert route.is_valid(3), 'Trasa początkowa powinna być poprawna'
+			assert len(set(route.route)) == len(route.route), 'Trasa nie powinna wracać do odwiedzonych miast, ' \
+																	'jeśli nie prowadzi to do nowych miast'
+			assert set(route.route) <= {0, 1, 2}
+
+
+class TestCaseBranchAndBound(unittest.TestCase):
+	def setUp(self):
+		self.cities = IO.read_cities('test_data2/test_cities.csv')
+		self.roads = IO.read_roads('test_data2/test_roads.csv')
+
+	def brute_force(self, graph, max_distance):
+		# przegląd wszystkich tras mieszczących się w limicie
+		best = 0
+		stack = [[city_id] for city_id in range(graph.n_cities)]
+		while stack:
+			route = stack.pop()
+			route_object = Route(route, graph)
+			if len(route) > 1:
+				best = max(best, route_object.fitness)
+			for neighbour, distance in graph.connections_of(route[-1]):
+				if route_object.distance + distance <= max_distance:
+					stack.append(route + [neighbour])
+		return best
+
+	def test_optimal(self):
+		for max_distance in (1, 4, 7):
+			solver = BranchAndBound(self.cities, self.roads, max_distance)
+			route = solver.find_optimal_route(time_limit=10, verbose=False)
+			assert route.is_valid(max_distance), 'Algorytm zwrócił niepoprawną trasę'
+			assert solver.optimal and solver.gap == 0
+			assert route.fitness == self.brute_force(solver.graph, max_distance), 'Trasa nie jest optymalna'
+
+	def test_zero_length_road(self):
+		cities = [['A', 0, 0, 1], ['B', 0, 1, 2], ['C', 0, 2, 3]]
+		solver = BranchAndBound(cities, [['A', 'B', 0], ['B', 'C', 1]], 1)
+		route = solver.find_optimal_route(time_limit=10, verbose=False)
+		assert route.fitness == 6 and solver.optimal
+
+	def test_initial_route(self):
+		solver = BranchAndBound(self.cities, self.roads, 7)
+		route = solver.find_optimal_route(time_limit=10, verbose=False, initial_route=[0, 1])
+		assert route.fitness == 47 and solver.optimal
+
+	def test_gap(self):
+		cities = IO.read_cities('test_data3/test_cities.csv')
+		roads = IO.read_roads('test_data3/test_roads.csv')
+		solver = BranchAndBound(cities, roads, 100)
+		route = solver.find_optimal_route(time_limit=0.5, verbose=False)
+		assert route.is_valid(100)
+		assert not solver.optimal
+		assert solver.upper_bound >= route.fitness == solver.best_fitness
+		assert 0 <= solver.gap <= 1
+
+
+class TestCaseLocalSearch(unittest.TestCase):
+	def setUp(self):
+		cities = IO.read_cities('test_data3/test_cities.csv')
+		roads = IO.read_roads('test_data3/test_roads.csv')
+		self.algorithm = GeneticAlgorithm(cities, roads, 100)
+		solution, profit, distance = IO.read_solution('test_data3/valid_solution.txt')
+		self.route = Route.from_names([city[0] for city in solution], self.algorithm.graph)
+
+	def test_remove_redundant_visits(self):
+		local_search = LocalSearch(self.algorithm.graph, 100)
+		ids = self.route.route[:10]
+		# powrót do odwiedzonego już miasta w środku trasy oraz na jej końcu
+		looped = ids[:5] + [ids[3], ids[4]] + ids[5:] + [ids[8]]
+		assert Route(looped, self.algorithm.graph).is_valid(100)
+		route = Route(local_search._remove_redundant_visits(looped, float('inf')), self.algorithm.graph)
+		assert route.route == ids, 'Zbędne powroty do odwiedzonych miast powinny zostać usunięte'
+
+	def test_improve_route(self):
+		route = self.algorithm.improve_route(self.route, 1)
+		assert route.is_valid(100), 'Przeszukiwanie lokalne zwróciło niepoprawną trasę'
+		assert route.fitness > self.route.fitness, 'Przeszukiwanie lokalne powinno poprawić trasę'
+
+
+class TestCaseBeamSearch(unittest.TestCase):
+	def setUp(self):
+		cities = IO.read_cities('test_data3/test_cities.csv')
+		roads = IO.read_roads('test_data3/test_roads.csv')
+		self.algorithm = GeneticAlgorithm(cities, roads, 100)
+
+	def test_construct(self):
+		routes = BeamSearch(self.algorithm.graph, 100).construct(20, n_routes=5)
+		routes = [Route(route, self.algorithm.graph) for route in routes]
+		assert len(routes) == 5
+		assert all(route.is_valid(100) for route in routes), 'Przeszukiwanie wiązkowe zwróciło niepoprawną trasę'
+		assert [route.fitness for route in routes] == sorted([route.fitness for route in routes], reverse=True)
+
+	def test_find_fast_route(self):
+		route = self.algorithm.find_fast_route(beam_width=20, time_limit=1)
+		assert route.is_valid(100)
+		random_routes = self.algorithm._create_first_population(50)
+		assert route.fitness > max(individual.fitness for individual in random_routes)
+
+	def test_seeded_population(self):
+		population = self.algorithm._create_first_population(50, seed_fraction=0.2)
+		assert len(population) >= 50
+		assert all(route.is_valid(100) for route in population)
+
+
 class TestCaseIO(unittest.TestCase):
 	def setUp(self):
 		pass
@@ -133,19 +330,551 @@ class TestCaseIO(unittest.TestCase):
 		assert solution == ([['Miasto1', 1.0, 3.0, 4.0], ['Miasto2', 2.0, 2.0, 5.0], ['Miasto3', 3.0, 1.0, 6.0]], 15.0, 3.0), 'Niepoprawnie wczytane dane rozwiązania'
 
 
+class TestCaseValidation(unittest.TestCase):
+	def test_invalid_connections(self):
+		valid, errors, infos = validation.check_connections([['Miasto1', 0, 0, 1], ['Miasto2', 1, 1, 1]],
+															[['Miasto1', 'Miasto2', 1]])
+		assert not valid and infos == ['Miasta Miasto1 oraz Miasto2 nie mog być ze sobą połączone']
+		valid, errors, infos = validation.check_connections([['Miasto1', 0, 0, 1]], [['Miasto1', 'Miasto2', 1]])
+		assert not valid
+
+	def test_chunked_reading_and_validation(self):
+		cities, roads, _ = benchmark.generate_grid_instance(400, 0.9, seed=1)
+		roads[3][2] = 2
+		roads += [['Miasto0', 'Miasto399', 1], ['Miasto0', 'Miasto398', 1], ['Miasto0', 'Nieznane', 1]]
+		with tempfile.TemporaryDirectory() as directory:
+			cities_file, roads_file = os.path.join(directory, 'cities.csv'), os.path.join(directory, 'roads.csv')
+			IO.save_csv(cities, cities_file)
+			IO.save_csv(roads, roads_file)
+			progress = []
+			chunks = list(IO.read_roads_chunks(roads_file, chunk_size=1000, progress=progress.append))
+			assert len(chunks) > 1 and sum(chunks, []) == IO.read_roads(roads_file)
+			assert progress == sorted(progress) and progress[-1] == 1
+			assert sum(IO.read_cities_chunks(cities_file, chunk_size=1000), []) == IO.read_cities(cities_file)
+
+			validator = validation.ConnectionValidator(cities)
+			for chunk in chunks:
+				validator.check(chunk)
+		assert validator.report() == validation.check_connections(cities, roads)
+		valid, errors, infos = validator.report()
+		assert not valid and not errors and infos == [
+			'Odległość między podanymi miastami jest różna od 1',
+			'Połączenie Miasto0 - Nieznane dotyczy miasta, którego nie ma na liście miast',
+			'Miasta Miasto0 oraz Miasto399 nie mog być ze sobą połączone (oraz 1 innych połączeń)']
+
+
+class TestCaseInstance(unittest.TestCase):
+	def test_binary_instance(self):
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = os.path.join(directory, 'map' + instance.EXTENSION)
+			graph = instance.convert_csv('test_data2/test_cities.csv', 'test_data2/test_roads.csv', file_path)
+			assert instance.is_instance_file(file_path)
+			assert not instance.is_instance_file('test_data2/test_cities.csv')
+			loaded = instance.load_instance(file_path)
+			assert list(loaded.names) == graph.names and loaded.index == graph.index
+			assert (loaded.x, loaded.y, loaded.profit) == (graph.x, graph.y, graph.profit)
+			assert loaded.edges == graph.edges
+			assert all((a == b).all() for a, b in zip(loaded.arrays(), graph.arrays()))
+
+			output = os.path.join(directory, 'solution')
+			assert cli.main([file_path, 'test_data2/test_salesman_timelimit.csv', '--solver', 'beam',
+							 '--time-limit', '1', '-o', output]) == 0
+			route, profit, worked_time = IO.read_solution(output + '.txt')
+			assert worked_time <= 7 and profit == 47
+
+
 class TestCaseGA(unittest.TestCase):
 	def setUp(self):
 		self.cities = [('Miasto1', 1, 1, 5), ('Miasto2', 2, 2, 4), ('Miasto3', 2, 2, 6)]
 		self.connections = [('Miasto1', 'Miasto2', 2)]
 
 	def test_construct_cities(self):
-		cities = GeneticAlgorithm.construct_cities(self.cities, self.connections)
-		assert cities == {'Miasto1': City('Miasto1', 1, 1, 5), 'Miasto2': City('Miasto2', 2, 2, 4),
-						  'Miasto3': City('Miasto3', 2, 2, 6)}
-
-		assert cities['Miasto1'].connected_cities == {'Miasto2': 2}
-		assert cities['Miasto2'].connected_cities == {'Miasto1': 2}
-		assert cities['Miasto3'].connected_cities == dict()
+		graph = GeneticAlgorithm.construct_cities(self.cities, self.connections)
+		assert graph.names == ['Miasto1', 'Miasto2', 'Miasto3']
+		assert graph.index == {'Miasto1': 0, 'Miasto2': 1, 'Miasto3': 2}
+		assert graph.profit == [5, 4, 6]
+
+		assert graph.connections_of(0) == [(1, 2)]
+		assert graph.connections_of(1) == [(0, 2)]
+		assert graph.connections_of(2) == []
+		assert graph.distance(0, 1) == 2
+		assert not graph.is_connected(0, 2)
+
+	def test_graph_city(self):
+		graph = GeneticAlgorithm.construct_cities(self.cities, self.connections)
+		assert graph.city(0) == City('Miasto1', 1, 1, 5)
+		assert graph.city(0).connected_cities == {'Miasto2': 2}
+		assert graph.city(2).connected_cities == dict()
+
+	def test_find_optimal_route(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		algorithm = GeneticAlgorithm(cities, roads, 7)
+		for vectorized in (True, False):
+			route = algorithm.find_optimal_route(n_iterations=20, population_size=50, time_limit=5, verbose=False,
+												 vectorized=vectorized)
+			assert route.is_valid(7), 'Algorytm zwrócił niepoprawną trasę'
+			assert all(isinstance(city_id, int) for city_id in route.route)
+			assert set(route.names) <= {city[0] for city in cities}
+
+	def test_seed(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		settings = {'n_iterations': 5, 'population_size': 20, 'time_limit': 5, 'verbose': False, 'local_search_time': 0}
+		algorithm = GeneticAlgorithm(cities, roads, 7)
+		route = algorithm.find_optimal_route(**settings)
+		seed = algorithm.statistics['seed']
+		metrics = [EvolutionMetrics(), EvolutionMetrics()]
+		routes = [GeneticAlgorithm(cities, roads, 7).find_optimal_route(seed=seed, metrics=metrics[idx], **settings)
+				  for idx in range(2)]
+		assert routes[0].route == routes[1].route == route.route, 'To samo ziarno powinno dać ten sam wynik'
+		assert [record['average_fitness'] for record in metrics[0].generations] == \
+			   [record['average_fitness'] for record in metrics[1].generations]
+		assert len(set(IslandModel(4).island_seeds(seed))) == 4
+		assert IslandModel(4).island_seeds(seed) == IslandModel(4).island_seeds(seed)
+		assert IslandModel(4).island_seeds(-seed) == IslandModel(4).island_seeds(seed)
+
+	def test_seed_of_repeated_run(self):
+		# zapisane ziarno odtwarza także kolejne uruchomienie na tym samym obiekcie
+		cities = IO.read_cities('test_data3/test_cities.csv')
+		roads = IO.read_roads('test_data3/test_roads.csv')
+		settings = {'n_iterations': 10, 'population_size': 30, 'time_limit': 10, 'verbose': False,
+					'local_search_time': 0}
+		algorithm = GeneticAlgorithm(cities, roads, 100)
+		algorithm.find_optimal_route(**settings)
+		second = algorithm.find_optimal_route(**settings)
+		reproduced = GeneticAlgorithm(cities, roads, 100).find_optimal_route(seed=algorithm.statistics['seed'],
+																			   **settings)
+		assert reproduced.route == second.route
+
+	def test_checkpoint_resume(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		settings = {'population_size': 20, 'time_limit': 5, 'verbose': False, 'local_search_time': 0}
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = os.path.join(directory, 'checkpoint.npz')
+			GeneticAlgorithm(cities, roads, 7).find_optimal_route(n_iterations=5, seed=3, checkpoint_file=file_path,
+																  **settings)
+			checkpoint = Checkpoint.load(file_path)
+			assert checkpoint.iteration == 5 and checkpoint.seed == 3 and len(checkpoint.population) == 20
+			assert checkpoint.settings['population_size'] == 20 and checkpoint.history
+
+			algorithm = GeneticAlgorithm(cities, roads, 7)
+			resumed = algorithm.resume(file_path, n_iterations=5, **settings)
+			assert Checkpoint.load(file_path).iteration == 10 and algorithm.statistics['seed'] == 3
+			uninterrupted = GeneticAlgorithm(cities, roads, 7).find_optimal_route(n_iterations=10, seed=3, **settings)
+			assert resumed.route == uninterrupted.route, 'Wznowienie powinno dać ten sam wynik co praca bez przerwy'
+			with self.assertRaises(ValueError):
+				GeneticAlgorithm(cities, roads, 6).resume(file_path, n_iterations=5, **settings)
+
+			# ziarno spoza zakresu int64 jest zapisywane bez utraty wartości
+			GeneticAlgorithm(cities, roads, 7).find_optimal_route(n_iterations=1, seed=-2 ** 70,
+																  checkpoint_file=file_path, **settings)
+			assert Checkpoint.load(file_path).seed == -2 ** 70
+
+	def test_improving_routes_and_stop(self):
+		cities = IO.read_cities('test_data3/test_cities.csv')
+		roads = IO.read_roads('test_data3/test_roads.csv')
+		algorithm = GeneticAlgorithm(cities, roads, 100)
+		routes = algorithm.find_improving_routes(n_iterations=5, population_size=30, time_limit=10, verbose=False,
+												 seed_fraction=0, local_search_time=0, seed=1)
+		fitnesses = [route.fitness for route in routes]
+		assert fitnesses and fitnesses == sorted(set(fitnesses)), 'Kolejne trasy powinny być coraz lepsze'
+		assert fitnesses[-1] == algorithm.statistics['history'][-1][1]
+
+		routes = algorithm.find_improving_routes(n_iterations=10 ** 6, population_size=30, time_limit=60,
+												 verbose=False, seed_fraction=0)
+		next(routes)
+		routes.close()  # przerwanie iteracji zatrzymuje algorytm
+		assert algorithm.statistics['stopped'] and algorithm.statistics['runtime'] < 60
+
+	def test_metrics(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		records = []
+		metrics = EvolutionMetrics(callback=records.append)
+		algorithm = GeneticAlgorithm(cities, roads, 7)
+		algorithm.find_optimal_route(n_iterations=10, population_size=30, time_limit=5, verbose=False,
+									 local_search_time=0, metrics=metrics)
+		assert len(records) == 10 and records == metrics.generations
+		assert set(records[0]['timings']) == set(EvolutionMetrics.PHASES)
+		assert all(0 < record['diversity'] <= 1 for record in records)
+		assert abs(sum(metrics.summary()['phase_shares'].values()) - 1) < 1e-9
+		assert sum(metrics.rejected.values()) == sum(sum(record['rejected'].values()) for record in records)
+
+	def test_convergence_channel(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		batches = []
+		channel = ThrottledChannel(batches.append, interval=3600)
+		algorithm = GeneticAlgorithm(cities, roads, 7)
+		algorithm.find_optimal_route(n_iterations=10, population_size=30, time_limit=5, verbose=False,
+									 local_search_time=0, on_iteration=channel)
+		assert not batches and len(channel.points) == 10
+		channel.flush()
+		assert len(batches) == 1 and [point[0] for point in batches[0]] == list(range(10))
+		assert all(best >= average for _, best, average in batches[0])
+
+		batches.clear()
+		channel = ThrottledChannel(batches.append, interval=0)
+		channel(0, 2, 1)
+		channel(1, 3, 2)
+		assert batches == [[(0, 2, 1)], [(1, 3, 2)]]
+
+	def test_solution_cache(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		settings = {'population_size': 20, 'verbose': False, 'local_search_time': 0, 'seed': 1}
+		with tempfile.TemporaryDirectory() as directory:
+			cache = SolutionCache(max_entries=1, directory=directory)
+			algorithm = GeneticAlgorithm(cities, roads, 7)
+			route = cache.find_optimal_route(algorithm, n_iterations=5, **settings)
+			assert algorithm.statistics['cached'] == 'miss' and len(os.listdir(directory)) == 2
+
+			algorithm = GeneticAlgorithm(cities, roads, 7)
+			cached_route = cache.find_optimal_route(algorithm, n_iterations=5, **settings)
+			assert algorithm.statistics['cached'] == 'hit' and cached_route.route == route.route
+
+			# dłuższy budżet kontynuuje optymalizację tak, jakby od początku uruchomiono ją z tym budżetem
+			algorithm = GeneticAlgorithm(cities, roads, 7)
+			continued = SolutionCache(directory=directory).find_optimal_route(algorithm, n_iterations=10, **settings)
+			assert algorithm.statistics['cached'] == 'warm_start' and algorithm.statistics['iterations'] == 5
+			uninterrupted = GeneticAlgorithm(cities, roads, 7).find_optimal_route(n_iterations=10, **settings)
+			assert continued.route == uninterrupted.route
+
+			other = SolutionCache.make_key(algorithm.graph, 7, dict(settings, mutation_rate=0.5))
+			assert other != SolutionCache.make_key(algorithm.graph, 7, settings)
+			assert SolutionCache.make_key(algorithm.graph, 7, dict(settings, time_limit=100)) == \
+				SolutionCache.make_key(algorithm.graph, 7, settings)
+
+	def test_reoptimize_after_edits(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		algorithm = GeneticAlgorithm(cities, roads, 7, seed=2)
+		route = algorithm.find_optimal_route(n_iterations=5, population_size=20, verbose=False, local_search_time=0)
+
+		# usunięcie połączenia z najlepszej trasy
+		city1, city2 = route.route[0], route.route[1]
+		algorithm.remove_road(algorithm.graph.names[city1], algorithm.graph.names[city2])
+		assert not algorithm.graph.is_connected(city1, city2) and not algorithm.graph.is_connected(city2, city1)
+		assert algorithm.graph.arrays()[1].size == len(algorithm.graph.edges) == len(algorithm.graph.neighbours)
+
+		algorithm.set_profit(algorithm.graph.names[city1], 100)
+		algorithm.set_max_distance(6)
+		rerouted = algorithm.reoptimize(n_iterations=5, verbose=False, local_search_time=0)
+		assert rerouted.is_valid(6) and algorithm.statistics['iterations'] == 5
+		assert all(algorithm.graph.is_connected(a, b) for a, b in zip(rerouted.route, rerouted.route[1:]))
+		assert algorithm.last_checkpoint.iteration == 10
+
+		# dodane połączenie jest widoczne tak samo jak w grafie zbudowanym od nowa
+		rebuilt = Graph.from_data(cities, roads)
+		algorithm.add_road(algorithm.graph.names[city1], algorithm.graph.names[city2], rebuilt.distance(city1, city2))
+		assert algorithm.graph.edges == rebuilt.edges
+		assert sorted(algorithm.graph.connections_of(city1)) == sorted(rebuilt.connections_of(city1))
+		assert all((a == b).all() for a, b in zip(algorithm.graph.arrays()[1:], rebuilt.arrays()[1:]))
+
+	def test_route_cache_and_unique_routes(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		for vectorized in (True, False):
+			algorithm = GeneticAlgorithm(cities, roads, 7, seed=0)
+			algorithm.vectorized = vectorized
+			algorithm.route_cache_size = 100
+			routes = [algorithm._create_initial_route() for _ in range(10)] + [[0, 1], [0, 5]]
+			first = [Route(route, algorithm.graph) for route in routes]
+			algorithm.evaluate_population(first)
+			second = [Route(list(route), algorithm.graph) for route in routes]
+			algorithm.evaluate_population(second)
+			assert algorithm.statistics['route_cache_hits'] == len(routes)
+			assert [(r._distance, r._fitness, r.valid, r.invalid_cause) for r in first] == \
+				[(r._distance, r._fitness, r.valid, r.invalid_cause) for r in second]
+			algorithm.set_max_distance(1)
+			algorithm.preprocess()
+			assert not algorithm._route_cache
+
+		algorithm = GeneticAlgorithm(cities, roads, 7, seed=0)
+		route = algorithm.find_optimal_route(n_iterations=20, population_size=30, verbose=False, local_search_time=0,
+											 unique_routes=True, route_cache_size=1000)
+		assert route.is_valid(7) and algorithm.statistics['duplicates_removed'] > 0
+		assert 0 <= algorithm.statistics['route_cache_hit_rate'] <= 1
+
+		# domyślnie pamięć ocen tras jest wyłączona
+		algorithm = GeneticAlgorithm(cities, roads, 7, seed=0)
+		algorithm.find_optimal_route(n_iterations=5, population_size=30, verbose=False, local_search_time=0)
+		assert 'route_cache_hits' not in algorithm.statistics and not algorithm._route_cache
+
+	def test_find_optimal_route_islands(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		algorithm = GeneticAlgorithm(cities, roads, 7)
+		route = algorithm.find_optimal_route(n_iterations=30, population_size=30, time_limit=2, verbose=False,
+											 n_islands=2, migration_interval=5, migration_size=2)
+		assert route.is_valid(7), 'Model wyspowy zwrócił niepoprawną trasę'
+
+	def test_islands_improvements_and_stop(self):
+		# wyspy przesyłają coraz lepsze trasy do tego procesu i kończą pracę po zatrzymaniu algorytmu
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		improvements = Queue()
+		stop_event = threading.Event()
+		stop_event.set()
+		start = time.time()
+		route = GeneticAlgorithm(cities, roads, 7).find_optimal_route(
+			n_iterations=10 ** 6, population_size=30, time_limit=30, verbose=False, local_search_time=0, n_islands=2,
+			on_improvement=improvements.put, stop_event=stop_event)
+		assert time.time() - start < 15 and route.is_valid(7)
+		fitnesses = [improvements.get_nowait().fitness for _ in range(improvements.qsize())]
+		assert fitnesses and fitnesses == sorted(set(fitnesses)) and fitnesses[-1] <= route.fitness
+
+
+class TestCasePopulation(unittest.TestCase):
+	def setUp(self):
+		self.graph = Graph.from_data([('Miasto1', 1, 1, 5), ('Miasto2', 2, 2, 4), ('Miasto3', 2, 2, 6)],
+									 [('Miasto1', 'Miasto2', 2)])
+		self.routes = [[0, 1], [0, 1, 0, 1], [0], [0, 2], [2, 0, 1], [1, 0, 1, 0, 1]]
+
+	def test_evaluate(self):
+		distances, profits, causes = PopulationMatrix.from_routes(self.routes).evaluate(self.graph, 6)
+		assert distances[[0, 1, 2, 5]].tolist() == [2, 6, 0, 8], 'Źle oblicza odległość tras'
+		assert profits.tolist() == [9, 9, 5, 11, 15, 9], 'Źle oblicza zysk na trasach'
+		assert causes.tolist() == [PopulationMatrix.VALID, PopulationMatrix.VALID, PopulationMatrix.TOO_SHORT,
+								   PopulationMatrix.NOT_CONNECTED, PopulationMatrix.NOT_CONNECTED,
+								   PopulationMatrix.TOO_LONG], 'Źle sprawdza poprawność tras'
+
+	def test_same_as_route(self):
+		routes = [Route(route, self.graph) for route in self.routes]
+		PopulationMatrix.evaluate_routes(routes, self.graph, 6)
+		for route, vectorized in zip(self.routes, routes):
+			expected = Route(route, self.graph)
+			assert vectorized.valid == expected.is_valid(6)
+			assert vectorized.invalid_cause == expected.invalid_cause
+			assert vectorized.fitness == expected.fitness
+			if expected.valid:
+				assert vectorized.distance == expected.distance
+
+
+class TestCaseCLI(unittest.TestCase):
+	def test_solve_and_save(self):
+		with tempfile.TemporaryDirectory() as directory:
+			output = os.path.join(directory, 'solution')
+			result = cli.main(['test_data2/test_cities.csv', 'test_data2/test_roads.csv',
+							   'test_data2/test_salesman_timelimit.csv', '--solver', 'beam', '--time-limit', '1',
+							   '-o', output])
+			assert result == 0
+			route, profit, worked_time = IO.read_solution(output + '.txt')
+			assert worked_time <= 7 and profit == 47
+
+	def test_solver_error(self):
+		# błąd algorytmu kończy program kodem 1 zamiast wyjątkiem
+		with tempfile.TemporaryDirectory() as directory:
+			result = cli.main(['test_data2/test_cities.csv', 'test_data2/test_roads.csv',
+							   'test_data2/test_salesman_timelimit.csv', '--n-islands', '2', '--checkpoint',
+							   os.path.join(directory, 'checkpoint.npz')])
+			assert result == 1
+
+	def test_no_gui_imports(self):
+		code = 'import sys, cli; print(any(m.split(".")[0] in ("tkinter", "matplotlib", "gui") for m in sys.modules))'
+		output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+		assert output.strip() == 'False', 'cli nie powinien importować modułów okienka'
+
+
+class TestCaseBatch(unittest.TestCase):
+	def test_run_batch(self):
+		with tempfile.TemporaryDirectory() as directory:
+			manifest = os.path.join(directory, 'manifest.csv')
+			data = os.path.abspath('test_data2')
+			IO.save_csv([[os.path.join(data, 'test_cities.csv'), os.path.join(data, 'test_roads.csv'),
+						  os.path.join(data, 'test_salesman_timelimit.csv'), '1'],
+						 [os.path.join(data, 'test_cities.csv'), os.path.join(directory, 'missing.csv'),
+						  os.path.join(data, 'test_salesman_timelimit.csv')]], manifest)
+			summary = os.path.join(directory, 'summary.csv')
+			result = batch.main([manifest, '-d', directory, '-s', summary, '--solver', 'beam', '-w', '2'])
+			rows = IO.read_csv(summary)
+			assert result == 1 and rows[0] == batch.SUMMARY_HEADER and len(rows) == 3
+			ok = dict(zip(rows[0], rows[1]))
+			assert ok['status'] == 'ok' and float(ok['profit']) == 47 and os.path.exists(ok['solution'])
+			assert dict(zip(rows[0], rows[2]))['status'].startswith('error')
+
+	def test_invalid_manifest(self):
+		with tempfile.TemporaryDirectory() as directory:
+			manifest = os.path.join(directory, 'manifest.csv')
+			for row, message in [(['cities.csv', 'roads.csv', 'time.csv', 'abc'], ':3: niepoprawny limit czasu'),
+								 (['cities.csv', 'roads.csv', 'time.csv', '-1'], ':3: limit czasu'),
+								 (['cities.csv', 'roads.csv'], ':3: wymagane są pliki')]:
+				IO.save_csv([['# komentarz'], [], row], manifest)
+				with self.assertRaises(ValueError) as context:
+					batch.read_manifest(manifest, directory)
+				assert message in str(context.exception)
+				assert batch.main([manifest, '-d', directory, '-s', os.path.join(directory, 'summary.csv')]) == 2
+			assert not os.path.exists(os.path.join(directory, 'summary.csv'))
+
+
+class TestCaseBenchmark(unittest.TestCase):
+	def test_grid_instance(self):
+		cities, roads, max_distance = benchmark.generate_grid_instance(50, 0.8, 'clustered', seed=3)
+		assert len(cities) == 50 and max_distance == 16
+		assert validation.check_connections(cities, roads)[0], 'Wygenerowane połączenia powinny być poprawne'
+		assert (cities, roads) == benchmark.generate_grid_instance(50, 0.8, 'clustered', seed=3)[:2]
+
+	def test_run_case_and_compare(self):
+		result = benchmark.run_case(('grid25', 25, 1.0, 'uniform', 'ga', 0.2), seed=1)
+		assert result['final_profit'] > 0 and result['generations'] > 0 and result['routes_per_second'] > 0
+		assert result['time_to_target'] is not None
+		baseline = {'grid25': dict(result, final_profit=2 * result['final_profit'])}
+		assert benchmark.compare_to_baseline([result], baseline) == \
+			[f'grid25: final_profit {2 * result["final_profit"]} -> {result["final_profit"]}']
+		assert benchmark.compare_to_baseline([result], {'grid25': result}) == []
+
+	def test_metrics_not_produced(self):
+		result = benchmark.run_case(('grid25_beam', 25, 1.0, 'uniform', 'beam', 0.2), seed=1)
+		assert result['final_profit'] > 0
+		assert result['generations'] is result['generations_per_second'] is result['routes_per_second'] is None
+		baseline = {'grid25_beam': dict(result, generations_per_second=10.0, routes_per_second=10.0)}
+		assert benchmark.compare_to_baseline([result], baseline) == []
+
+
+class TestCaseJobs(unittest.TestCase):
+	def setUp(self):
+		self.jobs = JobManager()
+
+	def tearDown(self):
+		self.jobs.shutdown()
+
+	def test_deduplication_and_status(self):
+		release = threading.Event()
+		first = self.jobs.submit('io', release.wait, 10, key='wait')
+		assert self.jobs.submit('io', release.wait, 10, key='wait') == first, \
+			'Powtórzone zadanie nie powinno być zlecane'
+		assert self.jobs.status(first) in ('pending', 'running')
+		release.set()
+		assert self.jobs.result(first, timeout=10) is True and self.jobs.status(first) == 'done'
+		assert self.jobs.submit('io', release.wait, 10, key='wait') != first
+
+		failed = self.jobs.submit('io', int, 'nie liczba')
+		with self.assertRaises(ValueError):
+			self.jobs.result(failed, timeout=10)
+		assert self.jobs.status(failed) == 'failed'
+
+	def test_solve_route(self):
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		finished = []
+		job_id = self.jobs.submit('solve', solve_route, cities, roads, 7,
+								  {'n_iterations': 10, 'population_size': 20, 'verbose': False},
+								  on_done=finished.append)
+		solution, profit, distance = self.jobs.result(job_id, timeout=60)
+		assert distance <= 7 and profit == sum(city[3] for city in solution)
+		assert finished and finished[0].id == job_id
+		time.sleep(0.1)
+		graph = Graph.from_data(cities, roads)
+		solution, graph_profit, distance = self.jobs.result(
+			self.jobs.submit('solve', solve_route, None, None, 7,
+							 {'n_iterations': 10, 'population_size': 20, 'verbose': False}, graph=graph), timeout=60)
+		assert distance <= 7 and graph_profit == sum(city[3] for city in solution)
+		progress = self.jobs.progress()
+		routes = [message for message in progress if message[0] == 'route']
+		points = [point for message in progress if message[0] == 'convergence' for point in message[1]]
+		assert routes and max(route[1] for route in routes) <= max(profit, graph_profit)
+		# ta sama mapa i hiperparametry: drugi wynik pochodzi z pamięci rozwiązań procesu, bez optymalizacji
+		assert [point[0] for point in points] == list(range(10)) and graph_profit == profit
+
+	def test_stop_before_start(self):
+		# zatrzymanie zleconego zadania, zanim proces z puli zaczął je wykonywać, nie przepada
+		cities = IO.read_cities('test_data2/test_cities.csv')
+		roads = IO.read_roads('test_data2/test_roads.csv')
+		job_id = self.jobs.submit('solve', solve_route, cities, roads, 7,
+								  {'n_iterations': 10 ** 6, 'time_limit': 60, 'population_size': 20, 'verbose': False})
+		self.jobs.stop_event.set()
+		start = time.time()
+		solution, profit, distance = self.jobs.result(job_id, timeout=60)
+		assert time.time() - start < 30 and distance <= 7
+
+
+
+class TestCaseController(unittest.TestCase):
+	def setUp(self):
+		# controller bez okienka: okienko zastępuje atrapa, a akcje dla okienka zostają w feedback_queue
+		self.controller = controller.Controller(mock.MagicMock())
+		self.controller.cities = IO.read_cities('test_data2/test_cities.csv')
+		self.controller.connections = IO.read_roads('test_data2/test_roads.csv')
+		self.controller.salesman_max_time = 7
+
+	def tearDown(self):
+		self.controller.quit()
+
+	def feedback(self):
+		# funkcje okienka czekające w kolejce
+		functions = []
+		while not self.controller.feedback_queue.empty():
+			functions.append(self.controller.feedback_queue.get_nowait()['func'])
+		return functions
+
+	def test_solve_deduplication(self):
+		app = self.controller.app
+		settings = {'n_iterations': 10 ** 6, 'time_limit': 30, 'population_size': 20}
+		first = self.controller.find_best_route(**settings)
+		assert self.feedback().count(app.clear_convergence) == 1
+		# to samo zadanie nie jest zlecane ponownie i nie czyści wykresu pracującego zadania
+		assert self.controller.find_best_route(**settings) == first
+		assert app.clear_convergence not in self.feedback()
+		# inny czas pracy albo inna mapa to nowe zadanie
+		self.controller.salesman_max_time = 6
+		second = self.controller.find_best_route(**settings)
+		assert second != first and self.feedback().count(app.clear_convergence) == 1
+		self.controller.read_connections('test_data2/test_roads.csv')
+		assert self.controller.find_best_route(**settings) not in (first, second)
+		self.controller.stop()
+
+	def test_graph_cache(self):
+		self.controller.read_cities('test_data2/test_cities.csv')
+		assert self.controller._graph is None, 'Nowe miasta powinny unieważnić graf'
+		graph = self.controller.graph
+		assert self.controller.graph is graph
+		# wczytane połączenia od razu budują nowy graf, który jest potem używany ponownie
+		self.controller.read_connections('test_data2/test_roads.csv')
+		cached = self.controller._graph
+		assert cached is not None and cached is not graph and self.controller.graph is cached
+		self.controller.read_cities('test_data2/test_cities.csv')
+		assert self.controller.graph is not cached
+
+	def test_tick(self):
+		app = self.controller.app
+		app.is_alive = True
+		app.get_user_action.side_effect = [{'action': 'stop'}, {'action': 'stop'}, None]
+		self.controller.feedback_queue.put({'func': app.show_status, 'text': 'Gotowe'})
+		with mock.patch.object(self.controller.jobs, 'stop_solvers') as stop_solvers:
+			self.controller.tick()
+		# wszystkie oczekujące akcje użytkownika i zadania dla okienka są wykonane, a krok zaplanowany ponownie
+		assert stop_solvers.call_count == 2
+		app.show_status.assert_called_once_with(text='Gotowe')
+		app.after.assert_called_once_with(self.controller.FEEDBACK_INTERVAL, self.controller.tick)
+		# po zamknięciu okienka pętla zdarzeń jest kończona i krok nie jest już planowany
+		app.is_alive = False
+		self.controller.tick()
+		app.quit.assert_called_once_with()
+		assert app.after.call_count == 1
+
+
+class TestCaseGraphPage(unittest.TestCase):
+	def setUp(self):
+		# strona mapy bez okienka Tk: linie trasy są prawdziwą kolekcją matplotlib, a płótno atrapą
+		self.page = gui.GraphPage.__new__(gui.GraphPage)
+		self.page.route_lines = None
+		self.page.canvas = mock.MagicMock()
+
+	def test_update_route(self):
+		route = [['A', 0, 0, 0], ['B', 2, 1, 3], ['C', 2, 3, 5]]
+		# przed narysowaniem mapy nie ma czego podmieniać
+		self.page.update_route(route)
+		self.page.canvas.draw_idle.assert_not_called()
+
+		self.page.route_lines = gui.LineCollection([])
+		self.page.update_route(route)
+		segments = [segment.tolist() for segment in self.page.route_lines.get_segments()]
+		assert segments == [[[0, 0], [2, 0], [2, 1]], [[2, 1], [2, 3], [2, 3]]]
+		self.page.canvas.draw_idle.assert_called_once_with()
+		self.page.update_route(None)
+		assert self.page.route_lines.get_segments() == []
 
 
 if __name__ == '__main__':
@@ -0,0 +1,89 @@
+from itertools import repeat
+
+import numpy as np
+
+
+class ConnectionValidator:
+    # sprawdzanie poprawności połączeń między miastami partiami: każda partia sprawdzana jest wektorowo (numpy),
+    # a problemy są zliczane i na końcu opisywane jednym komunikatem na rodzaj problemu (z przykładowym połączeniem),
+    # zamiast jednego komunikatu na każde połączenie
+    def __init__(self, cities):
+        self.index = {city[0]: idx for idx, city in enumerate(cities)}  # nazwa miasta -> id miasta
+        self.x = np.array([city[1] for city in cities] + [np.nan], dtype=np.float64)  # nan dla nieznanych miast
+        self.y = np.array([city[2] for city in cities] + [np.nan], dtype=np.float64)
+        self.n_connections = 0  # liczba sprawdzonych połączeń
+        self.n_wrong_distance = 0  # liczba połączeń o odległości różnej od 1
+        self.unknown_city = []  # połączenia z miastem spoza listy miast: (miasto1, miasto2) pierwszego i ich liczba
+        self.not_adjacent = []  # połączenia miast niesąsiadujących na siatce: (miasto1, miasto2) pierwszego i liczba
+
+    def check(self, connections):
+        # sprawdzenie partii połączeń [miasto1, miasto2, odległość]
+        connections = [connection for connection in connections if connection]
+        self.check_columns([connection[0] for connection in connections], [connection[1] for connection in connections],
+                           [connection[2] for connection in connections])
+
+    def check_columns(self, city1, city2, distance):
+        # sprawdzenie partii połączeń podanych jako kolumny: nazwy pierwszych miast, nazwy drugich miast, odległości
+        if not len(city1):
+            return
+        self.n_connections += len(city1)
+
+        # odległość między miastami musi wynosić 1
+        self.n_wrong_distance += int(np.count_nonzero(np.asarray(distance, dtype=np.float64) != 1))
+
+        # oba miasta muszą znajdować się na liście miast (nieznane miasta dostają id -1, czyli współrzędne nan)
+        ids1 = np.fromiter(map(self.index.get, city1, repeat(-1)), dtype=np.int64, count=len(city1))
+        ids2 = np.fromiter(map(self.index.get, city2, repeat(-1)), dtype=np.int64, count=len(city2))
+        known = (ids1 >= 0) & (ids2 >= 0)
+        self._count(self.unknown_city, city1, city2, ~known)
+
+        # miasto może być połączone tylko z miastem bezpośrednio na lewo, prawo, górę lub dół
+        dx = np.abs(self.x[ids1] - self.x[ids2])
+        dy = np.abs(self.y[ids1] - self.y[ids2])
+        adjacent = ((dx == 1) & (dy == 0)) | ((dx == 0) & (dy == 1))
+        self._count(self.not_adjacent, city1, city2, known & ~adjacent)
+
+    @staticmethod
+    def _count(problems, city1, city2, mask):
+        # zapamiętanie pierwszego połączenia z problemem i zwiększenie liczby takich połączeń
+        indices = np.flatnonzero(mask)
+        if not len(indices):
+            return
+        if not problems:
+            problems.extend([(city1[indices[0]], city2[indices[0]]), 0])
+        problems[1] += len(indices)
+
+    def report(self):
+        # podsumowanie: (czy połączenia są poprawne, lista błędów, lista informacji) - po jednym komunikacie na rodzaj
+        # problemu, w postaci, w jakiej pokazuje je użytkownikowi okienko
+        errors = []
+        infos = []
+        if self.n_connections == 0:
+            errors.append('Liczba połączeń powinna wynosić co najmniej 1.')
+            return False, errors, infos
+
+        if self.n_wrong_distance == 1:
+            infos.append('Odległość między podanymi miastami jest różna od 1')
+        elif self.n_wrong_distance:
+            infos.append(f'Odległość między podanymi miastami jest różna od 1 ({self.n_wrong_distance} połączeń)')
+        if self.unknown_city:
+            (city1, city2), count = self.unknown_city
+            infos.append(f'Połączenie {city1} - {city2} dotyczy miasta, którego nie ma na liście miast'
+                         + self._others(count))
+        if self.not_adjacent:
+            (city1, city2), count = self.not_adjacent
+            infos.append(f'Miasta {city1} oraz {city2} nie mog być ze sobą połączone' + self._others(count))
+        return not (self.unknown_city or self.not_adjacent), errors, infos
+
+    @staticmethod
+    def _others(count):
+        # dopisek o liczbie pozostałych połączeń z tym samym problemem
+        return f' (oraz {count - 1} innych połączeń)' if count > 1 else ''
+
+
+def check_connections(cities, connections):
+    # sprawdzenie poprawności połączeń między miastami. Zwraca trójkę (czy połączenia są poprawne, lista błędów,
+    # lista informacji), a komunikaty mają postać, w jakiej pokazuje je użytkownikowi okienko
+    validator = ConnectionValidator(cities)
+    validator.check(connections)
+    return validator.report()